@@ -1,13 +1,16 @@
+from polybot.startup import startup_timer
 import os
+import signal
 import asyncio
-import threading
+import contextlib
 from dotenv import load_dotenv
-from polybot.bot import ImageProcessingBot
 from loguru import logger
-from fastapi import FastAPI, Request
-import uvicorn
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from prometheus_fastapi_instrumentator import Instrumentator
+with startup_timer.phase('import', 'polybot.bot (discord.py)'):
+    from polybot.bot import ImageProcessingBot
+with startup_timer.phase('import', 'fastapi, uvicorn'):
+    from fastapi import FastAPI, Request, HTTPException
+    from fastapi.responses import PlainTextResponse
+    import uvicorn
 from opentelemetry import metrics
 
 # Load correct .env file
@@ -27,53 +30,109 @@ else:
 OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://10.0.0.136:11434/api/chat')
 OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'gemma3:1b')
 STATUS_SERVER_PORT = int(os.environ.get('STATUS_SERVER_PORT', 8443))
+SHUTDOWN_TIMEOUT = float(os.environ.get('SHUTDOWN_TIMEOUT', 30))
 
 # Create FastAPI app
 app = FastAPI()
 
-# Instrumentation
-Instrumentator().instrument(app).expose(app)
-FastAPIInstrumentor.instrument_app(app)
+
+def instrument(app: FastAPI):
+    """Add Prometheus and OpenTelemetry instrumentation (imported here, at startup, not on import)"""
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from prometheus_fastapi_instrumentator import Instrumentator
+    Instrumentator().instrument(app).expose(app)
+    FastAPIInstrumentor.instrument_app(app)
 
 meter = metrics.get_meter(__name__)
 polybot_requests_counter = meter.create_counter("polybot_requests_total")
 
 @app.get("/")
-def health_check():
-    return {"status": "ok"}
+def health_check(request: Request):
+    # Backend status comes from the bot's background prober, so polling this doesn't probe anything
+    bot = getattr(request.app.state, "bot", None)
+    if bot is None:
+        return {"status": "ok"}
+    backends = bot.health.status()
+    degraded = any(backend["status"] == "down" or backend.get("circuit") == "open" for backend in backends.values())
+    return {"status": "degraded" if degraded else "ok", "backends": backends}
 
 @app.post("/predictions/{prediction_id}")
 async def receive_prediction(prediction_id: str, request: Request):
     data = await request.json()
     logger.info(f"✅ Received prediction callback for ID {prediction_id}: {data}")
-    # Optional: send result to Discord user/chat here
+    bot = getattr(request.app.state, "bot", None)
+    if bot is None or not await bot.predictions.resolve(prediction_id, data):
+        logger.warning(f"No pending prediction with ID {prediction_id} (unknown or expired)")
+        raise HTTPException(status_code=404, detail="Unknown or expired prediction")
     return {"status": "received"}
 
-def run_status_server():
-    logger.info(f"Starting status server on port {STATUS_SERVER_PORT}")
-    try:
-        uvicorn.run(app, host="0.0.0.0", port=STATUS_SERVER_PORT, log_level="info")
-    except Exception as e:
-        logger.error(f"Error running status server: {e}")
+@app.get("/startup")
+def startup_report():
+    return startup_timer.report()
+
+@app.get("/profiles")
+def list_profiles(request: Request):
+    bot = getattr(request.app.state, "bot", None)
+    if bot is None:
+        return {"profiles": []}
+    return {"profiles": bot.profiler.list_profiles()}
+
+@app.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, request: Request):
+    bot = getattr(request.app.state, "bot", None)
+    stacks = bot.profiler.read_profile(profile_id) if bot else None
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return stacks
+
+class StatusServer(uvicorn.Server):
+    """
+    Uvicorn server that leaves signal handling to main() so the bot can drain first
+
+    capture_signals is the signal hook of uvicorn >= 0.29 (pinned in requirements.txt);
+    older versions install their own handlers and would skip the drain.
+    """
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
 
 async def main():
     if not DISCORD_BOT_TOKEN:
         logger.error("DISCORD_BOT_TOKEN environment variable not set")
         return
 
-    status_thread = threading.Thread(target=run_status_server, daemon=True)
-    status_thread.start()
-    logger.info("Status server thread started")
+    with startup_timer.phase('init', 'instrumentation'):
+        instrument(app)
+    with startup_timer.phase('init', 'ImageProcessingBot'):
+        bot = ImageProcessingBot(DISCORD_BOT_TOKEN, YOLO_URL, OLLAMA_URL)
+    app.state.bot = bot
+
+    # The status server and the bot run as tasks on this one event loop
+    server = StatusServer(uvicorn.Config(app, host="0.0.0.0", port=STATUS_SERVER_PORT, log_level="info"))
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_requested.set)
 
-    bot = ImageProcessingBot(DISCORD_BOT_TOKEN, YOLO_URL, OLLAMA_URL)
+    logger.info(f"Starting status server on port {STATUS_SERVER_PORT}")
+    server_task = asyncio.create_task(server.serve(), name="status-server")
     logger.info("Starting Discord bot...")
+    bot_task = asyncio.create_task(bot.start(), name="discord-bot")
+    stop_task = asyncio.create_task(stop_requested.wait(), name="stop-signal")
+
+    await asyncio.wait({server_task, bot_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+    for task in (server_task, bot_task):
+        if task.done() and not task.cancelled() and task.exception():
+            logger.error(f"Error running {task.get_name()}: {task.exception()}")
 
-    try:
-        await bot.start()
-    except Exception as e:
-        logger.error(f"Error starting Discord bot: {e}")
-    finally:
-        logger.info("Discord bot stopped")
+    # Graceful shutdown: drain in-flight commands, then stop the status server
+    logger.info("Shutting down...")
+    await bot.shutdown(timeout=SHUTDOWN_TIMEOUT)
+    server.should_exit = True
+    stop_task.cancel()
+    await asyncio.gather(server_task, bot_task, return_exceptions=True)
+    logger.info("Discord bot stopped")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -8,9 +8,28 @@ import random
 import re
 import requests
 from pathlib import Path
-from polybot.img_proc import Img
+from polybot.img_proc import Img, KERNEL_FILTERS
+from polybot.encoding import upload_limit
+from polybot.profiling import SlowCommandProfiler, profiled_to_thread
+from polybot.memory_accounting import MemoryAccountant
+from polybot.yolo_client import YoloClient
+from polybot.ollama_client import OllamaClient
+from polybot.llm_scheduler import PRIORITY_BATCH
+from polybot.model_warmer import ModelWarmer
+from polybot.song_parser import JSON_FORMAT_INSTRUCTIONS, format_song_recommendations
+from polybot.predictions import PredictionRegistry
+from polybot.job_queue import ImageJob, create_job_queue
+from polybot.worker import ImageWorker
+from polybot.conversations import ConversationManager, Step
+from polybot.startup import startup_timer
+from polybot.storage import StorageManager
+from polybot.loop_watchdog import LoopLagWatchdog
+from polybot.health import HealthProber
 import json
 import asyncio
+import threading
+from collections import defaultdict, deque
+from typing import Optional
 
 
 class Bot:
@@ -21,28 +40,74 @@ class Bot:
         # Create a Discord bot client
         self.client = commands.Bot(command_prefix='!', intents=intents)
         self.token = token
-        # Track active conversations to prevent default handler from responding
-        self.active_conversations = set()
+        # Multi-step flows (e.g. !songrec) receive the user's replies in that channel
+        self.conversations = ConversationManager()
+        # Downloaded and processed images, kept within a byte and age budget
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.storage = StorageManager(os.path.join(project_root, 'photos'))
+        # Flags blocking calls on the event loop before Discord drops us for missed heartbeats
+        self.watchdog = LoopLagWatchdog() if os.environ.get('LOOP_WATCHDOG', 'true').lower() == 'true' else None
+        # Most recent image attachments per channel (newest last), filled by on_message
+        self.recent_images = defaultdict(lambda: deque(maxlen=int(os.environ.get('RECENT_IMAGES_PER_CHANNEL', 10))))
+        # Track in-flight commands so shutdown can drain them
+        self.in_flight = 0
+        self.shutting_down = False
+        self._idle = asyncio.Event()
+        self._idle.set()
 
         # Set up event handlers
         @self.client.event
         async def on_ready():
             logger.info(f'Discord Bot logged in as {self.client.user}')
+            startup_timer.mark_ready()
 
         @self.client.event
         async def on_message(message):
-            # Avoid responding to own messages
-            if message.author == self.client.user:
+            # Remember image attachments (including our own results) for commands like !concat
+            self.remember_images(message)
+            # Avoid responding to own messages and don't start new work while draining
+            if message.author == self.client.user or self.shutting_down:
                 return
             # Process commands
             await self.client.process_commands(message)
-            # Default message handler - only if not in an active conversation
-            if not message.content.startswith('!') and message.author.id not in self.active_conversations:
+            # Replies go to the user's active conversation, anything else to the default handler
+            if not message.content.startswith('!') and not self.conversations.dispatch(message):
                 await self.handle_message(message)
 
+        @self.client.before_invoke
+        async def track_command_start(ctx):
+            self.in_flight += 1
+            self._idle.clear()
+
+        @self.client.after_invoke
+        async def track_command_end(ctx):
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+
     async def start(self):
         """Start the Discord bot"""
-        await self.client.start(self.token)
+        expiry_task = asyncio.create_task(self.conversations.run_expiry())
+        storage_task = asyncio.create_task(self.storage.run())
+        watchdog_task = asyncio.create_task(self.watchdog.run()) if self.watchdog is not None else None
+        try:
+            await self.client.start(self.token)
+        finally:
+            expiry_task.cancel()
+            storage_task.cancel()
+            if watchdog_task is not None:
+                watchdog_task.cancel()
+
+    async def shutdown(self, timeout: float = 30):
+        """Stop accepting commands, wait for in-flight ones (and their uploads), then disconnect"""
+        self.shutting_down = True
+        if self.in_flight:
+            logger.info(f"Waiting up to {timeout}s for {self.in_flight} in-flight command(s) to finish")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Shutdown timeout reached with {self.in_flight} command(s) still running")
+        await self.client.close()
 
     async def send_text(self, channel_id, text):
         """Send a text message to a channel"""
@@ -62,6 +127,31 @@ class Bot:
                 # Message not found, send without quote
                 await channel.send(text)
 
+    def remember_images(self, message):
+        """Record the message's image attachments in the channel's recent-images buffer"""
+        for attachment in message.attachments:
+            if attachment.content_type and attachment.content_type.startswith('image/'):
+                self.recent_images[message.channel.id].append(attachment)
+
+    async def find_recent_images(self, channel, count):
+        """
+        Return up to count of the newest image attachments in a channel, newest first
+
+        Served from the in-memory buffer; falls back to the history API only when the
+        buffer doesn't hold enough images yet (e.g. right after a restart).
+        """
+        images = list(reversed(self.recent_images[channel.id]))[:count]
+        if len(images) >= count:
+            return images
+
+        images = []
+        async for message in channel.history(limit=20):
+            if message.attachments and message.attachments[0].content_type.startswith('image/'):
+                images.append(message.attachments[0])
+                if len(images) >= count:
+                    break
+        return images
+
     def is_current_msg_photo(self, message):
         """Check if message contains a photo"""
         return len(message.attachments) > 0 and message.attachments[0].content_type.startswith('image/')
@@ -73,15 +163,14 @@ class Bot:
         attachment = message.attachments[0]
 
         # Use a consistent absolute path for the photos directory
-        # Get the project root directory
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        folder_name = os.path.join(project_root, 'photos')
+        folder_name = str(self.storage.directory)
 
         if not os.path.exists(folder_name):
             os.makedirs(folder_name)
 
         file_path = f"{folder_name}/{attachment.filename}"
         await attachment.save(file_path)
+        self.storage.record(file_path)
         return file_path
 
     async def send_photo(self, channel_id, img_path):
@@ -286,9 +375,10 @@ class Bot:
                 "• `!contour` - Detect edges in an image\n"
                 "• `!rotate` - Rotate an image 90° clockwise\n"
                 "• `!salt_pepper` - Add noise to an image\n"
-                "• `!segment` - Convert image to black & white\n"
+                "• `!sharpen [amount]`, `!gaussian [sigma]`, `!sobel`, `!emboss` - Convolution filters\n"
+                "• `!segment [mean|otsu|adaptive|threshold]` - Convert image to black & white\n"
                 "• `!detect` - Detect objects in an image using YOLO\n"
-                "• `!concat [horizontal|vertical]` - Join two images\n"
+                "• `!concat [horizontal|vertical] [crop|resize]` - Join two images\n"
                 "• `!spotify [track|artist|album|playlist] search_query` - Search for music on Spotify\n"
                 "• `!songrec` - Get personalized song recommendations\n"
                 "• `!ask [question]` - Ask the AI a question using Ollama\n\n"
@@ -356,17 +446,66 @@ class QuoteBot(Bot):
 
 
 class ImageProcessingBot(Bot):
+    # Questions asked by !songrec, in order
+    SONGREC_STEPS = [
+        Step("language", "What language would you prefer for the songs? (e.g., English, Spanish, Korean, etc.)"),
+        Step("genre", "What genre of music do you like? (e.g., Pop, Rock, Hip-hop, Jazz, Classical, etc.)"),
+        Step("mood", "What mood are you in? (e.g., Happy, Sad, Energetic, Relaxed, etc.)"),
+        Step("era", "From which time period would you prefer songs? (e.g., 60s, 80s, 90s, 2000s, 2010s, Recent, etc.)"),
+        Step("artist_type", "Do you prefer solo artists or bands? (or type 'any' if no preference)"),
+    ]
+
     def __init__(self, token, yolo_url=None, ollama_url=None):
         super().__init__(token)
         # Define the YOLO service URL - can be overridden in environment variables
         self.yolo_url = yolo_url or os.environ.get('YOLO_URL', 'http://10.0.1.90:8081/predict')
         logger.info(f"YOLO service URL set to: {self.yolo_url}")
+        self.yolo_client = YoloClient(self.yolo_url)
+
+        # Asynchronous detection: YOLO posts results to the status server instead of
+        # holding the request open (requires a callback base URL reachable from YOLO)
+        self.yolo_callback_url = os.environ.get('YOLO_CALLBACK_URL')
+        self.yolo_async = os.environ.get('YOLO_ASYNC_MODE', 'false').lower() == 'true' and bool(self.yolo_callback_url)
+        self.predictions = PredictionRegistry(self._deliver_prediction, self._expire_prediction)
+        logger.info(f"YOLO async mode: {'enabled' if self.yolo_async else 'disabled'}")
 
         # Define the Ollama service URL - can be overridden in environment variables
         self.ollama_url = ollama_url or os.environ.get('OLLAMA_URL', 'http://35.86.203.133:11434/api/chat')
         self.ollama_model = os.environ.get('OLLAMA_MODEL', 'gemma3:1b')
         logger.info(f"Ollama service URL set to: {self.ollama_url}")
         logger.info(f"Ollama model set to: {self.ollama_model}")
+        self.ollama_client = OllamaClient(self.ollama_url, self.ollama_model)
+        # Load the model at startup (and keep it loaded during OLLAMA_BUSY_HOURS) so users don't pay the load time
+        self.ollama_warmup = os.environ.get('OLLAMA_WARMUP', 'true').lower() == 'true'
+        self.model_warmer = ModelWarmer(self.ollama_client)
+        # Ask Ollama for JSON song recommendations instead of parsing free text
+        self.songrec_json = os.environ.get('SONGREC_JSON_FORMAT', 'true').lower() == 'true'
+
+        # Backend status for the health endpoint, probed in the background rather than per request
+        self.health = HealthProber()
+        self.health.register('yolo', self.yolo_client.health_check, self.yolo_client.breaker)
+        self.health.register('ollama', self.ollama_client.health_check, self.ollama_client.breaker)
+
+        # Images of at least PREVIEW_MIN_PIXELS get a quick preview of a downscaled proxy first
+        self.preview_min_pixels = int(os.environ.get('PREVIEW_MIN_PIXELS', 2_000_000))
+        self.preview_max_side = int(os.environ.get('PREVIEW_MAX_SIDE', 512))
+        self.preview_budget = float(os.environ.get('PREVIEW_LATENCY_BUDGET', 1.0))
+
+        # Results over RESULT_LINK_THRESHOLD bytes are sent as a thumbnail plus a presigned S3 link
+        # instead of an attachment (0 always attaches)
+        self.link_threshold = int(os.environ.get('RESULT_LINK_THRESHOLD', upload_limit()))
+        self.thumbnail_max_side = int(os.environ.get('THUMBNAIL_MAX_SIDE', 320))
+
+        # Capture stack samples of commands that exceed the latency threshold
+        self.profiler = SlowCommandProfiler()
+        # Peak memory per command (MEMORY_ACCOUNTING=tracemalloc|rss), for container sizing
+        self.memory = MemoryAccountant()
+
+        # Split mode: the gateway only enqueues image jobs and workers run the filters
+        self.split_mode = os.environ.get('POLYBOT_MODE', 'standalone') == 'split'
+        self.job_queue = create_job_queue() if self.split_mode else None
+        if self.split_mode:
+            logger.info(f"Split mode enabled, image jobs go to {os.environ.get('JOB_QUEUE_URL', 'memory://')}")
 
         # Register commands
         @self.client.command(name='blur')
@@ -386,8 +525,26 @@ class ImageProcessingBot(Bot):
             await self.process_image(ctx, 'salt_n_pepper')
 
         @self.client.command(name='segment')
-        async def segment(ctx):
-            await self.process_image(ctx, 'segment')
+        async def segment(ctx, mode: str = 'mean'):
+            """
+            Convert an image to black & white.
+            Usage: !segment [mean|otsu|adaptive|threshold value]
+            """
+            try:
+                threshold = float(mode)
+            except ValueError:
+                threshold = None
+            if threshold is None and mode not in Img.SEGMENT_MODES:
+                await ctx.send(f"Mode must be one of: {', '.join(Img.SEGMENT_MODES)}, or a threshold value")
+                return
+            if threshold is not None:
+                await self.process_image(ctx, 'segment', threshold=threshold)
+            else:
+                await self.process_image(ctx, 'segment', mode=mode)
+
+        # Convolution filters registered in img_proc each get their own command
+        for kernel_filter in KERNEL_FILTERS.values():
+            self.register_kernel_filter_command(kernel_filter)
 
         @self.client.command(name='detect')
         async def detect(ctx):
@@ -413,51 +570,85 @@ class ImageProcessingBot(Bot):
             await self.spotify_search(ctx, search_type, search_query)
 
         @self.client.command(name='concat')
-        async def concat(ctx, direction: str = 'horizontal'):
+        async def concat(ctx, direction: str = 'horizontal', fit: str = 'crop'):
             """
             Concatenate the last two images sent in the channel.
-            Usage: !concat [horizontal|vertical]
+            Usage: !concat [horizontal|vertical] [crop|resize]
             """
             if direction not in ['horizontal', 'vertical']:
                 await ctx.send("Direction must be either 'horizontal' or 'vertical'")
                 return
+            if fit not in ['crop', 'resize']:
+                await ctx.send("Fit must be either 'crop' or 'resize'")
+                return
 
             # We need to find the two most recent image attachments
-            channel = ctx.channel
-            image_attachments = []
-            # Get recent messages with attachments
-            async for message in channel.history(limit=20):
-                if message.attachments and message.attachments[0].content_type.startswith('image/'):
-                    image_attachments.append(message.attachments[0])
-                    if len(image_attachments) >= 2:
-                        break
+            image_attachments = await self.find_recent_images(ctx.channel, 2)
 
             if len(image_attachments) < 2:
                 await ctx.send("Need at least two image attachments in recent messages to concatenate.")
                 return
 
-            try:
-                # Download both images
-                file_path1 = f"photos/concat_1.{image_attachments[0].filename.split('.')[-1]}"
-                file_path2 = f"photos/concat_2.{image_attachments[1].filename.split('.')[-1]}"
-                await image_attachments[0].save(file_path1)
-                await image_attachments[1].save(file_path2)
+            with self.memory.measure('concat') as memory:
+                try:
+                    # Download both images concurrently
+                    file_path1 = f"photos/concat_1.{image_attachments[0].filename.split('.')[-1]}"
+                    file_path2 = f"photos/concat_2.{image_attachments[1].filename.split('.')[-1]}"
+                    await asyncio.gather(image_attachments[0].save(file_path1), image_attachments[1].save(file_path2))
+
+                    def concatenate():
+                        img1 = Img(file_path1)
+                        img2 = Img(file_path2)
+                        (height1, width1), (height2, width2) = img1.get_dimensions(), img2.get_dimensions()
+                        memory.megapixels = (height1 * width1 + height2 * width2) / 1e6
+                        img1.concat(img2, direction=direction, resize_to_fit=(fit == 'resize'))
+                        return img1, img1.save_img(auto_upload_s3=False)
+
+                    # Decode, concatenate and save off the event loop
+                    img1, new_path = await asyncio.to_thread(concatenate)
+
+                    # Send the processed image
+                    await ctx.send(f"Concatenated images {direction}ly:", file=discord.File(new_path))
+                except Exception as e:
+                    logger.error(f"Error concatenating images: {e}")
+                    await ctx.send(f"Error concatenating images: {e}")
+                    return
 
-                # Process images
-                img1 = Img(file_path1)
-                img2 = Img(file_path2)
+                # Upload once the user has the result, so S3 round trips don't delay it
+                try:
+                    if not await asyncio.to_thread(lambda: img1.s3_manager.upload_file(new_path)):
+                        logger.warning(f"S3 upload of {new_path} failed, but the result was sent")
+                except Exception as e:
+                    logger.error(f"Error uploading {new_path} to S3: {e}")
 
-                # Concatenate
-                img1.concat(img2, direction=direction)
+    def register_kernel_filter_command(self, kernel_filter):
+        """Expose a registered convolution filter as !<name> [value]"""
+        async def apply_kernel_filter(ctx, value: Optional[float] = None):
+            params = {kernel_filter.param: value} if kernel_filter.param and value is not None else {}
+            await self.process_image(ctx, kernel_filter.name, **params)
 
-                # Save the processed image
-                new_path = img1.save_img()
+        self.client.command(name=kernel_filter.name, help=kernel_filter.description)(apply_kernel_filter)
 
-                # Send the processed image
-                await ctx.send(f"Concatenated images {direction}ly:", file=discord.File(new_path))
-            except Exception as e:
-                logger.error(f"Error concatenating images: {e}")
-                await ctx.send(f"Error concatenating images: {e}")
+    async def start(self):
+        """Start the prediction expiry sweeper, health probes, model warm-up (and local workers, if any) alongside the Discord bot"""
+        expiry_task = asyncio.create_task(self.predictions.run_expiry())
+        health_task = asyncio.create_task(self.health.run())
+        warmer_task = asyncio.create_task(self.model_warmer.run()) if self.ollama_warmup else None
+        workers_stop = threading.Event()
+        if self.split_mode and self.job_queue.in_process:
+            # An in-process queue is only visible to this process, so run its workers as threads here
+            worker_count = int(os.environ.get('WORKER_PROCESSES', 1))
+            for i in range(worker_count):
+                worker = ImageWorker(self.job_queue, self.token)
+                threading.Thread(target=worker.run, args=(workers_stop,), name=f"image-worker-{i}", daemon=True).start()
+        try:
+            await super().start()
+        finally:
+            expiry_task.cancel()
+            health_task.cancel()
+            if warmer_task is not None:
+                warmer_task.cancel()
+            workers_stop.set()
 
     async def process_image(self, ctx, operation, **kwargs):
         """Process an image attachment with the specified operation"""
@@ -470,49 +661,168 @@ class ImageProcessingBot(Bot):
             await ctx.send("The attachment must be an image.")
             return
 
-        # Download the image
+        if self.split_mode:
+            job = ImageJob(operation, kwargs, attachment.url, attachment.filename, ctx.channel.id, ctx.message.id)
+            await asyncio.to_thread(self.job_queue.put, job)
+            logger.info(f"Queued job {job.job_id}: {operation} {kwargs}")
+            await ctx.send(f"📥 Your image is queued for {operation}. I'll reply with the result shortly.")
+            return
+
+        # Profile the request if it turns out to be slow
+        with self.profiler.capture(operation), self.memory.measure(operation) as memory:
+            preview_msg = None
+            try:
+                logger.info(f"Processing image with operation: {operation}")
+                file_path = await self.download_user_photo(ctx.message)
+                logger.info(f"Downloaded image to: {file_path}")
+
+                # Process image
+                img = Img(file_path)
+                logger.info(f"Created Img object from: {file_path}")
+
+                height, width = img.get_dimensions()
+                memory.megapixels = height * width / 1e6
+                if height * width < self.preview_min_pixels:
+                    self.apply_operation(img, operation, kwargs)
+                else:
+                    # Big image: filter in the background and show a preview of a small proxy meanwhile.
+                    # The proxy is taken before the filter starts mutating img in place.
+                    preview, scale = await profiled_to_thread(img.proxy, self.preview_max_side)
+                    full_task = asyncio.create_task(profiled_to_thread(self.apply_operation, img, operation, kwargs))
+                    preview_msg = await self.send_preview(ctx, preview, scale, operation, kwargs, full_task)
+                    await full_task
+
+                logger.info(f"Filter {operation} applied successfully, result stats: {img.get_stats()}")
+
+                # Save the processed image
+                new_path = img.save_img(auto_upload_s3=False)
+                self.storage.record(new_path)
+                logger.info(f"Image saved to: {new_path}")
+                await self.deliver_result(ctx, img, operation, new_path, preview_msg)
+            except Exception as e:
+                logger.error(f"Error processing image: {e}")
+                import traceback
+                logger.error(f"Traceback: {traceback.format_exc()}")
+                if preview_msg is not None:
+                    # Don't leave a preview promising a result that isn't coming
+                    try:
+                        await preview_msg.delete()
+                    except discord.HTTPException as delete_error:
+                        logger.warning(f"Could not delete {operation} preview: {delete_error}")
+                await ctx.send(f"Error processing image: {e}")
+
+    async def deliver_result(self, ctx, img, operation, new_path, preview_msg=None):
+        """
+        Upload a saved result to S3 and send it to the channel
+
+        Results larger than the link threshold are sent as a small thumbnail and a
+        presigned link to the S3 copy, so the full file doesn't go through the bot's
+        Discord upload. Smaller results (or when the link can't be made) are attached,
+        encoded to fit Discord's upload limit. Replaces preview_msg if given.
+        """
+        s3_manager = img.s3_manager
+        size = new_path.stat().st_size
+        if self.link_threshold and size > self.link_threshold and s3_manager.bucket_name:
+            url = await profiled_to_thread(s3_manager.share_file, new_path)
+            if url:
+                def thumbnail():
+                    thumb, _ = img.proxy(self.thumbnail_max_side)
+                    return thumb.encode()
+
+                encoded = await profiled_to_thread(thumbnail)
+                expiry_minutes = s3_manager.presign_expiry // 60
+                content = (f"Processed image with {operation} ({size / 1024 ** 2:.1f} MiB): "
+                           f"[download full resolution]({url}) (link expires in {expiry_minutes} min)")
+                thumb_file = discord.File(encoded.buffer, filename=f"{new_path.stem}_thumb{encoded.extension}")
+                await self._send_result(ctx, content, thumb_file, preview_msg)
+                logger.info(f"Sent thumbnail and S3 link for {new_path.name} ({size} bytes)")
+                return
+            logger.warning(f"Could not share {new_path.name} through S3, attaching it instead")
+        else:
+            await profiled_to_thread(s3_manager.upload_file, new_path)
+
+        # Send the processed image from memory, encoded to fit Discord's upload limit
+        encoded = await profiled_to_thread(img.encode)
+        result_file = discord.File(encoded.buffer, filename=new_path.stem + encoded.extension)
+        await self._send_result(ctx, f"Processed image with {operation}:", result_file, preview_msg)
+        logger.info(f"Sent processed image to Discord")
+
+    @staticmethod
+    async def _send_result(ctx, content, file, preview_msg=None):
+        if preview_msg is not None:
+            # Swap the preview for the result
+            await preview_msg.edit(content=content, attachments=[file])
+        else:
+            await ctx.send(content, file=file)
+
+    @staticmethod
+    def apply_operation(img, operation, kwargs):
+        """Apply a named filter operation to an Img"""
+        if operation == 'blur':
+            blur_level = kwargs.get('blur_level', 16)
+            logger.info(f"Applying blur with level: {blur_level}")
+            img.blur(blur_level=blur_level)
+        elif operation == 'contour':
+            logger.info("Applying contour filter")
+            img.contour()
+        elif operation == 'rotate':
+            logger.info("Applying rotation")
+            img.rotate()
+        elif operation == 'salt_n_pepper':
+            logger.info("Applying salt and pepper noise")
+            img.salt_n_pepper()
+        elif operation == 'segment':
+            logger.info(f"Applying segmentation: {kwargs}")
+            img.segment(threshold=kwargs.get('threshold'), mode=kwargs.get('mode', 'mean'),
+                        window=kwargs.get('window', 31), offset=kwargs.get('offset', 0.0))
+        elif operation in KERNEL_FILTERS:
+            logger.info(f"Applying {operation} filter: {kwargs}")
+            img.filter(operation, **kwargs)
+
+    @staticmethod
+    def scale_params(operation, kwargs, scale):
+        """Scale size-like filter parameters so a proxy of the given scale looks like the full result"""
+        scaled = dict(kwargs)
+        # Defaults are scaled too, or the preview of a plain command comes out far blurrier/coarser
+        if operation == 'blur':
+            scaled['blur_level'] = max(1, round(kwargs.get('blur_level', 16) * scale))
+        elif operation == 'gaussian':
+            scaled['sigma'] = float(kwargs.get('sigma', 2.0)) * scale
+        elif operation == 'segment':
+            if kwargs.get('mode') == 'adaptive' and kwargs.get('threshold') is None:
+                scaled['window'] = max(1, round(kwargs.get('window', 31) * scale))
+        elif 'sigma' in kwargs:
+            scaled['sigma'] = kwargs['sigma'] * scale
+        return scaled
+
+    async def send_preview(self, ctx, preview, scale, operation, kwargs, full_task):
+        """
+        Filter a downscaled proxy and send it, unless that takes longer than the preview budget
+
+        Args:
+            preview: Proxy from Img.proxy, taken before full_task started filtering the original
+            scale: The proxy's scale relative to the original
+
+        Returns:
+            The preview message, or None if no preview was sent (too slow, or the full result came first)
+        """
+        def render():
+            self.apply_operation(preview, operation, self.scale_params(operation, kwargs, scale))
+            return preview.encode()
+
+        render_task = asyncio.ensure_future(profiled_to_thread(render))
+        done, _ = await asyncio.wait({render_task, full_task}, timeout=self.preview_budget,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if render_task not in done or full_task.done():
+            logger.info(f"Skipping {operation} preview ({'full result ready' if full_task.done() else 'over budget'})")
+            return None
         try:
-            logger.info(f"Processing image with operation: {operation}")
-            file_path = await self.download_user_photo(ctx.message)
-            logger.info(f"Downloaded image to: {file_path}")
-
-            # Process image
-            img = Img(file_path)
-            logger.info(f"Created Img object from: {file_path}")
-
-            # Apply the requested operation
-            if operation == 'blur':
-                blur_level = kwargs.get('blur_level', 16)
-                logger.info(f"Applying blur with level: {blur_level}")
-                img.blur(blur_level=blur_level)
-            elif operation == 'contour':
-                logger.info("Applying contour filter")
-                img.contour()
-            elif operation == 'rotate':
-                logger.info("Applying rotation")
-                img.rotate()
-            elif operation == 'salt_n_pepper':
-                logger.info("Applying salt and pepper noise")
-                img.salt_n_pepper()
-            elif operation == 'segment':
-                logger.info("Applying segmentation")
-                img.segment()
-
-            logger.info(f"Filter {operation} applied successfully")
-
-            # Save the processed image
-            logger.info("Saving processed image and uploading to S3...")
-            new_path = img.save_img()
-            logger.info(f"Image saved to: {new_path}")
-
-            # Send the processed image
-            await ctx.send(f"Processed image with {operation}:", file=discord.File(new_path))
-            logger.info(f"Sent processed image to Discord")
+            encoded = render_task.result()
         except Exception as e:
-            logger.error(f"Error processing image: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            await ctx.send(f"Error processing image: {e}")
+            logger.warning(f"Could not render {operation} preview: {e}")
+            return None
+        return await ctx.send(f"👀 Preview of {operation} - full resolution on its way...",
+                              file=discord.File(encoded.buffer, filename=f"preview{encoded.extension}"))
 
     async def detect_objects(self, ctx):
         """Send image to YOLO service for object detection"""
@@ -525,115 +835,124 @@ class ImageProcessingBot(Bot):
             await ctx.send("The attachment must be an image.")
             return
 
-        # Download the image
-        try:
-            file_path = await self.download_user_photo(ctx.message)
+        # Profile the request if it turns out to be slow
+        with self.profiler.capture('detect'):
+            try:
+                # Keep the attachment in memory - YOLO gets the bytes directly
+                image_bytes = await attachment.read()
+
+                if self.yolo_async:
+                    await self.submit_detection(ctx, attachment, image_bytes)
+                    return
 
-            # Let the user know we're working on it
-            processing_msg = await ctx.send("🔍 Detecting objects in your image... Please wait.")
+                # Let the user know we're working on it
+                processing_msg = await ctx.send("🔍 Detecting objects in your image... Please wait.")
 
-            # Send the image to YOLO service
-            with open(file_path, 'rb') as img_file:
                 try:
-                    # FIXED LINE: Removed the "/predict" from the URL since it's already in self.yolo_url
-                    logger.info(f"[DEBUG] Sending request to: {self.yolo_url}")
-                    response = requests.post(
-                        self.yolo_url,
-                        files={"file": img_file}
-                    )
-
-                    # Check if the request was successful
-                    if response.status_code != 200:
-                        await processing_msg.edit(
-                            content=f"Error: YOLO service returned status code {response.status_code}")
-                        return
-
-                    # Parse the result
-                    result = response.json()
-
-                    # Extract detected objects
-                    objects = result.get("labels", [])
-                    count = result.get("detection_count", 0)
-
-                    if count == 0:
-                        await processing_msg.edit(content="No objects detected in the image.")
-                    else:
-                        # Count occurrences of each object
-                        object_counts = {}
-                        for obj in objects:
-                            object_counts[obj] = object_counts.get(obj, 0) + 1
-
-                        # Format the result message
-                        if count == 1:
-                            detection_msg = f"I detected 1 object in your image:"
-                        else:
-                            detection_msg = f"I detected {count} objects in your image:"
-
-                        # Add detected objects with counts
-                        for obj, cnt in object_counts.items():
-                            if cnt == 1:
-                                detection_msg += f"\n• {obj}"
-                            else:
-                                detection_msg += f"\n• {obj} ({cnt})"
-
-                        await processing_msg.edit(content=detection_msg)
+                    result = await profiled_to_thread(self.yolo_client.detect, image_bytes, attachment.filename)
+                except requests.HTTPError as e:
+                    await processing_msg.edit(
+                        content=f"Error: YOLO service returned status code {e.response.status_code}")
+                    return
                 except requests.RequestException as e:
                     logger.error(f"Error connecting to YOLO service: {e}")
                     await processing_msg.edit(
                         content=f"Error: Could not connect to the YOLO service. Please try again later.")
-        except Exception as e:
-            logger.error(f"Error during object detection: {e}")
-            await ctx.send(f"Error during object detection: {e}")
+                    return
+
+                await processing_msg.edit(content=self.format_detections(result))
+            except Exception as e:
+                logger.error(f"Error during object detection: {e}")
+                await ctx.send(f"Error during object detection: {e}")
+
+    async def submit_detection(self, ctx, attachment, image_bytes):
+        """Submit an asynchronous YOLO job; the callback edits the placeholder message"""
+        cached = self.yolo_client.cached(image_bytes)
+        if cached is not None:
+            await ctx.send(self.format_detections(cached))
+            return
+
+        processing_msg = await ctx.send("🔍 Detecting objects in your image... I'll update this message when the results are in.")
+        prediction_id = self.predictions.register(processing_msg, self.yolo_client.content_hash(image_bytes))
+        callback_url = f"{self.yolo_callback_url.rstrip('/')}/predictions/{prediction_id}"
+
+        try:
+            result = await profiled_to_thread(
+                self.yolo_client.submit, image_bytes, attachment.filename, prediction_id, callback_url)
+        except requests.HTTPError as e:
+            self.predictions.discard(prediction_id)
+            await processing_msg.edit(content=f"Error: YOLO service returned status code {e.response.status_code}")
+        except requests.RequestException as e:
+            self.predictions.discard(prediction_id)
+            logger.error(f"Error connecting to YOLO service: {e}")
+            await processing_msg.edit(content=f"Error: Could not connect to the YOLO service. Please try again later.")
+        else:
+            if result is not None:
+                # YOLO answered synchronously instead of calling back
+                await self.predictions.resolve(prediction_id, result)
+
+    async def _deliver_prediction(self, pending, result):
+        """Edit the placeholder message of a pending prediction with its result"""
+        if pending.cache_key:
+            self.yolo_client.cache.set(pending.cache_key, result)
+        try:
+            await pending.message.edit(content=self.format_detections(result))
+        except discord.HTTPException as e:
+            logger.error(f"Could not deliver prediction {pending.prediction_id}: {e}")
+
+    async def _expire_prediction(self, pending):
+        await pending.message.edit(content="⏱️ Object detection timed out. Please try again later.")
+
+    @staticmethod
+    def format_detections(result):
+        """Format a YOLO prediction result as a chat message"""
+        # Extract detected objects
+        objects = result.get("labels", [])
+        count = result.get("detection_count", 0)
+
+        if count == 0:
+            return "No objects detected in the image."
+
+        # Count occurrences of each object
+        object_counts = {}
+        for obj in objects:
+            object_counts[obj] = object_counts.get(obj, 0) + 1
+
+        # Format the result message
+        if count == 1:
+            detection_msg = f"I detected 1 object in your image:"
+        else:
+            detection_msg = f"I detected {count} objects in your image:"
+
+        # Add detected objects with counts
+        for obj, cnt in object_counts.items():
+            if cnt == 1:
+                detection_msg += f"\n• {obj}"
+            else:
+                detection_msg += f"\n• {obj} ({cnt})"
+        return detection_msg
+
+    @staticmethod
+    def queue_position_reporter(message, waiting_text):
+        """Build an LLM scheduler callback that shows the queue position in the waiting message"""
+        async def report(position):
+            if position:
+                await message.edit(content=f"{waiting_text}\n⏳ You're #{position} in the queue.")
+            else:
+                await message.edit(content=waiting_text)
+        return report
 
     async def ask_ollama(self, ctx, question):
         """Send a question to Ollama and return the response"""
         # Let the user know we're working on it
-        processing_msg = await ctx.send(f"🤔 Thinking about: '{question}' ... Please wait.")
+        waiting_text = f"🤔 Thinking about: '{question}' ... Please wait."
+        processing_msg = await ctx.send(waiting_text)
 
         try:
-            # Ensure model name includes the tag for specific model version (e.g., gemma3:1b)
-            model_name = self.ollama_model
-
-            # Prepare the data for the Ollama API - Using the proper format for Ollama API
-            data = {
-                "model": model_name,
-                "messages": [{"role": "user", "content": question}],
-                "stream": False
-            }
-
-            # The correct endpoint is /api/chat for chat-based interactions
-            api_endpoint = self.ollama_url
-            if not api_endpoint.endswith('/api/chat'):
-                # If the URL doesn't end with /api/chat, ensure we're using the right endpoint
-                api_endpoint = api_endpoint.rstrip('/') + '/api/chat'
-
-            # Log the request details for debugging
-            logger.info(f"[DEBUG] Sending request to Ollama: {api_endpoint}")
-            logger.info(f"[DEBUG] Using model: {model_name}")
-            logger.info(f"[DEBUG] Request data: {data}")
-
-            # Send the request to the Ollama API
-            response = requests.post(
-                api_endpoint,
-                json=data,
-                headers={"Content-Type": "application/json"},
-                timeout=180  # Updated timeout to 3 minutes
-            )
-
-            # Check if the request was successful
-            if response.status_code != 200:
-                logger.error(f"[ERROR] Ollama returned status code {response.status_code}")
-                logger.error(f"[ERROR] Response content: {response.text}")
-                await processing_msg.edit(
-                    content=f"Error: Ollama service returned status code {response.status_code}. Please check your server configuration.")
-                return
-
-            # Parse the result
-            result = response.json()
-            logger.info(f"[DEBUG] Response received: {result}")
-
-            # Extract the response - updated for chat API response format
-            ai_response = result.get("message", {}).get("content", "I'm sorry, I couldn't generate a response.")
+            # Identical questions share one generation (in flight or cached)
+            ai_response = await self.ollama_client.ask(
+                question, ctx.author.id, self.queue_position_reporter(processing_msg, waiting_text))
+            ai_response = ai_response or "I'm sorry, I couldn't generate a response."
 
             # Format and send the response
             formatted_response = f"**Question:** {question}\n\n**Answer:** {ai_response}"
@@ -642,6 +961,9 @@ class ImageProcessingBot(Bot):
             if len(formatted_response) > 1990:
                 formatted_response = formatted_response[:1990] + "..."
             await processing_msg.edit(content=formatted_response)
+        except requests.HTTPError as e:
+            await processing_msg.edit(
+                content=f"Error: Ollama service returned status code {e.response.status_code}. Please check your server configuration.")
         except requests.RequestException as e:
             logger.error(f"Error connecting to Ollama service: {e}")
             await processing_msg.edit(
@@ -652,44 +974,18 @@ class ImageProcessingBot(Bot):
 
     async def song_recommendation_flow(self, ctx):
         """Interactive flow to get song recommendations based on user preferences"""
-        # Add user to active conversations to prevent default handler from responding
-        self.active_conversations.add(ctx.author.id)
-
         # Let the user know we're starting the recommendation flow
         await ctx.send(
             "🎵 Welcome to Song Recommendations! I'll ask you a few questions to find the perfect songs for you.")
 
-        # Dictionary to store user preferences
-        preferences = {}
-
-        # Ask questions and wait for responses
-        questions = [
-            {"key": "language",
-             "question": "What language would you prefer for the songs? (e.g., English, Spanish, Korean, etc.)"},
-            {"key": "genre",
-             "question": "What genre of music do you like? (e.g., Pop, Rock, Hip-hop, Jazz, Classical, etc.)"},
-            {"key": "mood", "question": "What mood are you in? (e.g., Happy, Sad, Energetic, Relaxed, etc.)"},
-            {"key": "era",
-             "question": "From which time period would you prefer songs? (e.g., 60s, 80s, 90s, 2000s, 2010s, Recent, etc.)"},
-            {"key": "artist_type", "question": "Do you prefer solo artists or bands? (or type 'any' if no preference)"}
-        ]
-
-        # Function to check if the message is from the original user in the same channel
-        def check(message):
-            return message.author == ctx.author and message.channel == ctx.channel
-
-        try:
-            # Ask each question and wait for response
-            for q in questions:
-                await ctx.send(q["question"])
-                try:
-                    # Wait for user response with a timeout of 60 seconds
-                    response = await self.client.wait_for('message', check=check, timeout=60)
-                    preferences[q["key"]] = response.content
-                except asyncio.TimeoutError:
-                    await ctx.send("You took too long to respond. Song recommendation cancelled.")
-                    self.active_conversations.remove(ctx.author.id)  # Remove from active conversations
-                    return
+        # Replies from this user in this channel are routed to the conversation
+        with self.conversations.open(ctx.author.id, ctx.channel.id) as conversation:
+            try:
+                # Wait up to 60 seconds for each answer
+                preferences = await conversation.collect(ctx.send, self.SONGREC_STEPS, timeout=60)
+            except asyncio.TimeoutError:
+                await ctx.send("You took too long to respond. Song recommendation cancelled.")
+                return
 
             # Confirmation message
             await ctx.send("Thanks for your preferences! Searching for song recommendations now... 🔍")
@@ -719,7 +1015,12 @@ IMPORTANT:
 - Only recommend songs that are actually available on YouTube
 - Test each YouTube link to ensure it's a valid, working link to an existing video
 
-Example of good formatting for one song:
+"""
+            if self.songrec_json:
+                # Ollama constrains the reply to valid JSON, so parsing is a single json.loads
+                prompt += JSON_FORMAT_INSTRUCTIONS
+            else:
+                prompt += """Example of good formatting for one song:
 
 1. Song Title: Example Song
 Artist Name: Example Artist
@@ -730,50 +1031,20 @@ Description: This upbeat track perfectly captures the happy mood with its catchy
 
             # Send the request to Ollama
             await self.get_song_recommendations(ctx, prompt, preferences)
-        finally:
-            # Always remove from active conversations when done
-            if ctx.author.id in self.active_conversations:
-                self.active_conversations.remove(ctx.author.id)
 
     async def get_song_recommendations(self, ctx, prompt, preferences):
         """Get song recommendations from Ollama based on user preferences"""
         # Let the user know we're working on it
-        processing_msg = await ctx.send("🎧 Finding the perfect songs for you... Please wait.")
+        waiting_text = "🎧 Finding the perfect songs for you... Please wait."
+        processing_msg = await ctx.send(waiting_text)
 
         try:
-            # Prepare the data for the Ollama API
-            data = {
-                "model": self.ollama_model,
-                "messages": [{"role": "user", "content": prompt}],
-                "stream": False
-            }
-
-            # The correct endpoint is /api/chat for chat-based interactions
-            api_endpoint = self.ollama_url
-            if not api_endpoint.endswith('/api/chat'):
-                api_endpoint = api_endpoint.rstrip('/') + '/api/chat'
-
-            # Send the request to the Ollama API
-            response = requests.post(
-                api_endpoint,
-                json=data,
-                headers={"Content-Type": "application/json"},
-                timeout=180  # Updated timeout to 3 minutes
-            )
-
-            # Check if the request was successful
-            if response.status_code != 200:
-                logger.error(f"[ERROR] Ollama returned status code {response.status_code}")
-                logger.error(f"[ERROR] Response content: {response.text}")
-                await processing_msg.edit(
-                    content=f"Error: Couldn't get song recommendations. Please try again later.")
-                return
-
-            # Parse the result
-            result = response.json()
-
-            # Extract the response
-            ai_response = result.get("message", {}).get("content", "I couldn't generate song recommendations.")
+            # Personal prompts aren't worth caching; long generations queue behind !ask questions
+            ai_response = await self.ollama_client.generate(
+                [{"role": "user", "content": prompt}], ctx.author.id, PRIORITY_BATCH,
+                self.queue_position_reporter(processing_msg, waiting_text),
+                response_format='json' if self.songrec_json else None)
+            ai_response = ai_response or "I couldn't generate song recommendations."
 
             # Process the AI response to format it better and fix links
             processed_response = self.process_song_recommendations(ai_response)
@@ -797,6 +1068,9 @@ Description: This upbeat track perfectly captures the happy mood with its catchy
             else:
                 await processing_msg.edit(content=formatted_response)
 
+        except requests.HTTPError:
+            await processing_msg.edit(
+                content=f"Error: Couldn't get song recommendations. Please try again later.")
         except requests.RequestException as e:
             logger.error(f"Error connecting to Ollama service: {e}")
             await processing_msg.edit(
@@ -807,67 +1081,8 @@ Description: This upbeat track perfectly captures the happy mood with its catchy
 
     def process_song_recommendations(self, ai_response):
         """Process the AI response to format song recommendations better"""
-        # Create a more structured format for the recommendations
         try:
-            # First, try to extract song information using regex patterns
-            import re
-
-            # Clean up the response - remove any markdown formatting that might interfere
-            cleaned_response = ai_response.replace("*", "").replace(",\n", "\n").replace(".,", ".")
-
-            # Initialize the formatted output
-            formatted_output = ""
-
-            # Find all songs in the response
-            songs = re.findall(
-                r'(?:Song Title:|^\d+\.\s+)([^,\n]+).*?Artist Name:([^,\n]+).*?Year of Release:([^,\n]+).*?YouTube Link:.*?\[(.*?)\]\((.*?)\).*?Description:([^,\n]+)',
-                cleaned_response, re.DOTALL | re.MULTILINE)
-
-            # If no songs found with the pattern, try an alternative pattern
-            if not songs:
-                songs = re.findall(
-                    r'(?:Song Title:|^\d+\.\s+)([^,\n]+).*?Artist Name:([^,\n]+).*?Year of Release:([^,\n]+).*?YouTube Link:(?:\s+)?(https?://[^\s]+).*?Description:([^,\n]+)',
-                    cleaned_response, re.DOTALL | re.MULTILINE)
-
-            # If still no songs found, try another pattern that might match the format
-            if not songs:
-                songs = re.findall(
-                    r'(?:Song Title:|^\d+\.\s+)(.*?)(?:Artist Name:|👤\s+Artist:)(.*?)(?:Year of Release:|📅\s+Year:)(.*?)(?:YouTube Link:|🎵\s+Link:)(.*?)(?:Description:|💬)(.*?)(?:\n\n|$)',
-                    cleaned_response, re.DOTALL | re.MULTILINE)
-
-            # If still no songs found, return the original response
-            if not songs:
-                return ai_response
-
-            # Format each song
-            for i, song in enumerate(songs, 1):
-                if len(song) >= 5:  # Make sure we have all the needed parts
-                    title = song[0].strip()
-                    artist = song[1].strip()
-                    year = song[2].strip()
-
-                    # Handle different link formats
-                    if len(song) == 6:  # First pattern with markdown link
-                        link_text = song[3].strip()
-                        link_url = song[4].strip()
-                        description = song[5].strip()
-                    else:  # Second pattern with direct URL
-                        link_url = song[3].strip()
-                        description = song[4].strip()
-
-                    # Format the song information
-                    formatted_output += f"**{i}. {title}** by {artist} ({year})\n"
-                    formatted_output += f"🎬 [Watch on YouTube]({link_url})\n"
-
-                    # Add Spotify link
-                    spotify_search = f"{title} {artist}".replace(' ', '%20')
-                    spotify_app_link = f"spotify:search:{spotify_search}"
-                    spotify_web_link = f"https://open.spotify.com/search/{spotify_search}/tracks"
-
-                    formatted_output += f"💬 {description}\n\n"
-
-            return formatted_output
-
+            return format_song_recommendations(ai_response)
         except Exception as e:
             logger.error(f"Error formatting song recommendations: {e}")
             # Return the original response if there was an error in formatting
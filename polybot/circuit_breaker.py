@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+import requests
+from typing import Callable, Optional
+from loguru import logger
+from opentelemetry import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+meter = metrics.get_meter(__name__)
+circuit_transitions_counter = meter.create_counter(
+    "polybot_circuit_transitions_total",
+    description="Circuit breaker state changes by backend and new state"
+)
+
+
+class CircuitOpenError(requests.RequestException):
+    """The backend is failing and calls to it are rejected without being sent"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open, retrying in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Connection errors, timeouts and 5xx responses count against the backend; 4xx responses don't"""
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is None or response.status_code >= 500
+    return isinstance(error, requests.RequestException)
+
+
+class CircuitBreaker:
+    """
+    Fails calls to a backend fast once it has failed several times in a row
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    raise CircuitOpenError immediately instead of waiting for a connection
+    timeout. After reset_timeout one trial call is let through (half-open): if
+    it succeeds the circuit closes, otherwise it opens for another reset_timeout.
+
+    Usage:
+        with breaker:
+            response = requests.post(...)
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold if failure_threshold is not None else int(
+            os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 3))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(
+            os.environ.get('CIRCUIT_RESET_TIMEOUT', 30))
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        circuit_transitions_counter.add(1, {"backend": self.name, "state": state})
+        if state == OPEN:
+            logger.warning(f"{self.name} circuit opened after {self.failures} consecutive failure(s), "
+                           f"failing fast for {self.reset_timeout:.0f}s")
+        else:
+            logger.info(f"{self.name} circuit {state.replace('_', '-')}")
+
+    def check(self):
+        """
+        Raise if a call may not be made now; in half-open state, reserve the single trial call
+
+        Raises:
+            CircuitOpenError: the circuit is open, or half-open with a trial already running
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            retry_after = self.opened_at + self.reset_timeout - self.clock()
+            if self.state == OPEN and retry_after <= 0:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(self.name, max(0.0, retry_after))
+
+    def reject_if_open(self):
+        """Raise CircuitOpenError while the circuit is open, without reserving a trial call"""
+        retry_after = self.retry_after
+        if retry_after:
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self._transition(OPEN)
+
+    def _release_trial(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def __enter__(self):
+        self.check()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.record_success()
+        elif is_backend_failure(exc):
+            self.record_failure()
+        elif isinstance(exc, requests.HTTPError):
+            # The backend answered (e.g. 4xx for a bad request), so it is up
+            self.record_success()
+        else:
+            # Not the backend's fault - let another trial through
+            self._release_trial()
+        return False
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        """Seconds until the next trial call, or None if the circuit isn't open"""
+        with self._lock:
+            if self.state != OPEN:
+                return None
+            return max(0.0, self.opened_at + self.reset_timeout - self.clock())
@@ -0,0 +1,150 @@
+import os
+import time
+import asyncio
+import contextlib
+from typing import Any, Awaitable, Callable, Hashable, List, Optional, Tuple
+from loguru import logger
+
+_EXPIRED = object()
+
+
+class Step:
+    """One question of a multi-step conversation"""
+
+    def __init__(self, key: str, prompt: str, parse: Optional[Callable[[str], Any]] = None,
+                 retry_prompt: Optional[str] = None):
+        """
+        Args:
+            key: Name the answer is stored under
+            prompt: Question sent to the user
+            parse: Converts the reply; raising ValueError asks again
+            retry_prompt: Sent instead of the prompt when the reply didn't parse
+        """
+        self.key = key
+        self.prompt = prompt
+        self.parse = parse
+        self.retry_prompt = retry_prompt or prompt
+
+
+class Conversation:
+    """Messages from one user in one channel, delivered while a flow is waiting for them"""
+
+    def __init__(self, key: Tuple[Hashable, Hashable], ttl: float):
+        self.key = key
+        self.ttl = ttl
+        self.expires_at = time.monotonic() + ttl
+        self._messages = asyncio.Queue()
+
+    def deliver(self, message):
+        self.expires_at = time.monotonic() + self.ttl
+        self._messages.put_nowait(message)
+
+    def expire(self):
+        self._messages.put_nowait(_EXPIRED)
+
+    async def next_message(self, timeout: Optional[float] = None):
+        """
+        Wait for the user's next message
+
+        Raises:
+            asyncio.TimeoutError: nothing arrived within timeout, or the conversation expired
+        """
+        message = await asyncio.wait_for(self._messages.get(), timeout)
+        if message is _EXPIRED:
+            raise asyncio.TimeoutError("Conversation expired")
+        return message
+
+    async def collect(self, send: Callable[[str], Awaitable[Any]], steps: List[Step],
+                      timeout: Optional[float] = None) -> dict:
+        """
+        Ask each step's question in turn and gather the answers
+
+        Raises:
+            asyncio.TimeoutError: the user stopped answering
+        """
+        answers = {}
+        for step in steps:
+            await send(step.prompt)
+            while True:
+                content = (await self.next_message(timeout)).content
+                if step.parse is None:
+                    answers[step.key] = content
+                    break
+                try:
+                    answers[step.key] = step.parse(content)
+                    break
+                except ValueError:
+                    await send(step.retry_prompt)
+        return answers
+
+
+class ConversationManager:
+    """
+    Routes messages to multi-step flows by (user, channel)
+
+    Each incoming message costs one dict lookup however many flows are active,
+    instead of running every waiting flow's check predicate. Conversations idle
+    for longer than ttl are expired by run_expiry, so a flow that never finished
+    can't keep capturing a user's messages.
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl if ttl is not None else float(os.environ.get('CONVERSATION_TTL', 300))
+        self._conversations = {}
+
+    def start(self, user_id: Hashable, channel_id: Hashable) -> Conversation:
+        """Begin a conversation, replacing (and expiring) any previous one with the same user and channel"""
+        key = (user_id, channel_id)
+        previous = self._conversations.get(key)
+        if previous is not None:
+            previous.expire()
+        conversation = Conversation(key, self.ttl)
+        self._conversations[key] = conversation
+        return conversation
+
+    def end(self, conversation: Conversation):
+        if self._conversations.get(conversation.key) is conversation:
+            del self._conversations[conversation.key]
+
+    @contextlib.contextmanager
+    def open(self, user_id: Hashable, channel_id: Hashable):
+        """A conversation that ends when the block exits"""
+        conversation = self.start(user_id, channel_id)
+        try:
+            yield conversation
+        finally:
+            self.end(conversation)
+
+    def is_active(self, user_id: Hashable, channel_id: Hashable) -> bool:
+        return (user_id, channel_id) in self._conversations
+
+    def dispatch(self, message) -> bool:
+        """
+        Hand a message to the conversation waiting for it
+
+        Returns:
+            True if the message belonged to an active conversation
+        """
+        conversation = self._conversations.get((message.author.id, message.channel.id))
+        if conversation is None:
+            return False
+        conversation.deliver(message)
+        return True
+
+    def expire(self) -> list:
+        """Remove and wake all conversations idle past their TTL"""
+        now = time.monotonic()
+        expired = [c for c in self._conversations.values() if c.expires_at <= now]
+        for conversation in expired:
+            del self._conversations[conversation.key]
+            conversation.expire()
+        return expired
+
+    async def run_expiry(self, interval: float = 30.0):
+        while True:
+            await asyncio.sleep(interval)
+            for conversation in self.expire():
+                logger.info(f"Conversation {conversation.key} expired after {self.ttl}s idle")
+
+    def __len__(self):
+        return len(self._conversations)
@@ -0,0 +1,131 @@
+import os
+import math
+from io import BytesIO
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from loguru import logger
+from polybot.startup import startup_timer
+
+# Discord's attachment limit for servers without boosts
+DEFAULT_UPLOAD_LIMIT = 8 * 1024 * 1024
+
+_EXTENSIONS = {'PNG': '.png', 'WEBP': '.webp', 'JPEG': '.jpg'}
+
+
+class EncodedImage:
+    """An image encoded in memory, ready to be sent as discord.File(buffer, filename)"""
+
+    def __init__(self, data: bytes, image_format: str, quality: Optional[int], size: Tuple[int, int]):
+        self.data = data
+        self.format = image_format
+        self.quality = quality
+        self.size = size
+
+    @property
+    def extension(self) -> str:
+        return _EXTENSIONS[self.format]
+
+    @property
+    def buffer(self) -> BytesIO:
+        """A fresh stream over the encoded bytes"""
+        return BytesIO(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def upload_limit() -> int:
+    return int(os.environ.get('DISCORD_UPLOAD_LIMIT', DEFAULT_UPLOAD_LIMIT))
+
+
+def _encode(image, image_format: str, quality: Optional[int] = None) -> bytes:
+    buffer = BytesIO()
+    if image_format == 'PNG':
+        image.save(buffer, format='PNG', optimize=True)
+    else:
+        image.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def _best_quality(image, image_format: str, max_bytes: int, min_quality: int, max_quality: int):
+    """
+    Binary search for the highest quality whose output fits in max_bytes
+
+    Encoded size grows monotonically with quality, so about log2(range) encodes
+    are needed instead of one per quality step.
+
+    Returns:
+        (quality, bytes), or (None, size at min_quality) if even min_quality is too large
+    """
+    best = None
+    smallest = None
+    low, high = min_quality, max_quality
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(image, image_format, quality)
+        if len(data) <= max_bytes:
+            best = quality, data
+            low = quality + 1
+        else:
+            # When nothing fits the search ends by trying min_quality
+            smallest = len(data)
+            high = quality - 1
+    return (best, None) if best is not None else (None, smallest)
+
+
+def encode_to_budget(pixels: np.ndarray, max_bytes: int, formats: Sequence[str] = ('PNG', 'WEBP', 'JPEG'),
+                     min_quality: int = 40, max_quality: int = 95, min_scale: float = 0.1) -> EncodedImage:
+    """
+    Encode an image so that it fits in max_bytes, keeping as much quality as possible
+
+    PNG is used if the lossless output already fits. Otherwise each lossy format
+    gets a binary search over quality and the highest quality wins (WebP usually
+    reaches a higher quality than JPEG at the same size). If nothing fits even at
+    min_quality, the image is downscaled in proportion to the overshoot and the
+    search repeats.
+
+    Args:
+        pixels: uint8 array, (height x width) grayscale or (height x width x channels)
+        max_bytes: Size budget for the encoded output
+        formats: Formats to try, among PNG, WEBP and JPEG
+
+    Raises:
+        ValueError: the image can't fit in max_bytes even at min_scale
+    """
+    Image = startup_timer.lazy_import('PIL.Image')
+    image = Image.fromarray(pixels)
+    original_size = image.size
+    if 'PNG' in formats:
+        data = _encode(image, 'PNG')
+        if len(data) <= max_bytes:
+            return EncodedImage(data, 'PNG', None, image.size)
+
+    lossy = [f for f in formats if f in ('WEBP', 'JPEG')]
+    if not lossy:
+        raise ValueError(f"Lossless output is larger than {max_bytes} bytes and no lossy format is allowed")
+
+    scale = 1.0
+    while True:
+        candidates = []
+        smallest = None
+        for image_format in lossy:
+            # JPEG has no alpha channel
+            source = image.convert('RGB') if image_format == 'JPEG' and image.mode in ('RGBA', 'LA') else image
+            best, size_at_min = _best_quality(source, image_format, max_bytes, min_quality, max_quality)
+            if best is not None:
+                candidates.append((best[0], -len(best[1]), image_format, best[1]))
+            else:
+                smallest = size_at_min if smallest is None else min(smallest, size_at_min)
+
+        if candidates:
+            quality, _, image_format, data = max(candidates)
+            if scale < 1.0:
+                logger.info(f"Downscaled output from {original_size} to {image.size} to fit {max_bytes} bytes")
+            return EncodedImage(data, image_format, quality, image.size)
+
+        # Encoded size scales roughly with pixel count, so shrink both sides by sqrt of the overshoot
+        scale *= min(0.9, 0.95 * math.sqrt(max_bytes / smallest))
+        if scale < min_scale:
+            raise ValueError(f"Image can't be encoded under {max_bytes} bytes")
+        new_size = (max(1, round(original_size[0] * scale)), max(1, round(original_size[1] * scale)))
+        image = Image.fromarray(pixels).resize(new_size, Image.LANCZOS)
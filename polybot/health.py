@@ -0,0 +1,63 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from loguru import logger
+from polybot.circuit_breaker import CircuitBreaker
+
+
+class HealthProber:
+    """
+    Probes backends in the background and caches their status
+
+    Each check is a blocking callable that raises if its backend is unhealthy;
+    checks run in threads every interval seconds. status() only reads the cached
+    results, so health endpoints stay cheap however often they are polled.
+    """
+
+    def __init__(self, interval: float = None):
+        self.interval = interval if interval is not None else float(os.environ.get('HEALTH_PROBE_INTERVAL', 30))
+        self._checks = {}
+        self._results = {}
+
+    def register(self, name: str, check: Callable[[], None], breaker: Optional[CircuitBreaker] = None):
+        """Add a backend check; the backend's circuit breaker state is reported alongside it"""
+        self._checks[name] = (check, breaker)
+
+    def _probe(self, name: str, check: Callable[[], None]) -> dict:
+        start = time.perf_counter()
+        try:
+            check()
+            result = {"status": "up"}
+        except Exception as e:
+            result = {"status": "down", "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["checked_at"] = datetime.now().isoformat()
+
+        previous = self._results.get(name)
+        if previous is not None and previous["status"] != result["status"]:
+            log = logger.info if result["status"] == "up" else logger.warning
+            log(f"{name} is now {result['status']}" + (f": {result['error']}" if "error" in result else ""))
+        return result
+
+    async def probe_all(self):
+        names = list(self._checks)
+        results = await asyncio.gather(*(asyncio.to_thread(self._probe, name, self._checks[name][0])
+                                         for name in names))
+        self._results.update(zip(names, results))
+
+    async def run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> Dict[str, dict]:
+        """Last probe result of each backend plus its circuit state (not probed yet: status 'unknown')"""
+        report = {}
+        for name, (_, breaker) in self._checks.items():
+            entry = dict(self._results.get(name, {"status": "unknown"}))
+            if breaker is not None:
+                entry["circuit"] = breaker.state
+            report[name] = entry
+        return report
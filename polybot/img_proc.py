@@ -1,14 +1,17 @@
 from pathlib import Path
-import matplotlib
-from matplotlib.image import imread, imsave
+import copy
+import collections.abc
 import numpy as np
-import random
-import boto3
-from botocore.exceptions import ClientError, NoCredentialsError
 import os
 from loguru import logger
 from datetime import datetime
-from typing import Optional, Tuple
+from io import BytesIO
+from typing import BinaryIO, Callable, List, Optional, Sequence, Tuple, Union
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from polybot.startup import startup_timer
+from polybot.profiling import sampled
+from polybot.encoding import EncodedImage, encode_to_budget, upload_limit
 
 
 def rgb2gray(rgb):
@@ -18,16 +21,409 @@ def rgb2gray(rgb):
     return gray
 
 
+def box_sums(pixels: np.ndarray, size: int) -> np.ndarray:
+    """
+    Sum of every size x size window, computed from a summed-area table
+
+    Cost is O(height * width) regardless of the window size. The output covers
+    only windows that fit entirely inside the input ("valid" region).
+    """
+    height, width = pixels.shape
+    table = np.zeros((height + 1, width + 1))
+    np.cumsum(pixels, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+
+
+# Adaptive segmentation works on gray values rounded to 1/65536: sums of whole
+# windows stay exact integers in float64 for bands of up to ~5e8 pixels
+ADAPTIVE_FIXED_POINT = 2 ** 16
+
+
+def otsu_threshold(histogram: np.ndarray) -> int:
+    """Return the histogram level that maximizes between-class variance (Otsu's method)"""
+    hist = histogram.astype(float)
+    levels = np.arange(hist.size)
+    weight_below = np.cumsum(hist)
+    weight_above = weight_below[-1] - weight_below
+    mass_below = np.cumsum(hist * levels)
+    mass_total = mass_below[-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Between-class variance up to a constant factor
+        between = (mass_total * weight_below - weight_below[-1] * mass_below) ** 2 / (weight_below * weight_above)
+    between[~np.isfinite(between)] = 0
+    return int(np.argmax(between))
+
+
+def resize(pixels: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Resize a 2-D pixel array with bilinear interpolation"""
+    src_height, src_width = pixels.shape
+    ys = np.linspace(0, src_height - 1, height)
+    xs = np.linspace(0, src_width - 1, width)
+    y0 = np.floor(ys).astype(int)
+    x0 = np.floor(xs).astype(int)
+    y1 = np.minimum(y0 + 1, src_height - 1)
+    x1 = np.minimum(x0 + 1, src_width - 1)
+    wy = (ys - y0)[:, None]
+    wx = (xs - x0)[None, :]
+
+    top = pixels[y0][:, x0] * (1 - wx) + pixels[y0][:, x1] * wx
+    bottom = pixels[y1][:, x0] * (1 - wx) + pixels[y1][:, x1] * wx
+    return top * (1 - wy) + bottom * wy
+
+
+def to_uint8(pixels: np.ndarray) -> np.ndarray:
+    """Round and clip a float pixel array to uint8"""
+    return np.clip(np.rint(pixels), 0, 255).astype(np.uint8)
+
+
+def concat_arrays(first: np.ndarray, second: np.ndarray, direction: str, resize_to_fit: bool = False) -> np.ndarray:
+    """
+    Join two 2-D pixel arrays side by side ('horizontal') or stacked ('vertical')
+
+    Without resize_to_fit the result is cropped to the shorter height (horizontal),
+    or the second image is cropped/zero-padded to the first one's width (vertical).
+    """
+    height1, width1 = first.shape
+    height2, width2 = second.shape
+
+    if resize_to_fit:
+        if direction == 'horizontal' and height2 != height1:
+            second = resize(second, height1, max(1, round(width2 * height1 / height2)))
+        elif direction == 'vertical' and width2 != width1:
+            second = resize(second, max(1, round(height2 * width1 / width2)), width1)
+        height2, width2 = second.shape
+
+    # Copy both images into one preallocated output array
+    if direction == 'horizontal':
+        height = min(height1, height2)
+        result = np.empty((height, width1 + width2))
+        result[:, :width1] = first[:height]
+        result[:, width1:] = second[:height]
+    else:
+        result = np.zeros((height1 + height2, width1))
+        result[:height1] = first
+        result[height1:, :min(width1, width2)] = second[:, :width1]
+    return result
+
+
+# Non-separable kernels with at least this many taps are convolved via FFT
+FFT_MIN_KERNEL_TAPS = 15 * 15
+
+
+def separate_kernel(kernel: np.ndarray, tolerance: float = 1e-10) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Split a rank-1 kernel into a column and a row vector (kernel == outer(column, row))
+
+    The vectors are taken straight from the kernel (pivoting on its largest entry)
+    rather than from an SVD, so constant kernels stay exactly constant.
+
+    Returns:
+        (column, row), or None if the kernel is not separable
+    """
+    pivot_row, pivot_col = np.unravel_index(np.argmax(np.abs(kernel)), kernel.shape)
+    pivot = kernel[pivot_row, pivot_col]
+    if pivot == 0:
+        return None
+    column = kernel[:, pivot_col]
+    row = kernel[pivot_row, :] / pivot
+    if not np.allclose(np.outer(column, row), kernel, rtol=0, atol=tolerance * abs(pivot)):
+        return None
+    return column, row
+
+
+def _correlate_rows(pixels: np.ndarray, taps: np.ndarray) -> np.ndarray:
+    """Correlate every row with a 1-D kernel ("valid" region only)"""
+    size = taps.size
+    width = pixels.shape[1] - size + 1
+    if size == 1:
+        return pixels * taps[0]
+    if np.all(taps == taps[0]):
+        # Box kernel: sliding sums from a running total, O(1) per pixel for any size
+        totals = np.zeros((pixels.shape[0], pixels.shape[1] + 1))
+        np.cumsum(pixels, axis=1, out=totals[:, 1:])
+        return (totals[:, size:] - totals[:, :-size]) * taps[0]
+
+    result = taps[0] * pixels[:, :width]
+    for i in range(1, size):
+        if taps[i] != 0:
+            result += taps[i] * pixels[:, i:i + width]
+    return result
+
+
+def _correlate_direct(pixels: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    """Correlate with a small 2-D kernel as a weighted sum of shifted views"""
+    kernel_height, kernel_width = kernel.shape
+    height = pixels.shape[0] - kernel_height + 1
+    width = pixels.shape[1] - kernel_width + 1
+    result = np.zeros((height, width))
+    for i in range(kernel_height):
+        for j in range(kernel_width):
+            if kernel[i, j] != 0:
+                result += kernel[i, j] * pixels[i:i + height, j:j + width]
+    return result
+
+
+def _correlate_fft(pixels: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    """Correlate with a large 2-D kernel through the frequency domain"""
+    kernel_height, kernel_width = kernel.shape
+    shape = pixels.shape
+    # Correlation is convolution with the flipped kernel; the valid region never wraps around
+    spectrum = np.fft.rfft2(pixels) * np.fft.rfft2(kernel[::-1, ::-1], s=shape)
+    return np.fft.irfft2(spectrum, s=shape)[kernel_height - 1:, kernel_width - 1:]
+
+
+def convolve(pixels: np.ndarray, kernel, border: Optional[str] = 'reflect') -> np.ndarray:
+    """
+    Apply a 2-D kernel to an image
+
+    The kernel is applied as written (correlation, not flipped). Separable kernels
+    run as two 1-D passes, large non-separable kernels go through the FFT, and small
+    ones are summed directly - all three give the same result.
+
+    Args:
+        pixels: 2-D image array
+        kernel: 2-D (or 1-D, treated as a single row) kernel
+        border: np.pad mode used to extend the image ('reflect', 'edge', 'constant', 'wrap')
+            so the output keeps the input size, or None to return only the "valid" region
+
+    Returns:
+        Filtered image array
+    """
+    kernel = np.atleast_2d(np.asarray(kernel, dtype=float))
+    kernel_height, kernel_width = kernel.shape
+    if border is not None:
+        padding = ((kernel_height // 2, (kernel_height - 1) // 2), (kernel_width // 2, (kernel_width - 1) // 2))
+        pixels = np.pad(pixels, padding, mode=border)
+
+    separated = separate_kernel(kernel)
+    if separated is not None:
+        column, row = separated
+        if np.all(column == column[0]) and np.all(row == row[0]):
+            # Box kernel: sum with unit taps and scale once, so averages of equal values stay exact
+            sums = _correlate_rows(_correlate_rows(pixels.T, np.ones(column.size)).T, np.ones(row.size))
+            divisor = 1 / (column[0] * row[0])
+            return sums / round(divisor) if divisor == round(divisor) else sums * (column[0] * row[0])
+        # A single unit tap is the identity; skipping it keeps e.g. [[1, -1]] an exact difference
+        result = pixels
+        if column.size > 1 or column[0] != 1:
+            result = _correlate_rows(result.T, column).T
+        if row.size > 1 or row[0] != 1:
+            result = _correlate_rows(result, row)
+        return result.copy() if result is pixels else result
+    if kernel.size >= FFT_MIN_KERNEL_TAPS:
+        return _correlate_fft(pixels, kernel)
+    return _correlate_direct(pixels, kernel)
+
+
+class KernelFilter:
+    """A named image filter defined by one or more convolution kernels"""
+
+    def __init__(self, name: str, make_kernels, description: str, param: Optional[str] = None):
+        """
+        Args:
+            name: Filter (and bot command) name
+            make_kernels: Callable returning a list of kernels for the given params;
+                several kernels are combined as a gradient magnitude
+            description: One-line description shown in help
+            param: Name of the optional numeric parameter of the filter
+        """
+        self.name = name
+        self.make_kernels = make_kernels
+        self.description = description
+        self.param = param
+
+    def apply(self, pixels: np.ndarray, **params) -> np.ndarray:
+        kernels = self.make_kernels(**params)
+        if len(kernels) == 1:
+            result = convolve(pixels, kernels[0])
+        else:
+            result = np.sqrt(sum(convolve(pixels, kernel) ** 2 for kernel in kernels))
+        return np.clip(result, 0, 255)
+
+
+KERNEL_FILTERS = {}
+
+
+def register_kernel_filter(kernel_filter: KernelFilter):
+    """Make a kernel filter available to Img.filter (and as a bot command)"""
+    KERNEL_FILTERS[kernel_filter.name] = kernel_filter
+    return kernel_filter
+
+
+# Larger sigmas barely change the look but the kernel (and run time) grows with 6 sigma
+MAX_GAUSSIAN_SIGMA = 25.0
+
+
+def gaussian_kernel(sigma: float = 2.0) -> np.ndarray:
+    """
+    Normalized 2-D Gaussian kernel covering 3 sigma each side
+
+    Raises:
+        ValueError: sigma is not a positive number
+    """
+    if not np.isfinite(sigma) or sigma <= 0:
+        raise ValueError(f"sigma must be a positive number, got {sigma}")
+    if sigma > MAX_GAUSSIAN_SIGMA:
+        logger.warning(f"Gaussian sigma {sigma} clamped to {MAX_GAUSSIAN_SIGMA}")
+        sigma = MAX_GAUSSIAN_SIGMA
+    radius = max(1, int(np.ceil(3 * sigma)))
+    x = np.arange(-radius, radius + 1)
+    weights = np.exp(-x ** 2 / (2 * sigma ** 2))
+    weights /= weights.sum()
+    return np.outer(weights, weights)
+
+
+SOBEL_X = np.array([[1, 0, -1], [2, 0, -2], [1, 0, -1]], dtype=float)
+
+register_kernel_filter(KernelFilter(
+    'sharpen',
+    lambda amount=1.0: [np.array([[0, -amount, 0], [-amount, 1 + 4 * amount, -amount], [0, -amount, 0]])],
+    "Sharpen edges (optional strength, default 1)",
+    param='amount'))
+register_kernel_filter(KernelFilter(
+    'gaussian',
+    lambda sigma=2.0: [gaussian_kernel(float(sigma))],
+    "Gaussian blur (optional sigma, default 2)",
+    param='sigma'))
+register_kernel_filter(KernelFilter(
+    'sobel',
+    lambda: [SOBEL_X, SOBEL_X.T],
+    "Sobel edge magnitude"))
+register_kernel_filter(KernelFilter(
+    'emboss',
+    lambda: [np.array([[-2, -1, 0], [-1, 1, 1], [0, 1, 2]], dtype=float)],
+    "Emboss relief effect"))
+
+
+# Filters on planes with at least this many pixels are split into row bands
+# (None: read IMG_PARALLEL_MIN_PIXELS on first use, so a .env loaded after import counts)
+PARALLEL_MIN_PIXELS = None
+# Bands shorter than this aren't worth the halo overhead
+MIN_BAND_ROWS = 64
+
+# None: read IMG_FILTER_WORKERS on first use
+_filter_workers = None
+_filter_pool = None
+_filter_pool_lock = threading.Lock()
+
+
+def _parallel_min_pixels() -> int:
+    global PARALLEL_MIN_PIXELS
+    if PARALLEL_MIN_PIXELS is None:
+        PARALLEL_MIN_PIXELS = int(os.environ.get('IMG_PARALLEL_MIN_PIXELS', 1_000_000))
+    return PARALLEL_MIN_PIXELS
+
+
+def _get_filter_workers() -> int:
+    global _filter_workers
+    with _filter_pool_lock:
+        if _filter_workers is None:
+            _filter_workers = max(1, int(os.environ.get('IMG_FILTER_WORKERS', os.cpu_count() or 1)))
+        return _filter_workers
+
+
+def configure_filter_pool(workers: int):
+    """Set the number of threads used to run filters (takes effect for new work)"""
+    global _filter_workers, _filter_pool
+    with _filter_pool_lock:
+        _filter_workers = max(1, int(workers))
+        old_pool, _filter_pool = _filter_pool, None
+    if old_pool is not None:
+        old_pool.shutdown(wait=False)
+
+
+def _get_filter_pool() -> ThreadPoolExecutor:
+    global _filter_pool
+    workers = _get_filter_workers()
+    with _filter_pool_lock:
+        if _filter_pool is None:
+            _filter_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='img-filter')
+        return _filter_pool
+
+
+def _row_bands(rows: int, pixels: int) -> list:
+    """Split output rows into [start, end) bands, one per worker for large planes"""
+    workers = _get_filter_workers()
+    if workers <= 1 or pixels < _parallel_min_pixels():
+        return [(0, rows)]
+    count = max(1, min(workers, rows // MIN_BAND_ROWS))
+    edges = np.linspace(0, rows, count + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(edges[:-1], edges[1:]) if end > start]
+
+
+def run_filter(planes: list, fns: list, halo: Optional[Tuple[int, int]] = None, shrink: int = 0) -> list:
+    """
+    Run fns[i](planes[i]) for every plane, in parallel row bands on the shared pool
+
+    Each band is given halo rows of context above and below, and the rows computed
+    from that context are cropped away again, so the result equals running fn on
+    the whole plane. NumPy releases the GIL, so bands use separate cores. Small
+    planes take a fast path that runs fn directly.
+
+    Args:
+        planes: 2-D arrays
+        fns: One function per plane, mapping a 2-D array (or row band of it) to its filtered version
+        halo: (above, below) rows of input each output row depends on; None if fn
+            cannot be split into bands (e.g. it changes the image geometry)
+        shrink: Rows lost by "valid"-region filters (output row r reads input rows r..r+shrink)
+    """
+    tasks = []
+    for index, (plane, fn) in enumerate(zip(planes, fns)):
+        out_rows = plane.shape[0] - shrink
+        if halo is None or out_rows <= 0:
+            tasks.append((index, fn, plane, 0, None))
+            continue
+        above, below = halo
+        for start, end in _row_bands(out_rows, plane.size):
+            first = max(0, start - above)
+            last = min(plane.shape[0], end + below + shrink)
+            tasks.append((index, fn, plane[first:last], start - first, end - start))
+
+    def run(task):
+        _, fn, band, offset, rows = task
+        result = fn(band)
+        return result if rows is None else result[offset:offset + rows]
+
+    if len(tasks) == 1:
+        results = [run(tasks[0])]
+    else:
+        results = list(_get_filter_pool().map(sampled(run), tasks))
+
+    outputs = []
+    for index in range(len(planes)):
+        parts = [result for task, result in zip(tasks, results) if task[0] == index]
+        outputs.append(parts[0] if len(parts) == 1 else np.concatenate(parts, axis=0))
+    return outputs
+
+
+def _codec():
+    """matplotlib's image codec, imported on first image load or save"""
+    return startup_timer.lazy_import('matplotlib.image')
+
+
 class S3Manager:
     """Handles all S3 operations for image uploads"""
     
     def __init__(self):
         self.aws_region = os.getenv('AWS_REGION', 'us-west-2')
         self.bucket_name = os.getenv('AWS_DEV_S3_BUCKET')  # Only use dev bucket
+        # Custom endpoint for S3-compatible stand-ins (MinIO, moto server, LocalStack)
+        self.endpoint_url = os.getenv('AWS_S3_ENDPOINT_URL') or None
+        # Multipart transfer tuning (boto3 TransferConfig)
+        self.multipart_threshold = int(os.getenv('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+        self.multipart_chunksize = int(os.getenv('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+        self.max_concurrency = int(os.getenv('S3_MAX_CONCURRENCY', 10))
+        # Files uploaded at once by upload_many/upload_async
+        self.upload_workers = int(os.getenv('S3_UPLOAD_WORKERS', 8))
+        # Lifetime of presigned download links (SigV4 allows up to 7 days)
+        self.presign_expiry = int(os.getenv('S3_PRESIGN_EXPIRY', 3600))
+        # Created on the first upload - importing boto3 and checking the bucket is slow
         self.s3_client = None
-        
-        # Initialize S3 client - will automatically use IAM role or AWS credentials
-        self._initialize_s3_client()
+        self.transfer_config = None
+        self._client_lock = threading.Lock()
+        self._upload_pool = None
     
     def _has_minimal_config(self) -> bool:
         """Check if we have at least region and bucket configured"""
@@ -38,6 +434,8 @@ class S3Manager:
     
     def _initialize_s3_client(self) -> bool:
         """Initialize the S3 client - automatically uses IAM role or AWS credentials"""
+        boto3 = startup_timer.lazy_import('boto3')
+        from botocore.exceptions import ClientError, NoCredentialsError
         try:
             if not self._has_minimal_config():
                 logger.error("Missing required AWS configuration (region or bucket)")
@@ -47,7 +445,20 @@ class S3Manager:
             # 1. IAM role (if attached to EC2)
             # 2. ~/.aws/credentials 
             # 3. Environment variables
-            self.s3_client = boto3.client('s3', region_name=self.aws_region)
+            from botocore.config import Config
+            from boto3.s3.transfer import TransferConfig
+            # Size the connection pool for multipart parts and concurrent batch uploads
+            self.s3_client = boto3.client(
+                's3',
+                region_name=self.aws_region,
+                endpoint_url=self.endpoint_url,
+                config=Config(max_pool_connections=self.max_concurrency + self.upload_workers)
+            )
+            self.transfer_config = TransferConfig(
+                multipart_threshold=self.multipart_threshold,
+                multipart_chunksize=self.multipart_chunksize,
+                max_concurrency=self.max_concurrency
+            )
             
             # Test S3 access by checking if bucket exists
             self.s3_client.head_bucket(Bucket=self.bucket_name)
@@ -70,66 +481,144 @@ class S3Manager:
             logger.error(f"Failed to initialize S3 client: {e}")
             return False
     
-    def upload_file(self, local_path: Path, s3_key: Optional[str] = None) -> bool:
-        """Upload a file to S3"""
+    def _ensure_client(self) -> bool:
+        """Create the S3 client on first use (once, even with concurrent uploads)"""
         if not self._has_minimal_config():
             logger.warning("AWS credentials not available. Skipping S3 upload.")
             self._log_missing_credentials()
             return False
-        
-        if not self.s3_client:
-            if not self._initialize_s3_client():
-                return False
-        
+        with self._client_lock:
+            return bool(self.s3_client) or self._initialize_s3_client()
+
+    def upload_file(self, local_path: Path, s3_key: Optional[str] = None) -> bool:
+        """Upload a file to S3"""
+        local_path = Path(local_path)
+        if not self._ensure_client():
+            return False
+
+        # Check file exists
+        if not local_path.exists():
+            logger.error(f"File does not exist: {local_path}")
+            return False
+
+        def transfer(key):
+            self.s3_client.upload_file(str(local_path), self.bucket_name, key, Config=self.transfer_config)
+
+        return self._upload(local_path.name, local_path.stat().st_size, transfer, s3_key) is not None
+
+    def share_file(self, local_path: Path, expires_in: Optional[int] = None) -> Optional[str]:
+        """
+        Upload a file and return a time-limited download link to it
+
+        Returns:
+            Presigned GET URL, or None if the upload or signing failed
+        """
+        local_path = Path(local_path)
+        if not self._ensure_client() or not local_path.exists():
+            return None
+
+        def transfer(key):
+            self.s3_client.upload_file(str(local_path), self.bucket_name, key, Config=self.transfer_config)
+
+        s3_key = self._upload(local_path.name, local_path.stat().st_size, transfer, None)
+        return self.presigned_url(s3_key, expires_in) if s3_key is not None else None
+
+    def presigned_url(self, s3_key: str, expires_in: Optional[int] = None) -> Optional[str]:
+        """Time-limited GET URL for an object, signed locally without a request to S3"""
+        if not self._ensure_client():
+            return None
+        try:
+            return self.s3_client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket_name, 'Key': s3_key},
+                ExpiresIn=expires_in or self.presign_expiry
+            )
+        except Exception as e:
+            logger.error(f"Could not presign s3://{self.bucket_name}/{s3_key}: {e}")
+            return None
+
+    def upload_fileobj(self, data: Union[bytes, BinaryIO], name: str, s3_key: Optional[str] = None,
+                       content_type: Optional[str] = None) -> bool:
+        """
+        Upload in-memory data (e.g. an encoded image) to S3 without writing it to disk
+
+        Args:
+            data: Bytes or a binary file object
+            name: File name used to build the S3 key
+        """
+        if not self._ensure_client():
+            return False
+        fileobj = BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+        extra_args = {"ContentType": content_type} if content_type else None
+
+        def transfer(key):
+            self.s3_client.upload_fileobj(fileobj, self.bucket_name, key, ExtraArgs=extra_args, Config=self.transfer_config)
+
+        size = len(data) if isinstance(data, (bytes, bytearray)) else None
+        return self._upload(name, size, transfer, s3_key) is not None
+
+    def upload_async(self, local_path: Path, s3_key: Optional[str] = None) -> Future:
+        """Start uploading a file on the shared upload pool"""
+        with self._client_lock:
+            if self._upload_pool is None:
+                self._upload_pool = ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="s3-upload")
+        return self._upload_pool.submit(self.upload_file, local_path, s3_key)
+
+    def upload_many(self, paths: Sequence[Path]) -> List[bool]:
+        """
+        Upload several files concurrently over the client's shared connection pool
+
+        Returns:
+            Success of each upload, in the order of paths
+        """
+        futures = [self.upload_async(path) for path in paths]
+        return [future.result() for future in futures]
+
+    def _upload(self, name: str, size: Optional[int], transfer: Callable[[str], None],
+                s3_key: Optional[str]) -> Optional[str]:
+        """Run transfer under a free key and verify it, returning the key used (None on failure)"""
+        from botocore.exceptions import ClientError, NoCredentialsError
         try:
             # Generate S3 key if not provided
             if s3_key is None:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                s3_key = f"processed_images/{timestamp}_{local_path.name}"
-            
-            # Check file exists
-            if not local_path.exists():
-                logger.error(f"File does not exist: {local_path}")
-                return False
+                s3_key = f"processed_images/{timestamp}_{name}"
             
             # Check if file already exists in S3
             if self._file_exists_in_s3(s3_key):
                 logger.warning(f"File already exists in S3: {s3_key}")
                 # Generate unique key
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                s3_key = f"processed_images/{timestamp}_{local_path.name}"
+                s3_key = f"processed_images/{timestamp}_{name}"
             
             # Upload the file
-            logger.info(f"Uploading {local_path.name} ({local_path.stat().st_size} bytes) to S3 bucket {self.bucket_name}")
-            
-            self.s3_client.upload_file(
-                str(local_path), 
-                self.bucket_name, 
-                s3_key
-            )
+            size_text = f"{size} bytes" if size is not None else "stream"
+            logger.info(f"Uploading {name} ({size_text}) to S3 bucket {self.bucket_name}")
+            transfer(s3_key)
             
             # Verify upload
             if self._verify_upload(s3_key):
-                logger.success(f"Successfully uploaded {local_path.name} to S3: s3://{self.bucket_name}/{s3_key}")
-                return True
+                logger.success(f"Successfully uploaded {name} to S3: s3://{self.bucket_name}/{s3_key}")
+                return s3_key
             else:
                 logger.error(f"Upload verification failed for {s3_key}")
-                return False
+                return None
                 
         except NoCredentialsError:
             logger.error("AWS credentials not found")
-            return False
+            return None
         except ClientError as e:
             logger.error(f"AWS S3 error during upload: {e}")
-            return False
+            return None
         except Exception as e:
             logger.error(f"Unexpected error uploading to S3: {e}")
             import traceback
             logger.debug(f"Traceback: {traceback.format_exc()}")
-            return False
+            return None
     
     def _file_exists_in_s3(self, s3_key: str) -> bool:
         """Check if a file exists in S3"""
+        from botocore.exceptions import ClientError
         try:
             self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
             return True
@@ -163,31 +652,263 @@ class S3Manager:
             logger.warning("AWS credentials not found. Please attach IAM role to EC2 instance or configure AWS credentials.")
 
 
+_shared_s3_manager = None
+_shared_s3_lock = threading.Lock()
+
+
+def shared_s3_manager() -> S3Manager:
+    """One S3Manager (and S3 client) for every Img in the process"""
+    global _shared_s3_manager
+    with _shared_s3_lock:
+        if _shared_s3_manager is None:
+            _shared_s3_manager = S3Manager()
+        return _shared_s3_manager
+
+
+class _PixelRow(collections.abc.Sequence):
+    """One row of Img.data; reads come from the pixel array and item assignment writes back to it"""
+
+    def __init__(self, img: 'Img', index: int):
+        self._img = img
+        self._index = index
+
+    def __len__(self):
+        return self._img.pixels.shape[1]
+
+    def __getitem__(self, key):
+        return self._img.pixels[self._index][key].tolist()
+
+    def __setitem__(self, key, value):
+        self._img._write_pixels((self._index, key), value)
+
+    def __iter__(self):
+        return iter(self._img.pixels[self._index].tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self._img.pixels[self._index], dtype=dtype)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _PixelRows(collections.abc.Sequence):
+    """Img.data: the pixels as a list-like of rows that writes through to the array"""
+
+    def __init__(self, img: 'Img'):
+        self._img = img
+
+    def __len__(self):
+        return self._img.pixels.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [_PixelRow(self._img, index) for index in range(*key.indices(len(self)))]
+        index = range(len(self))[key]
+        return _PixelRow(self._img, index)
+
+    def __setitem__(self, key, value):
+        # Whole rows (or a slice of rows) are replaced; the width stays the same
+        self._img._write_pixels((key, slice(None)), value)
+
+    def __iter__(self):
+        return (_PixelRow(self._img, index) for index in range(len(self)))
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self._img.pixels, dtype=dtype)
+
+    def __eq__(self, other):
+        return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+
+    def __repr__(self):
+        return repr(self._img.pixels.tolist())
+
+
 class Img:
     """Image processing class with S3 integration"""
 
-    def __init__(self, path):
+    def __init__(self, path, color: Optional[bool] = None):
         """
         Constructor that loads and normalizes image to [0, 255] grayscale
+
+        Args:
+            path: Image file path
+            color: Keep the original RGB(A) channels as planar uint8 instead of
+                converting to grayscale (defaults to the IMG_COLOR_MODE env var)
         """
         self.path = Path(path)
-        self.s3_manager = S3Manager()
+        self._s3_manager = None
+        if color is None:
+            color = os.environ.get('IMG_COLOR_MODE', 'false').lower() == 'true'
+        self.color = color
+        self._pixels = None
+        self._planes = None
+        self._stats = None
         
-        # Load and convert image to grayscale
+        # Load the image (grayscale unless color mode is on)
         try:
-            gray = rgb2gray(imread(path))
-            
-            # Normalize to [0, 255] for test compatibility
-            if gray.max() <= 1.0:
-                gray = gray * 255.0
-            
-            self.data = gray.tolist()
-            logger.info(f"Image loaded: {self.path.name} ({len(self.data)}x{len(self.data[0]) if self.data else 0})")
+            self._load()
+            height, width = self.get_dimensions()
+            mode = f"color, {self._planes.shape[0]} channel(s)" if self.color else "grayscale"
+            logger.info(f"Image loaded: {self.path.name} ({height}x{width}, {mode})")
             
         except Exception as e:
             logger.error(f"Error loading image {path}: {e}")
             raise
 
+    @property
+    def s3_manager(self) -> S3Manager:
+        """The process-wide S3Manager, unless one was assigned to this image"""
+        return self._s3_manager or shared_s3_manager()
+
+    @s3_manager.setter
+    def s3_manager(self, manager: S3Manager):
+        self._s3_manager = manager
+
+    def _load(self):
+        """Read the image file into grayscale pixels or color planes"""
+        image = _codec().imread(self.path)
+
+        if self.color:
+            # Planar uint8: one (height x width) plane per channel
+            if image.dtype != np.uint8:
+                image = np.rint(np.clip(image, 0.0, 1.0) * 255.0).astype(np.uint8)
+            if image.ndim == 2:
+                image = image[:, :, None]
+            self.planes = np.ascontiguousarray(np.moveaxis(image, -1, 0))
+            return
+
+        gray = rgb2gray(image) if image.ndim == 3 else image.astype(float)
+
+        # Normalize to [0, 255] for test compatibility
+        if gray.max() <= 1.0:
+            gray = gray * 255.0
+        self.pixels = gray.astype(float)
+
+    @property
+    def pixels(self) -> np.ndarray:
+        """
+        The image as a read-only 2-D float array (height x width)
+
+        In color mode this is the luminance of the color planes. Assign to pixels
+        (or write through data) to change the image, so cached statistics are reset.
+        """
+        if self._pixels is None and self._planes is not None:
+            planes = self._planes
+            if planes.shape[0] >= 3:
+                self._pixels = rgb2gray(np.moveaxis(planes[:3], 0, -1).astype(float))
+            else:
+                self._pixels = planes[0].astype(float)
+        if self._pixels is None:
+            return None
+        view = self._pixels.view()
+        view.flags.writeable = False
+        return view
+
+    @pixels.setter
+    def pixels(self, value):
+        value = np.asarray(value, dtype=float)
+        if not value.flags.writeable:
+            # Don't share the buffer of another image's read-only view
+            value = value.copy()
+        if self.color:
+            # A single intensity image replaces every color channel (alpha is kept if sizes match)
+            self.planes = self._match_channels(to_uint8(value)[None], self._planes.shape[0], self._planes)
+            return
+        self._pixels = value
+        # Anything derived from the old pixel data is now stale
+        self._stats = None
+
+    @property
+    def planes(self) -> Optional[np.ndarray]:
+        """The color planes as a uint8 (channels x height x width) array, None in grayscale mode"""
+        return self._planes
+
+    @planes.setter
+    def planes(self, value: np.ndarray):
+        self._planes = value
+        self._pixels = None
+        self._stats = None
+
+    @property
+    def data(self) -> _PixelRows:
+        """
+        The image as rows of Python floats, indexed like a list of lists
+
+        Views of the pixel array rather than copies: img.data[i][j] = v changes the
+        image (and resets cached statistics). Slices are plain lists.
+        """
+        return _PixelRows(self)
+
+    @data.setter
+    def data(self, value):
+        self.pixels = value
+
+    def _write_pixels(self, index, value):
+        """Assign to part of the pixels, keeping color planes and cached statistics in sync"""
+        if self.color:
+            pixels = self.pixels.copy()
+            pixels[index] = value
+            self.pixels = pixels
+            return
+        self._pixels[index] = value
+        self._stats = None
+
+    @staticmethod
+    def _match_channels(planes: np.ndarray, channels: int, alpha_source: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Convert planes to the given channel count (1 gray, 2 gray+alpha, 3 RGB, 4 RGBA)
+
+        Missing color is expanded from gray (or gray computed from RGB); a missing alpha
+        is taken from alpha_source when it has one of the same size, otherwise opaque.
+        """
+        if planes.shape[0] == channels:
+            return planes
+        if channels in (1, 2):
+            base = planes[:1] if planes.shape[0] < 3 else to_uint8(rgb2gray(np.moveaxis(planes[:3], 0, -1).astype(float)))[None]
+        else:
+            base = planes[:3] if planes.shape[0] >= 3 else np.repeat(planes[:1], 3, axis=0)
+        if channels in (1, 3):
+            return base
+
+        if alpha_source is not None and alpha_source.shape[0] in (2, 4) and alpha_source.shape[1:] == base.shape[1:]:
+            alpha = alpha_source[-1:]
+        elif planes.shape[0] in (2, 4):
+            alpha = planes[-1:]
+        else:
+            alpha = np.full((1,) + base.shape[1:], 255, dtype=np.uint8)
+        return np.concatenate([base, alpha])
+
+    def _apply(self, fn, alpha_fn=None, halo: Optional[Tuple[int, int]] = None, shrink: int = 0):
+        """
+        Apply a 2-D float filter to the image
+
+        In color mode the filter runs on each channel and the results are stored
+        back as uint8. Channels (and row bands of large images, see run_filter)
+        are processed in parallel.
+
+        Args:
+            fn: Function mapping a 2-D float array to the filtered array
+            alpha_fn: Function used for the alpha plane instead of fn (e.g. to keep it unchanged)
+            halo: (above, below) rows of context fn needs, or None if it can't run on row bands
+            shrink: Rows dropped by a "valid"-region fn
+        """
+        if not self.color:
+            self.pixels = run_filter([self._pixels], [fn], halo, shrink)[0]
+            return
+
+        channels = self._planes.shape[0]
+        has_alpha = channels in (2, 4)
+
+        def as_uint8(plane_fn):
+            return lambda band: to_uint8(plane_fn(band.astype(float)))
+
+        fns = [as_uint8(alpha_fn if (alpha_fn is not None and has_alpha and index == channels - 1) else fn)
+               for index in range(channels)]
+        self.planes = np.stack(run_filter(list(self._planes), fns, halo, shrink))
+
     def save_img(self, auto_upload_s3: bool = True, custom_suffix: str = "_filtered") -> Path:
         """
         Save the processed image locally and optionally upload to S3
@@ -204,7 +925,12 @@ class Img:
         
         try:
             # Save image locally
-            imsave(new_path, np.array(self.data) / 255.0, cmap='gray')
+            imsave = _codec().imsave
+            pixels = self.display_pixels()
+            if pixels.ndim == 2:
+                # Gray as RGB: a colormap lookup would shift some levels by one
+                pixels = np.repeat(pixels[:, :, np.newaxis], 3, axis=2)
+            imsave(new_path, pixels)
             
             logger.info(f"Image saved locally: {new_path}")
             logger.info(f"Absolute path: {os.path.abspath(new_path)}")
@@ -224,6 +950,41 @@ class Img:
             logger.error(f"Error saving image: {e}")
             raise
 
+    def display_pixels(self) -> np.ndarray:
+        """
+        The uint8 pixels users see, shared by save_img and encode so both outputs match
+
+        Grayscale results are stretched from their min/max to the full 0-255 range,
+        the same contrast scaling imsave(cmap='gray') has always applied to them.
+        Color planes are returned as they are.
+        """
+        if self.color:
+            pixels = np.moveaxis(self._planes, 0, -1)
+            if pixels.shape[-1] == 1:
+                pixels = pixels[:, :, 0]
+            return np.ascontiguousarray(pixels)
+        low, high = float(self._pixels.min()), float(self._pixels.max())
+        if high <= low:
+            # Like imsave, a flat image is shown as black
+            return np.zeros(self._pixels.shape, dtype=np.uint8)
+        return to_uint8((self._pixels - low) * (255.0 / (high - low)))
+
+    def encode(self, max_bytes: Optional[int] = None, formats: Sequence[str] = ('PNG', 'WEBP', 'JPEG')) -> EncodedImage:
+        """
+        Encode the image in memory so that it fits in a byte budget
+
+        Args:
+            max_bytes: Size budget (defaults to the Discord upload limit, DISCORD_UPLOAD_LIMIT)
+            formats: Formats the encoder may choose from
+
+        Returns:
+            EncodedImage whose buffer can be sent as a discord.File
+        """
+        encoded = encode_to_budget(self.display_pixels(), max_bytes or upload_limit(), formats)
+        logger.info(f"Encoded {self.path.name} as {encoded.format} (quality {encoded.quality}, "
+                    f"{encoded.size[0]}x{encoded.size[1]}): {len(encoded)} bytes")
+        return encoded
+
     def blur(self, blur_level: int = 16) -> 'Img':
         """
         Apply blur filter to the image
@@ -238,25 +999,14 @@ class Img:
             logger.warning("Blur level must be positive, skipping blur")
             return self
             
-        height = len(self.data)
-        width = len(self.data[0]) if height > 0 else 0
+        height, width = self.get_dimensions()
         
         if height < blur_level or width < blur_level:
             logger.warning(f"Image too small for blur level {blur_level}, skipping blur")
             return self
         
-        filter_sum = blur_level ** 2
-        result = []
-        
-        for i in range(height - blur_level + 1):
-            row_result = []
-            for j in range(width - blur_level + 1):
-                sub_matrix = [row[j:j + blur_level] for row in self.data[i:i + blur_level]]
-                average = sum(sum(sub_row) for sub_row in sub_matrix) // filter_sum
-                row_result.append(average)
-            result.append(row_result)
-
-        self.data = result
+        box = np.full((blur_level, blur_level), 1.0 / blur_level ** 2)
+        self._apply(lambda plane: np.floor(convolve(plane, box, border=None)), halo=(0, 0), shrink=blur_level - 1)
         logger.info(f"Blur filter applied with level {blur_level}")
         return self
 
@@ -267,11 +1017,8 @@ class Img:
         Returns:
             Self for method chaining
         """
-        for i, row in enumerate(self.data):
-            res = []
-            for j in range(1, len(row)):
-                res.append(abs(row[j - 1] - row[j]))
-            self.data[i] = res
+        self._apply(lambda plane: np.abs(convolve(plane, [[1, -1]], border=None)),
+                    alpha_fn=lambda alpha: alpha[:, 1:], halo=(0, 0))
         
         logger.info("Contour filter applied")
         return self
@@ -283,22 +1030,34 @@ class Img:
         Returns:
             Self for method chaining
         """
-        height = len(self.data)
-        width = len(self.data[0]) if height > 0 else 0
-        
-        if height == 0 or width == 0:
+        if self.get_dimensions() == (0, 0):
             logger.warning("Cannot rotate empty image")
             return self
         
-        rotated = [[0 for _ in range(height)] for _ in range(width)]
-        for i in range(height):
-            for j in range(width):
-                rotated[j][height - 1 - i] = self.data[i][j]
-        
-        self.data = rotated
+        self._apply(lambda plane: np.rot90(plane, k=-1))
         logger.info("Image rotated 90 degrees clockwise")
         return self
 
+    def filter(self, name: str, **params) -> 'Img':
+        """
+        Apply a registered convolution filter (see KERNEL_FILTERS)
+        
+        Args:
+            name: Filter name, e.g. 'sharpen', 'gaussian', 'sobel', 'emboss'
+            **params: Filter parameters (e.g. sigma for 'gaussian')
+        
+        Returns:
+            Self for method chaining
+        """
+        if name not in KERNEL_FILTERS:
+            raise ValueError(f"Unknown filter '{name}'. Available: {', '.join(KERNEL_FILTERS)}")
+
+        kernel_height = max(np.atleast_2d(kernel).shape[0] for kernel in KERNEL_FILTERS[name].make_kernels(**params))
+        self._apply(lambda plane: KERNEL_FILTERS[name].apply(plane, **params), alpha_fn=lambda alpha: alpha,
+                    halo=(kernel_height // 2, (kernel_height - 1) // 2))
+        logger.info(f"{name} filter applied {params if params else ''}")
+        return self
+
     def salt_n_pepper(self, noise_level: float = 0.15) -> 'Img':
         """
         Add salt (255) and pepper (0) noise to the image
@@ -313,119 +1072,153 @@ class Img:
             logger.warning("Noise level must be between 0.0 and 1.0")
             noise_level = 0.15
         
-        arr = np.array(self.data, dtype=float)
-        height, width = arr.shape
+        height, width = self.get_dimensions()
         total_pixels = height * width
 
         num_salt = int(total_pixels * noise_level)
         num_pepper = int(total_pixels * noise_level)
 
-        random.seed(42)  # For reproducible results
-        all_indices = [(i, j) for i in range(height) for j in range(width)]
-        random.shuffle(all_indices)
+        rng = np.random.default_rng(42)  # For reproducible results
+        indices = rng.permutation(total_pixels)
 
-        # Add salt noise
-        for i, j in all_indices[:num_salt]:
-            arr[i, j] = 255.0
+        # The same pixels are hit in every channel, so the noise stays white/black
+        def add_noise(plane):
+            flat = plane.reshape(-1)
+            # Add salt noise
+            flat[indices[:num_salt]] = 255.0
+            # Add pepper noise
+            flat[indices[num_salt:num_salt + num_pepper]] = 0.0
+            return plane
 
-        # Add pepper noise
-        for i, j in all_indices[num_salt:num_salt + num_pepper]:
-            arr[i, j] = 0.0
-
-        self.data = arr.tolist()
+        self._apply(lambda plane: add_noise(plane.copy()), alpha_fn=lambda alpha: alpha)
         logger.info(f"Salt and pepper noise applied with level {noise_level}")
         return self
 
-    def concat(self, other_img: 'Img', direction: str = 'horizontal') -> 'Img':
+    def concat(self, other_img: 'Img', direction: str = 'horizontal', resize_to_fit: bool = False) -> 'Img':
         """
         Concatenate this image with another image
         
         Args:
             other_img: Another Img object to concatenate with
             direction: 'horizontal' or 'vertical'
+            resize_to_fit: Scale the other image to match this one's height (horizontal)
+                or width (vertical) instead of cropping/zero-padding it
         
         Returns:
             Self for method chaining
         """
         if not isinstance(other_img, Img):
             raise TypeError("other_img must be an Img object")
+        if direction not in ('horizontal', 'vertical'):
+            raise ValueError("Direction must be either 'horizontal' or 'vertical'")
 
-        height1 = len(self.data)
-        width1 = len(self.data[0]) if height1 > 0 else 0
-
-        height2 = len(other_img.data)
-        width2 = len(other_img.data[0]) if height2 > 0 else 0
+        if self.get_dimensions() == (0, 0) or other_img.get_dimensions() == (0, 0):
+            logger.warning(f"Cannot concatenate {direction}ly with empty images")
+            return self
 
-        if direction == 'horizontal':
-            if height1 == 0 or height2 == 0:
-                logger.warning("Cannot concatenate horizontally with empty images")
-                return self
-                
-            min_height = min(height1, height2)
-            result = []
-            for i in range(min_height):
-                result.append(self.data[i] + other_img.data[i])
-
-        elif direction == 'vertical':
-            if width1 == 0 and width2 == 0:
-                logger.warning("Cannot concatenate vertically with empty images")
-                return self
-                
-            result = []
-            # Add first image
-            for row in self.data:
-                result.append(row[:])
-            
-            # Add second image, adjusting width if necessary
-            target_width = width1 if width1 > 0 else width2
-            for row in other_img.data:
-                adjusted_row = row[:min(target_width, len(row))]
-                if len(adjusted_row) < target_width:
-                    adjusted_row.extend([0.0] * (target_width - len(adjusted_row)))
-                result.append(adjusted_row)
+        if self.color:
+            # The result keeps this image's channel layout
+            channels = self._planes.shape[0]
+            other_planes = other_img.planes if other_img.color else to_uint8(other_img.pixels)[None]
+            other_planes = self._match_channels(other_planes, channels)
+            self.planes = np.stack([
+                to_uint8(concat_arrays(self._planes[i], other_planes[i], direction, resize_to_fit))
+                for i in range(channels)
+            ])
         else:
-            raise ValueError("Direction must be either 'horizontal' or 'vertical'")
+            self.pixels = concat_arrays(self._pixels, other_img.pixels, direction, resize_to_fit)
 
-        self.data = result
         logger.info(f"Image concatenated {direction}ly")
         return self
 
-    def segment(self, threshold: Optional[float] = None) -> 'Img':
+    SEGMENT_MODES = ('mean', 'otsu', 'adaptive')
+
+    def segment(self, threshold: Optional[float] = None, mode: str = 'mean',
+                window: int = 31, offset: float = 0.0) -> 'Img':
         """
         Apply binary segmentation to the image
         
+        In color mode the luminance is segmented and the result is black & white.
+
         Args:
-            threshold: Custom threshold value. If None, uses image mean.
+            threshold: Custom global threshold value. Overrides mode when given.
+            mode: 'mean' (global image mean), 'otsu' (Otsu's method on the histogram)
+                or 'adaptive' (each pixel against the mean of its window x window neighbourhood)
+            window: Neighbourhood size for adaptive mode
+            offset: Value subtracted from the local mean in adaptive mode
         
         Returns:
             Self for method chaining
         """
-        height = len(self.data)
-        width = len(self.data[0]) if height > 0 else 0
-
-        if height == 0 or width == 0:
+        pixels = self.pixels
+        if pixels.size == 0:
             logger.warning("Cannot segment empty image")
             return self
 
-        # Calculate threshold if not provided
-        if threshold is None:
-            total = 0
-            count = 0
-            for i in range(height):
-                for j in range(width):
-                    total += self.data[i][j]
-                    count += 1
+        halo = (0, 0)
+        if threshold is not None:
+            binarize = lambda band: (band > threshold) * 255.0
+            description = f"threshold {threshold:.2f}"
+        elif mode == 'mean':
+            # Reuses cached statistics
+            threshold = self._compute_stats()["mean"]
+            binarize = lambda band: (band > threshold) * 255.0
+            description = f"mean threshold {threshold:.2f}"
+        elif mode == 'otsu':
+            # Histogram bins hold values in [level, level + 1)
+            level = otsu_threshold(self.get_histogram())
+            binarize = lambda band: (band >= level + 1) * 255.0
+            description = f"Otsu threshold {level + 1}"
+        elif mode == 'adaptive':
+            window = max(1, int(window)) | 1  # odd, so the window is centred on the pixel
+            half = window // 2
+            halo = (half, half)
 
-            threshold = total / count if count > 0 else 127.5
+            area = window ** 2
+
+            def binarize(band):
+                # Compare window sums of fixed-point values: they are integers well below 2**53, so
+                # the summed-area table is exact and rounding can't flip pixels of a flat region
+                fixed = np.round(band * ADAPTIVE_FIXED_POINT)
+                local_sums = box_sums(np.pad(fixed, half, mode='edge'), window)
+                return (fixed * area > local_sums - offset * ADAPTIVE_FIXED_POINT * area) * 255.0
+            description = f"adaptive {window}x{window} local mean (offset {offset})"
+        else:
+            raise ValueError(f"Segmentation mode must be one of {', '.join(self.SEGMENT_MODES)}")
 
         # Apply segmentation
-        for i in range(height):
-            for j in range(width):
-                self.data[i][j] = 255.0 if self.data[i][j] > threshold else 0.0
+        self.pixels = run_filter([pixels], [binarize], halo)[0]
 
-        logger.info(f"Image segmented with threshold {threshold:.2f}")
+        logger.info(f"Image segmented with {description}")
         return self
 
+    def proxy(self, max_side: int) -> Tuple['Img', float]:
+        """
+        A downscaled copy of the image, e.g. to preview a filter quickly
+
+        Returns:
+            (copy, scale) where scale is the proxy size relative to this image (1.0 if already small enough)
+        """
+        height, width = self.get_dimensions()
+        scale = min(1.0, max_side / max(height, width, 1))
+        new_height, new_width = max(1, round(height * scale)), max(1, round(width * scale))
+        # Average whole blocks first so the bilinear step doesn't alias
+        factor = int(1 / scale)
+
+        def shrink(plane: np.ndarray) -> np.ndarray:
+            if factor > 1:
+                rows, cols = plane.shape[0] // factor, plane.shape[1] // factor
+                plane = plane[:rows * factor, :cols * factor].reshape(rows, factor, cols, factor).mean(axis=(1, 3))
+            return resize(plane, new_height, new_width)
+
+        preview = copy.copy(self)
+        preview.path = self.path.with_name(self.path.stem + '_preview' + self.path.suffix)
+        if self.color:
+            preview.planes = np.stack([to_uint8(shrink(plane.astype(float))) for plane in self._planes])
+        else:
+            preview.pixels = shrink(self._pixels)
+        return preview, scale
+
     def get_dimensions(self) -> Tuple[int, int]:
         """
         Get image dimensions
@@ -433,36 +1226,62 @@ class Img:
         Returns:
             Tuple of (height, width)
         """
-        height = len(self.data)
-        width = len(self.data[0]) if height > 0 else 0
+        shape = self._planes.shape[1:] if self.color else self._pixels.shape
+        if len(shape) < 2 or 0 in shape:
+            return 0, 0
+        height, width = shape
         return height, width
 
+    def _compute_stats(self) -> dict:
+        """
+        Compute min/max/mean/std and a 256-bin histogram, cached until the pixels change
+
+        Every statistic is a vectorized reduction over the same flat view - no
+        Python-level copies of the pixel data are made.
+        """
+        if self._stats is None:
+            flat = self.pixels.reshape(-1)
+            count = flat.size
+            if count == 0:
+                self._stats = {"min": 0, "max": 0, "mean": 0, "std": 0, "pixels": 0,
+                               "histogram": np.zeros(256, dtype=np.int64)}
+            else:
+                total = float(flat.sum())
+                mean = total / count
+                variance = max(float(np.dot(flat, flat)) / count - mean ** 2, 0.0)
+                self._stats = {
+                    "min": float(flat.min()),
+                    "max": float(flat.max()),
+                    "mean": mean,
+                    "std": variance ** 0.5,
+                    "pixels": count,
+                    "histogram": np.bincount(np.clip(flat, 0, 255).astype(np.uint8), minlength=256)
+                }
+        return self._stats
+
     def get_stats(self) -> dict:
         """
         Get basic statistics about the image
         
         Returns:
-            Dictionary with min, max, mean values
+            Dictionary with min, max, mean, std values and pixel count
         """
-        if not self.data:
-            return {"min": 0, "max": 0, "mean": 0, "pixels": 0}
-        
-        flat_data = [pixel for row in self.data for pixel in row]
+        stats = self._compute_stats()
+        return {key: value for key, value in stats.items() if key != "histogram"}
+
+    def get_histogram(self) -> np.ndarray:
+        """
+        Get the 256-bin intensity histogram of the image
         
-        return {
-            "min": min(flat_data),
-            "max": max(flat_data),
-            "mean": sum(flat_data) / len(flat_data),
-            "pixels": len(flat_data)
-        }
+        Returns:
+            Array of pixel counts per intensity level (0-255)
+        """
+        return self._compute_stats()["histogram"]
 
     def reset(self):
         """Reset image to original state"""
         try:
-            gray = rgb2gray(imread(self.path))
-            if gray.max() <= 1.0:
-                gray = gray * 255.0
-            self.data = gray.tolist()
+            self._load()
             logger.info("Image reset to original state")
         except Exception as e:
             logger.error(f"Error resetting image: {e}")
@@ -478,15 +1297,26 @@ class Img:
         Returns:
             Self for method chaining
         """
+        uploads = []
         for i, (filter_name, kwargs) in enumerate(filters):
-            if hasattr(self, filter_name):
+            if hasattr(self, filter_name) or filter_name in KERNEL_FILTERS:
                 logger.info(f"Applying filter {i+1}/{len(filters)}: {filter_name}")
-                getattr(self, filter_name)(**kwargs)
+                if hasattr(self, filter_name):
+                    getattr(self, filter_name)(**kwargs)
+                else:
+                    self.filter(filter_name, **kwargs)
                 
                 if auto_upload_each:
-                    temp_path = self.save_img(custom_suffix=f"_step_{i+1}_{filter_name}")
-                    logger.info(f"Intermediate result saved and uploaded: {temp_path.name}")
+                    # Upload in the background while the next filter runs
+                    temp_path = self.save_img(auto_upload_s3=False, custom_suffix=f"_step_{i+1}_{filter_name}")
+                    uploads.append((temp_path, self.s3_manager.upload_async(temp_path)))
             else:
                 logger.error(f"Unknown filter: {filter_name}")
+
+        for temp_path, upload in uploads:
+            if upload.result():
+                logger.info(f"Intermediate result saved and uploaded: {temp_path.name}")
+            else:
+                logger.warning(f"Intermediate result saved, but S3 upload failed: {temp_path.name}")
         
         return self
\ No newline at end of file
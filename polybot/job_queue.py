@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+from loguru import logger
+
+
+class ImageJob:
+    """An image operation queued by the gateway for a worker to run"""
+
+    def __init__(self, operation: str, params: dict, attachment_url: str, filename: str,
+                 channel_id: int, message_id: int, job_id: Optional[str] = None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.operation = operation
+        self.params = params
+        self.attachment_url = attachment_url
+        self.filename = filename
+        self.channel_id = channel_id
+        self.message_id = message_id
+
+    def to_json(self) -> str:
+        return json.dumps(self.__dict__)
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'ImageJob':
+        return cls(**json.loads(payload))
+
+
+class JobQueue(ABC):
+    """Interface for image job queue backends"""
+
+    @abstractmethod
+    def put(self, job: ImageJob):
+        """Enqueue a job (blocking - call it from a thread in async code)"""
+
+    @abstractmethod
+    def get(self, timeout: float = 1.0) -> Optional[ImageJob]:
+        """Claim the next job, waiting up to timeout seconds; None if the queue stayed empty"""
+
+    @abstractmethod
+    def ack(self, job: ImageJob):
+        """Mark a claimed job as done"""
+
+    @abstractmethod
+    def fail(self, job: ImageJob, error: str):
+        """Mark a claimed job as failed"""
+
+    def extend(self, job: ImageJob):
+        """Renew the claim on a job that is still being processed (no-op for queues without leases)"""
+
+    @property
+    def in_process(self) -> bool:
+        """Whether workers must live in the gateway process to see this queue"""
+        return False
+
+
+class InProcessJobQueue(JobQueue):
+    """Queue shared by threads of a single process - for local testing"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def put(self, job: ImageJob):
+        self._queue.put(job)
+
+    def get(self, timeout: float = 1.0) -> Optional[ImageJob]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def ack(self, job: ImageJob):
+        self._queue.task_done()
+
+    def fail(self, job: ImageJob, error: str):
+        logger.error(f"Job {job.job_id} ({job.operation}) failed: {error}")
+        self._queue.task_done()
+
+    @property
+    def in_process(self) -> bool:
+        return True
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Queue stored in a SQLite file, shared by worker processes on the same host
+
+    A claimed job that isn't acked or extended within visibility_timeout (e.g.
+    its worker crashed) becomes claimable again. Workers extend the claim while
+    a job runs, so long filters on big images aren't delivered twice.
+    """
+
+    def __init__(self, path: str, visibility_timeout: float = None, poll_interval: float = 0.2):
+        self.path = path
+        self.visibility_timeout = visibility_timeout if visibility_timeout is not None else float(
+            os.environ.get('JOB_VISIBILITY_TIMEOUT', 300))
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    claimed_at REAL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; autocommit mode so claims can use BEGIN IMMEDIATE"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, job: ImageJob):
+        self._connect().execute(
+            "INSERT INTO jobs (id, payload, created_at) VALUES (?, ?, ?)",
+            (job.job_id, job.to_json(), time.time()))
+
+    def _claim(self) -> Optional[ImageJob]:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload FROM jobs "
+                "WHERE status = 'pending' OR (status = 'running' AND claimed_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - self.visibility_timeout,)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (now, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return ImageJob.from_json(row[1]) if row else None
+
+    def get(self, timeout: float = 1.0) -> Optional[ImageJob]:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._claim()
+            if job is not None or time.monotonic() >= deadline:
+                return job
+            time.sleep(self.poll_interval)
+
+    def ack(self, job: ImageJob):
+        self._connect().execute("DELETE FROM jobs WHERE id = ?", (job.job_id,))
+
+    def extend(self, job: ImageJob):
+        self._connect().execute(
+            "UPDATE jobs SET claimed_at = ? WHERE id = ? AND status = 'running'", (time.time(), job.job_id))
+
+    def fail(self, job: ImageJob, error: str):
+        self._connect().execute("UPDATE jobs SET status = 'failed', error = ? WHERE id = ?", (error, job.job_id))
+
+
+def create_job_queue(url: Optional[str] = None) -> JobQueue:
+    """
+    Build a queue backend from a URL
+
+    Args:
+        url: 'memory://' or 'sqlite:///path/to/jobs.db' (defaults to JOB_QUEUE_URL)
+    """
+    url = url or os.environ.get('JOB_QUEUE_URL', 'memory://')
+    if url.startswith('memory://'):
+        return InProcessJobQueue()
+    if url.startswith('sqlite:///'):
+        return SQLiteJobQueue(url[len('sqlite:///'):])
+    raise ValueError(f"Unsupported job queue URL: {url}")
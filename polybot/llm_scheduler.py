@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+import itertools
+import contextlib
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from loguru import logger
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class _Waiter:
+    """A request waiting for a generation slot"""
+
+    def __init__(self, user_id: Hashable, priority: int, user_round: int, seq: int,
+                 on_position: Optional[Callable[[int], Awaitable[Any]]]):
+        self.user_id = user_id
+        self.priority = priority
+        self.user_round = user_round
+        self.seq = seq
+        self.on_position = on_position
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+        self.position = None
+        # Position reporting: the latest position not yet sent, the last one sent, and when
+        self.pending_position = None
+        self.shown_position = None
+        self.notified_at = float('-inf')
+        self.sender = None
+
+
+class LLMScheduler:
+    """
+    Caps concurrent LLM generations and queues the rest
+
+    Waiting requests are ordered by priority, then by per-user round (a user's
+    n-th queued request waits behind everyone else's first), then by arrival, so
+    one user can't monopolize the backend. Batch requests that have waited longer
+    than promote_after seconds compete as interactive ones and can't starve.
+    Callers get their queue position through on_position, and position 0 once
+    their generation starts. Position updates to one caller are at least
+    position_interval seconds apart and only carry the latest position, so a
+    long queue moving doesn't turn into a burst of message edits per waiter.
+    """
+
+    def __init__(self, max_concurrent: int = None, promote_after: float = None, position_interval: float = None):
+        self.max_concurrent = max_concurrent if max_concurrent is not None else int(os.environ.get('OLLAMA_MAX_CONCURRENT', 1))
+        self.promote_after = promote_after if promote_after is not None else float(os.environ.get('OLLAMA_PROMOTE_AFTER', 60))
+        self.position_interval = position_interval if position_interval is not None else float(
+            os.environ.get('OLLAMA_POSITION_INTERVAL', 5))
+        self.active = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._notifications = set()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, user_id: Hashable, priority: int = PRIORITY_BATCH,
+                   on_position: Optional[Callable[[int], Awaitable[Any]]] = None):
+        """Hold a generation slot for the duration of the block"""
+        await self.acquire(user_id, priority, on_position)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, user_id: Hashable, priority: int = PRIORITY_BATCH,
+                      on_position: Optional[Callable[[int], Awaitable[Any]]] = None):
+        if self.active < self.max_concurrent and not self._waiting:
+            self.active += 1
+            return
+
+        user_round = sum(1 for waiter in self._waiting if waiter.user_id == user_id)
+        waiter = _Waiter(user_id, priority, user_round, next(self._seq), on_position)
+        self._waiting.append(waiter)
+        logger.info(f"LLM request from {user_id} queued ({len(self._waiting)} waiting, {self.active} running)")
+        self._publish_positions()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                self._waiting.remove(waiter)
+                waiter.pending_position = None
+                self._publish_positions()
+            else:
+                # Cancelled right after being granted a slot - hand it on
+                self.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _sort(self):
+        now = time.monotonic()
+
+        def order(waiter):
+            priority = waiter.priority
+            if now - waiter.enqueued_at >= self.promote_after:
+                priority = min(priority, PRIORITY_INTERACTIVE)
+            return priority, waiter.user_round, waiter.seq
+
+        self._waiting.sort(key=order)
+
+    def _dispatch(self):
+        self._sort()
+        while self._waiting and self.active < self.max_concurrent:
+            waiter = self._waiting.pop(0)
+            self.active += 1
+            waiter.future.set_result(None)
+            if waiter.position is not None:
+                self._notify(waiter, 0)
+        self._publish_positions()
+
+    def _publish_positions(self):
+        self._sort()
+        for position, waiter in enumerate(self._waiting, 1):
+            if waiter.position != position:
+                waiter.position = position
+                self._notify(waiter, position)
+
+    def _notify(self, waiter: _Waiter, position: int):
+        if waiter.on_position is None:
+            return
+        waiter.pending_position = position
+        if waiter.sender is None:
+            waiter.sender = asyncio.ensure_future(self._send_positions(waiter))
+            self._notifications.add(waiter.sender)
+            waiter.sender.add_done_callback(self._notifications.discard)
+
+    async def _send_positions(self, waiter: _Waiter):
+        """Send a waiter's latest position, at most once per position_interval (the start, 0, right away)"""
+        try:
+            while waiter.pending_position is not None:
+                delay = waiter.notified_at + self.position_interval - time.monotonic()
+                if delay > 0 and waiter.pending_position != 0:
+                    await asyncio.sleep(delay)
+                    continue
+                position, waiter.pending_position = waiter.pending_position, None
+                if position == waiter.shown_position:
+                    continue
+                waiter.notified_at = time.monotonic()
+                waiter.shown_position = position
+                await self._call(waiter.on_position, position)
+        finally:
+            waiter.sender = None
+
+    @staticmethod
+    async def _call(on_position: Callable[[int], Awaitable[Any]], position: int):
+        try:
+            await on_position(position)
+        except Exception as e:
+            logger.warning(f"Could not report queue position {position}: {e}")
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+from collections import Counter
+from typing import Optional
+from loguru import logger
+from opentelemetry import metrics
+from polybot.profiling import SlowCommandProfiler
+
+meter = metrics.get_meter(__name__)
+loop_lag_histogram = meter.create_histogram(
+    "polybot_event_loop_lag_seconds",
+    unit="s",
+    description="How late the event loop ran a timer callback - time other callbacks kept it blocked",
+    explicit_bucket_boundaries_advisory=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+)
+loop_stalls_counter = meter.create_counter(
+    "polybot_event_loop_stalls_total",
+    description="Times the event loop was blocked for longer than the lag threshold"
+)
+
+
+class LoopLagWatchdog:
+    """
+    Measures event-loop scheduling lag and captures what blocked the loop
+
+    A task sleeps for interval and records how much later than that it woke up.
+    Meanwhile a thread watches the task's heartbeat: once the loop has been stuck
+    for longer than threshold it samples the loop thread's stack, which shows the
+    coroutine making the blocking call. The samples are saved as a profile (listed
+    with the slow-command profiles) when the loop recovers.
+    """
+
+    def __init__(self, interval: Optional[float] = None, threshold: Optional[float] = None,
+                 profiler: Optional[SlowCommandProfiler] = None, sample_interval: float = 0.01):
+        self.interval = interval if interval is not None else float(os.environ.get('LOOP_LAG_INTERVAL', 0.1))
+        self.threshold = threshold if threshold is not None else float(os.environ.get('LOOP_LAG_THRESHOLD', 0.25))
+        self.profiler = profiler or SlowCommandProfiler()
+        self.sample_interval = sample_interval
+        self.stalls = 0
+        self._lock = threading.Lock()
+        self._beat = time.perf_counter()
+        self._samples = Counter()
+
+    def _watch(self, loop_thread: int, stop: threading.Event):
+        """Sample the loop thread's stack while its heartbeat is overdue"""
+        while not stop.wait(self.sample_interval):
+            with self._lock:
+                stalled = time.perf_counter() - self._beat > self.interval + self.threshold
+            if not stalled:
+                continue
+            frame = sys._current_frames().get(loop_thread)
+            if frame is not None:
+                stack = self.profiler.collapse(frame)
+                with self._lock:
+                    self._samples[stack] += 1
+
+    async def run(self):
+        stop = threading.Event()
+        self._beat = time.perf_counter()
+        watcher = threading.Thread(target=self._watch, args=(threading.get_ident(), stop),
+                                   name="loop-watchdog", daemon=True)
+        watcher.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                await asyncio.sleep(self.interval)
+                now = time.perf_counter()
+                lag = max(0.0, now - start - self.interval)
+                loop_lag_histogram.record(lag)
+                with self._lock:
+                    self._beat = now
+                    samples, self._samples = self._samples, Counter()
+                if lag >= self.threshold:
+                    await self._report(lag, samples)
+        finally:
+            stop.set()
+
+    async def _report(self, lag: float, samples: Counter):
+        self.stalls += 1
+        loop_stalls_counter.add(1)
+        if not samples:
+            logger.warning(f"Event loop was blocked for {lag:.3f}s")
+            return
+        # The innermost frames of the most sampled stack name the blocking call
+        stack = samples.most_common(1)[0][0].split(';')
+        logger.warning(f"Event loop was blocked for {lag:.3f}s in: {' <- '.join(reversed(stack[-4:]))}")
+        await asyncio.to_thread(self.profiler.save, 'event_loop_stall', lag, samples)
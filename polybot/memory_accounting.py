@@ -0,0 +1,172 @@
+import os
+import threading
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+from loguru import logger
+from opentelemetry import metrics
+
+# Upper bounds of the input size buckets used as the megapixels label
+MEGAPIXEL_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+meter = metrics.get_meter(__name__)
+peak_memory_histogram = meter.create_histogram(
+    "polybot_command_peak_memory_bytes",
+    unit="By",
+    description="Peak memory a command allocated above its starting point, by operation and input megapixels",
+    explicit_bucket_boundaries_advisory=[2 ** i * 1024 ** 2 for i in range(13)]  # 1 MiB .. 4 GiB
+)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def megapixels_label(megapixels: Optional[float]) -> str:
+    """Bucket an input size so the label has a handful of values"""
+    if megapixels is None:
+        return "unknown"
+    for bound in MEGAPIXEL_BUCKETS:
+        if megapixels <= bound:
+            return f"<={bound}"
+    return f">{MEGAPIXEL_BUCKETS[-1]}"
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, or None where /proc isn't available"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Measurement:
+    """Peak memory of one command; set megapixels once the input size is known"""
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.megapixels = None
+        self.peak_bytes = None
+
+
+class MemoryAccountant:
+    """
+    Measures the peak memory each command needs
+
+    Two modes: 'tracemalloc' traces Python and NumPy allocations (accurate, but
+    slows allocation-heavy code), 'rss' samples the process's resident memory
+    from a background thread (cheap, but includes allocator and library overhead).
+    Both are process-wide, so commands running at the same time inflate each
+    other's figures. Peaks are exported per operation and input size, and a
+    command using far more memory per megapixel than usual for its operation is
+    logged as an outlier.
+    """
+
+    def __init__(self, mode: Optional[str] = None, outlier_factor: Optional[float] = None,
+                 outlier_bytes: Optional[int] = None, sample_interval: float = 0.01, min_samples: int = 5):
+        self.mode = (mode or os.environ.get('MEMORY_ACCOUNTING', 'off')).lower()
+        if self.mode not in ('off', 'tracemalloc', 'rss'):
+            logger.warning(f"Unknown MEMORY_ACCOUNTING mode '{self.mode}', memory accounting disabled")
+            self.mode = 'off'
+        self.outlier_factor = outlier_factor if outlier_factor is not None else float(
+            os.environ.get('MEMORY_OUTLIER_FACTOR', 3.0))
+        self.outlier_bytes = outlier_bytes if outlier_bytes is not None else int(
+            os.environ.get('MEMORY_OUTLIER_BYTES', 1024 ** 3))
+        self.sample_interval = sample_interval
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._active = 0
+        # operation -> [count, total bytes per megapixel]
+        self._per_megapixel = defaultdict(lambda: [0, 0.0])
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    @contextmanager
+    def measure(self, operation: str):
+        """Measure the peak memory of the enclosed block, yielding its Measurement"""
+        measurement = Measurement(operation)
+        if not self.enabled:
+            yield measurement
+            return
+
+        measure_block = self._tracemalloc_peak if self.mode == 'tracemalloc' else self._rss_peak
+        with measure_block(measurement):
+            yield measurement
+        self._record(measurement)
+
+    @contextmanager
+    def _tracemalloc_peak(self, measurement: Measurement):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # Only reset the shared peak when no other command is being measured
+            if self._active == 0:
+                tracemalloc.reset_peak()
+            self._active += 1
+            start, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            with self._lock:
+                _, peak = tracemalloc.get_traced_memory()
+                self._active -= 1
+            measurement.peak_bytes = max(0, peak - start)
+
+    @contextmanager
+    def _rss_peak(self, measurement: Measurement):
+        start = current_rss()
+        if start is None:
+            yield
+            return
+        peak = [start]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(self.sample_interval):
+                peak[0] = max(peak[0], current_rss() or 0)
+
+        sampler = threading.Thread(target=sample, name=f"rss-{measurement.operation}", daemon=True)
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+            peak[0] = max(peak[0], current_rss() or 0)
+            measurement.peak_bytes = peak[0] - start
+
+    def _record(self, measurement: Measurement):
+        if measurement.peak_bytes is None:
+            return
+        peak_memory_histogram.record(measurement.peak_bytes, {
+            "operation": measurement.operation,
+            "megapixels": megapixels_label(measurement.megapixels),
+            "mode": self.mode,
+        })
+
+        per_megapixel = measurement.peak_bytes / measurement.megapixels if measurement.megapixels else None
+        with self._lock:
+            stats = self._per_megapixel[measurement.operation]
+            typical = stats[1] / stats[0] if stats[0] >= self.min_samples else None
+            if per_megapixel is not None:
+                stats[0] += 1
+                stats[1] += per_megapixel
+
+        size = f" on {measurement.megapixels:.1f} MP" if measurement.megapixels else ""
+        if measurement.peak_bytes >= self.outlier_bytes:
+            logger.warning(f"Memory outlier: {measurement.operation}{size} peaked at "
+                           f"{measurement.peak_bytes / 1024 ** 2:.0f} MiB")
+        elif typical and per_megapixel is not None and per_megapixel > self.outlier_factor * typical:
+            logger.warning(f"Memory outlier: {measurement.operation}{size} peaked at "
+                           f"{measurement.peak_bytes / 1024 ** 2:.0f} MiB, {per_megapixel / typical:.1f}x "
+                           f"its usual {typical / 1024 ** 2:.1f} MiB per megapixel")
+        else:
+            logger.debug(f"{measurement.operation}{size} peaked at {measurement.peak_bytes / 1024 ** 2:.1f} MiB")
+
+    def cost_per_megapixel(self, operation: str) -> Optional[float]:
+        """Average peak bytes per input megapixel seen for an operation, e.g. for admission control"""
+        with self._lock:
+            count, total = self._per_megapixel.get(operation, (0, 0.0))
+        return total / count if count else None
@@ -0,0 +1,83 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+import requests
+from loguru import logger
+from polybot.ollama_client import OllamaClient
+from polybot.llm_scheduler import PRIORITY_BATCH
+
+
+def parse_busy_hours(spec: str) -> List[Tuple[int, int]]:
+    """
+    Parse hour ranges like '8-12,18-23' into (start, end) pairs
+
+    Ranges include both ends and may wrap midnight ('22-2').
+    """
+    ranges = []
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        start, _, end = part.partition('-')
+        start = int(start)
+        end = int(end) if end else start
+        if not (0 <= start <= 23 and 0 <= end <= 23):
+            raise ValueError(f"Invalid busy hour range: {part}")
+        ranges.append((start, end))
+    return ranges
+
+
+class ModelWarmer:
+    """
+    Keeps the Ollama model loaded so users don't pay its load time
+
+    The model is loaded once at startup. During the configured busy hours it is
+    pinged every ping_interval seconds (skipped while generations are running or
+    queued, which keep it loaded anyway); outside them Ollama's keep_alive decides
+    when it is unloaded. Loads take a scheduler slot like any generation.
+    """
+
+    def __init__(self, client: OllamaClient, busy_hours: str = None, ping_interval: float = None,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.client = client
+        self.busy_hours = parse_busy_hours(busy_hours if busy_hours is not None else os.environ.get('OLLAMA_BUSY_HOURS', ''))
+        self.ping_interval = ping_interval if ping_interval is not None else float(os.environ.get('OLLAMA_PING_INTERVAL', 240))
+        self.clock = clock
+
+    def is_busy(self, hour: Optional[int] = None) -> bool:
+        hour = self.clock().hour if hour is None else hour
+        for start, end in self.busy_hours:
+            if start <= end and start <= hour <= end:
+                return True
+            if start > end and (hour >= start or hour <= end):
+                return True
+        return False
+
+    async def warm(self) -> Optional[float]:
+        """Load the model, returning the load time in seconds (None if Ollama is unreachable)"""
+        try:
+            # The load counts against OLLAMA_MAX_CONCURRENT like any generation
+            async with self.client.scheduler.slot('model-warmer', PRIORITY_BATCH):
+                load_seconds = await asyncio.to_thread(self.client.load)
+        except requests.RequestException as e:
+            logger.warning(f"Could not warm up Ollama model {self.client.model}: {e}")
+            return None
+        logger.info(f"Ollama model {self.client.model} is loaded (load took {load_seconds:.2f}s)")
+        return load_seconds
+
+    async def _ping(self, force: bool = False):
+        """Warm the model if it is due; errors are logged so the keep-alive loop survives them"""
+        try:
+            # Only ping an idle backend; with nothing running or queued the slot is granted at once
+            scheduler = self.client.scheduler
+            if force or (self.is_busy() and not scheduler.active and not scheduler.queued):
+                await self.warm()
+        except Exception as e:
+            logger.error(f"Error keeping Ollama model {self.client.model} loaded: {e}")
+
+    async def run(self):
+        """Warm up at startup, then keep the model loaded during busy hours"""
+        await self._ping(force=True)
+        if not self.busy_hours:
+            return
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await self._ping()
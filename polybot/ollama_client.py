@@ -0,0 +1,197 @@
+import os
+import re
+import asyncio
+import requests
+from loguru import logger
+from opentelemetry import metrics
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from polybot.cache import TTLCache
+from polybot.circuit_breaker import CircuitBreaker
+from polybot.llm_scheduler import LLMScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+meter = metrics.get_meter(__name__)
+ollama_answers_counter = meter.create_counter(
+    "polybot_ollama_answers_total",
+    description="!ask answers by source: generated by the backend, served from the cache, or shared with an identical in-flight request"
+)
+ollama_load_histogram = meter.create_histogram(
+    "polybot_ollama_load_seconds",
+    unit="s",
+    description="Time Ollama spent loading the model into memory before a request (near zero when warm)"
+)
+ollama_generation_histogram = meter.create_histogram(
+    "polybot_ollama_generation_seconds",
+    unit="s",
+    description="Time Ollama spent evaluating the prompt and generating the reply"
+)
+
+NANOSECONDS = 1e9
+
+
+class OllamaClient:
+    """
+    Chat client for Ollama that shares answers between users asking the same question
+
+    Questions are keyed by (model, normalized question). A question already being
+    generated is not sent again - later askers await the same backend call - and
+    completed answers are cached for a while, so a popular question costs one
+    generation instead of one per user. Generations go through an LLMScheduler
+    that caps how many run on the backend at once.
+    """
+
+    def __init__(self, url: str, model: str, cache_ttl: float = None, cache_size: int = None, timeout: float = 180,
+                 scheduler: Optional[LLMScheduler] = None, keep_alive: str = None):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        # An unreachable host fails after connect_timeout instead of waiting for the full timeout
+        self.connect_timeout = float(os.environ.get('BACKEND_CONNECT_TIMEOUT', 5))
+        self.breaker = CircuitBreaker('ollama')
+        # How long Ollama keeps the model loaded after each request (Ollama's own default is 5m)
+        self.keep_alive = keep_alive if keep_alive is not None else os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+        self.scheduler = scheduler or LLMScheduler()
+        self.cache = TTLCache(
+            ttl=cache_ttl if cache_ttl is not None else float(os.environ.get('OLLAMA_CACHE_TTL', 600)),
+            max_size=cache_size if cache_size is not None else int(os.environ.get('OLLAMA_CACHE_SIZE', 256))
+        )
+        self._in_flight = {}
+
+    @property
+    def endpoint(self) -> str:
+        """The /api/chat endpoint, whether or not the configured URL includes the path"""
+        if self.url.endswith('/api/chat'):
+            return self.url
+        return self.url.rstrip('/') + '/api/chat'
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Case, whitespace and trailing punctuation don't change the question"""
+        return re.sub(r'\s+', ' ', question).strip().rstrip('?!. ').lower()
+
+    def chat(self, messages: list, response_format: Optional[str] = None) -> str:
+        """
+        Send a chat request and return the reply text (blocking)
+
+        Args:
+            response_format: Ollama output format, e.g. 'json' to constrain the reply to valid JSON
+
+        Raises:
+            requests.HTTPError: Ollama answered with a non-200 status
+            requests.RequestException: Ollama could not be reached
+        """
+        logger.info(f"Sending request to Ollama: {self.endpoint} (model {self.model})")
+        return self._post(messages, response_format).get("message", {}).get("content", "")
+
+    def load(self) -> float:
+        """
+        Load the model into memory without generating anything (blocking)
+
+        Returns:
+            Seconds Ollama spent loading the model (near zero if it was already loaded)
+        """
+        return self._post([]).get("load_duration", 0) / NANOSECONDS
+
+    def health_check(self, timeout: float = 5):
+        """
+        Check that the Ollama server answers, without loading or running the model (blocking)
+
+        Raises:
+            requests.RequestException: Ollama is unreachable or answered with an error status
+        """
+        response = requests.get(self.endpoint[:-len('/api/chat')] + '/api/tags', timeout=timeout)
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Ollama service returned status code {response.status_code}", response=response)
+
+    def _post(self, messages: list, response_format: Optional[str] = None) -> dict:
+        data = {"model": self.model, "messages": messages, "stream": False, "keep_alive": self.keep_alive}
+        if response_format:
+            data["format"] = response_format
+        with self.breaker:
+            response = requests.post(
+                self.endpoint,
+                json=data,
+                headers={"Content-Type": "application/json"},
+                timeout=(self.connect_timeout, self.timeout)
+            )
+            if response.status_code != 200:
+                logger.error(f"Ollama returned status code {response.status_code}: {response.text}")
+                raise requests.HTTPError(f"Ollama service returned status code {response.status_code}", response=response)
+            result = response.json()
+        self._record_timings(result, 'warmup' if not messages else 'chat')
+        return result
+
+    def _record_timings(self, result: dict, kind: str):
+        """Split Ollama's reported durations into model load time and generation time"""
+        attributes = {"model": self.model, "kind": kind}
+        load_seconds = result.get("load_duration", 0) / NANOSECONDS
+        ollama_load_histogram.record(load_seconds, attributes)
+        generation_ns = result.get("prompt_eval_duration", 0) + result.get("eval_duration", 0)
+        if generation_ns:
+            ollama_generation_histogram.record(generation_ns / NANOSECONDS, attributes)
+        if load_seconds >= 1:
+            logger.info(f"Ollama spent {load_seconds:.1f}s loading {self.model} ({kind})")
+
+    async def generate(self, messages: list, user_id: Hashable = None, priority: int = PRIORITY_BATCH,
+                       on_position: Optional[Callable[[int], Awaitable[Any]]] = None,
+                       response_format: Optional[str] = None) -> str:
+        """
+        Run a chat request once the scheduler grants a slot
+
+        Args:
+            on_position: Called with the queue position while waiting, then 0 when generation starts
+            response_format: Ollama output format (see chat)
+        """
+        # Don't queue behind other requests just to fail fast afterwards
+        self.breaker.reject_if_open()
+        await self.scheduler.acquire(user_id, priority, on_position)
+        # A cancelled caller can't stop the request thread, so the slot is only
+        # released once the thread is done - otherwise the cap could be exceeded
+        generation = asyncio.ensure_future(asyncio.to_thread(self.chat, messages, response_format))
+        generation.add_done_callback(self._release_slot)
+        return await asyncio.shield(generation)
+
+    def _release_slot(self, generation: asyncio.Future):
+        self.scheduler.release()
+        if not generation.cancelled() and generation.exception() is not None:
+            # Retrieved here so an abandoned generation's error isn't reported as never retrieved
+            logger.debug(f"Ollama generation failed: {generation.exception()}")
+
+    async def ask(self, question: str, user_id: Hashable = None,
+                  on_position: Optional[Callable[[int], Awaitable[Any]]] = None) -> str:
+        """
+        Answer a single question, from the cache or a shared in-flight request when possible
+
+        Questions are scheduled ahead of batch work; on_position only follows the
+        request that actually reaches the backend.
+
+        Raises:
+            requests.RequestException: the backend call failed (the error is not cached)
+        """
+        key = (self.model, self.normalize_question(question))
+        answer = self.cache.get(key)
+        if answer is not None:
+            logger.info(f"Ollama cache hit for '{key[1]}'")
+            ollama_answers_counter.add(1, {"source": "cache"})
+            return answer
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            logger.info(f"Joining in-flight Ollama request for '{key[1]}'")
+            ollama_answers_counter.add(1, {"source": "coalesced"})
+        else:
+            task = asyncio.ensure_future(self._generate(key, question, user_id, on_position))
+            self._in_flight[key] = task
+            ollama_answers_counter.add(1, {"source": "backend"})
+        # Shielded so one asker giving up doesn't cancel the answer for the others
+        return await asyncio.shield(task)
+
+    async def _generate(self, key: tuple, question: str, user_id: Hashable,
+                        on_position: Optional[Callable[[int], Awaitable[Any]]]) -> str:
+        try:
+            answer = await self.generate([{"role": "user", "content": question}], user_id,
+                                         PRIORITY_INTERACTIVE, on_position)
+            if answer:
+                self.cache.set(key, answer)
+            return answer
+        finally:
+            del self._in_flight[key]
@@ -0,0 +1,81 @@
+import os
+import time
+import uuid
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+from loguru import logger
+
+
+class PendingPrediction:
+    """A submitted YOLO job waiting for its callback"""
+
+    def __init__(self, prediction_id: str, message, cache_key: Optional[str], expires_at: float):
+        self.prediction_id = prediction_id
+        self.message = message
+        self.cache_key = cache_key
+        self.expires_at = expires_at
+
+
+class PredictionRegistry:
+    """
+    Routes YOLO prediction callbacks to the Discord message that is waiting for them
+
+    Nothing is awaited while a prediction is pending - the registry only holds the
+    placeholder message, and a single sweeper task expires entries whose callback
+    never arrived. The status server and the bot share one event loop, so the
+    callback endpoint delivers results with a direct await.
+    """
+
+    def __init__(self,
+                 on_result: Callable[[PendingPrediction, dict], Awaitable[Any]],
+                 on_expired: Callable[[PendingPrediction], Awaitable[Any]],
+                 timeout: Optional[float] = None):
+        self.on_result = on_result
+        self.on_expired = on_expired
+        self.timeout = timeout if timeout is not None else float(os.environ.get('YOLO_PREDICTION_TIMEOUT', 120))
+        self._pending = {}
+
+    def register(self, message, cache_key: Optional[str] = None) -> str:
+        """Track a placeholder message and return a new prediction ID for it"""
+        prediction_id = uuid.uuid4().hex
+        self._pending[prediction_id] = PendingPrediction(
+            prediction_id, message, cache_key, time.monotonic() + self.timeout)
+        return prediction_id
+
+    def discard(self, prediction_id: str) -> Optional[PendingPrediction]:
+        return self._pending.pop(prediction_id, None)
+
+    async def resolve(self, prediction_id: str, data: dict) -> bool:
+        """
+        Deliver a callback payload to its waiting message
+
+        Returns:
+            False if the ID is unknown or already expired
+        """
+        pending = self.discard(prediction_id)
+        if pending is None:
+            return False
+        await self.on_result(pending, data)
+        return True
+
+    def expire(self) -> list:
+        """Remove and return all predictions past their deadline"""
+        now = time.monotonic()
+        expired = [p for p in self._pending.values() if p.expires_at <= now]
+        for pending in expired:
+            del self._pending[pending.prediction_id]
+        return expired
+
+    async def run_expiry(self, interval: float = 5.0):
+        """Periodically notify the owners of predictions that timed out"""
+        while True:
+            await asyncio.sleep(interval)
+            for pending in self.expire():
+                logger.warning(f"Prediction {pending.prediction_id} timed out after {self.timeout}s")
+                try:
+                    await self.on_expired(pending)
+                except Exception as e:
+                    logger.error(f"Error expiring prediction {pending.prediction_id}: {e}")
+
+    def __len__(self):
+        return len(self._pending)
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import functools
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+from loguru import logger
+
+
+class _Capture:
+    """Samples collected for one profiled block"""
+
+    def __init__(self, name: str, thread_ident: int, lock: threading.Condition):
+        self.name = name
+        self.thread_ident = thread_ident
+        self.lock = lock
+        self.start = time.perf_counter()
+        self.samples = Counter()
+        self.idle_samples = 0
+        self.overlapped = False
+        # Worker threads running on behalf of the block: ident -> [name, nesting depth]
+        self.workers = {}
+
+
+# The capture of the command running in the current context, if it is being profiled
+_current_capture = contextvars.ContextVar('profiler_capture', default=None)
+
+
+def sampled(func: Callable) -> Callable:
+    """
+    Wrap func so the thread running it is sampled along with the command profiled in the current context
+
+    The capture is looked up when func is wrapped, so wrap it before handing it to
+    another thread or pool. Without an active capture func is returned as it is.
+    """
+    capture = _current_capture.get()
+    if capture is None:
+        return func
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        with capture.lock:
+            capture.workers.setdefault(ident, [threading.current_thread().name, 0])[1] += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with capture.lock:
+                worker = capture.workers[ident]
+                worker[1] -= 1
+                if worker[1] == 0:
+                    del capture.workers[ident]
+    return run
+
+
+async def profiled_to_thread(func: Callable, *args, **kwargs):
+    """asyncio.to_thread, sampling the worker thread as part of the command being profiled"""
+    return await asyncio.to_thread(sampled(func), *args, **kwargs)
+
+
+class SlowCommandProfiler:
+    """
+    Samples the stack of commands that run longer than a latency threshold
+
+    The thread that entered capture() is sampled, plus any worker thread running
+    a function wrapped with sampled() (or started with profiled_to_thread) within
+    it; worker stacks are rooted at their thread name. Sampling is per thread,
+    not per command: a command awaited on the event loop thread records whatever
+    that thread is running, including other coroutines. Samples of the loop
+    waiting in its selector are counted as idle instead of being recorded, and
+    profiles of commands that overlapped another profiled command on the same
+    thread are marked as such in their metadata.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, interval: Optional[float] = None,
+                 profiles_dir: Optional[str] = None, max_profiles: int = 50):
+        self.threshold = threshold if threshold is not None else float(os.environ.get('PROFILE_THRESHOLD_SECONDS', 2.0))
+        self.interval = interval if interval is not None else float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.profiles_dir = Path(profiles_dir or os.environ.get('PROFILES_DIR', os.path.join(project_root, 'profiles')))
+        self.max_profiles = max_profiles
+        self._captures = set()
+        self._condition = threading.Condition()
+        self._sampler = None
+
+    @contextmanager
+    def capture(self, name: str):
+        """
+        Profile the enclosed block if it is still running after the threshold
+
+        Nothing is sampled for fast commands; once the threshold passes, the
+        profiler's sampler thread samples the calling thread's stack until the
+        block exits. One sampler thread serves all captures.
+
+        Args:
+            name: Label for the profile (usually the command/operation name)
+        """
+        capture = _Capture(name, threading.get_ident(), self._condition)
+        with self._condition:
+            for other in self._captures:
+                if other.thread_ident == capture.thread_ident:
+                    other.overlapped = capture.overlapped = True
+            self._captures.add(capture)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._sampler.start()
+            self._condition.notify()
+        token = _current_capture.set(capture)
+        try:
+            yield
+        finally:
+            _current_capture.reset(token)
+            elapsed = time.perf_counter() - capture.start
+            with self._condition:
+                self._captures.discard(capture)
+            # A slow command is saved even if only idle samples were taken, so it shows up at all
+            if elapsed >= self.threshold and (capture.samples or capture.idle_samples):
+                self.save(name, elapsed, capture.samples, {
+                    "idle_samples": capture.idle_samples,
+                    "overlapped": capture.overlapped,
+                })
+
+    def _sample_loop(self):
+        """Sample every capture past the threshold each interval; sleep while none is"""
+        with self._condition:
+            while True:
+                if not self._captures:
+                    self._condition.wait()
+                    continue
+                now = time.perf_counter()
+                due = [capture for capture in self._captures if now - capture.start >= self.threshold]
+                if not due:
+                    first = min(capture.start for capture in self._captures)
+                    self._condition.wait(first + self.threshold - now)
+                    continue
+                frames = sys._current_frames()
+                for capture in due:
+                    frame = frames.get(capture.thread_ident)
+                    if frame is not None:
+                        if self.is_idle(frame):
+                            capture.idle_samples += 1
+                        else:
+                            capture.samples[self.collapse(frame)] += 1
+                    for ident, (thread_name, _) in capture.workers.items():
+                        frame = frames.get(ident)
+                        if frame is not None and ident != capture.thread_ident:
+                            capture.samples[f"{thread_name};{self.collapse(frame)}"] += 1
+                self._condition.wait(self.interval)
+
+    @staticmethod
+    def is_idle(frame) -> bool:
+        """Whether the thread is an event loop blocked in its selector, waiting for I/O"""
+        return os.path.basename(frame.f_code.co_filename) == 'selectors.py'
+
+    @staticmethod
+    def collapse(frame) -> str:
+        """Render a frame chain as a collapsed stack (root first, ';' separated)"""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def save(self, name: str, elapsed: float, samples: Counter, extra: Optional[dict] = None):
+        """Write a collapsed-stack profile plus its metadata (updated with extra) to the profiles directory"""
+        try:
+            self.profiles_dir.mkdir(parents=True, exist_ok=True)
+            profile_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{name}"
+            stacks_path = self.profiles_dir / f"{profile_id}.folded"
+            stacks_path.write_text(''.join(f"{stack} {count}\n" for stack, count in samples.most_common()))
+
+            meta = {
+                "id": profile_id,
+                "command": name,
+                "elapsed_seconds": round(elapsed, 3),
+                "threshold_seconds": self.threshold,
+                "samples": sum(samples.values()),
+                "created_at": datetime.now().isoformat(),
+            }
+            meta.update(extra or {})
+            (self.profiles_dir / f"{profile_id}.json").write_text(json.dumps(meta))
+            logger.warning(f"Slow command '{name}' took {elapsed:.2f}s, profile saved: {stacks_path}")
+            self._prune()
+        except Exception as e:
+            logger.error(f"Failed to save profile for '{name}': {e}")
+
+    def _prune(self):
+        """Keep only the newest max_profiles profiles on disk"""
+        metas = sorted(self.profiles_dir.glob('*.json'))
+        for meta_path in metas[:-self.max_profiles]:
+            meta_path.unlink(missing_ok=True)
+            meta_path.with_suffix('.folded').unlink(missing_ok=True)
+
+    def list_profiles(self) -> list:
+        """Return metadata for all saved profiles, newest first"""
+        if not self.profiles_dir.exists():
+            return []
+        profiles = []
+        for meta_path in sorted(self.profiles_dir.glob('*.json'), reverse=True):
+            try:
+                profiles.append(json.loads(meta_path.read_text()))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable profile {meta_path.name}: {e}")
+        return profiles
+
+    def read_profile(self, profile_id: str) -> Optional[str]:
+        """Return the collapsed stacks of a saved profile, or None if it doesn't exist"""
+        stacks_path = self.profiles_dir / f"{Path(profile_id).name}.folded"
+        if not stacks_path.exists():
+            return None
+        return stacks_path.read_text()
@@ -0,0 +1,177 @@
+import re
+import json
+from typing import List, Optional
+from loguru import logger
+
+# Every pattern is anchored to a single stripped line, and no two adjacent
+# quantifiers can match the same run of characters, so a failed match backtracks
+# at most once over the line and parsing stays linear however malformed it is.
+_ITEM_START = re.compile(r'^(\d{1,2})[.)]\s*(.*)$')
+_FIELD = re.compile(
+    r'^(?:[-•]\s*)?(?:[^\w\s]{1,2}\s*)?'
+    r'(song title|title|song|artist name|artist|year of release|year|release year|youtube link|youtube|link|description|why)'
+    r'\s*:\s*(.*)$',
+    re.IGNORECASE)
+_DESCRIPTION_EMOJI = re.compile(r'^💬\s*(.*)$')
+_MARKDOWN_LINK = re.compile(r'\[[^\[\]\n]*\]\(([^\s()]+)\)')
+_URL = re.compile(r'https?://\S+')
+
+_FIELD_NAMES = {
+    'song title': 'title', 'title': 'title', 'song': 'title',
+    'artist name': 'artist', 'artist': 'artist',
+    'year of release': 'year', 'year': 'year', 'release year': 'year',
+    'youtube link': 'link', 'youtube': 'link', 'link': 'link',
+    'description': 'description', 'why': 'description',
+}
+
+# Appended to the prompt when Ollama is asked for JSON output (format: json)
+JSON_FORMAT_INSTRUCTIONS = """Respond only with JSON in exactly this shape:
+{"songs": [{"title": "Example Song", "artist": "Example Artist", "year": "2000", "youtube_link": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "description": "Why this song matches the preferences."}]}
+"""
+
+
+class Song:
+    """One recommended song"""
+
+    def __init__(self, title: str = '', artist: str = '', year: str = '', link: str = '', description: str = ''):
+        self.title = title
+        self.artist = artist
+        self.year = year
+        self.link = link
+        self.description = description
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.title and self.artist)
+
+    def __eq__(self, other):
+        return isinstance(other, Song) and self.__dict__ == other.__dict__
+
+    def __repr__(self):
+        return f"Song({self.title!r}, {self.artist!r}, {self.year!r}, {self.link!r})"
+
+
+def _clean_link(value: str) -> str:
+    """Extract the URL from a plain, markdown or angle-bracketed link"""
+    markdown = _MARKDOWN_LINK.search(value)
+    if markdown:
+        return markdown.group(1)
+    url = _URL.search(value)
+    return url.group(0).rstrip('.,;)>') if url else ''
+
+
+def _set_field(song: Song, name: str, value: str):
+    field = _FIELD_NAMES[name.lower()]
+    value = value.strip()
+    if field == 'link':
+        song.link = _clean_link(value)
+    elif not getattr(song, field):
+        setattr(song, field, value)
+
+
+def parse_songs(text: str) -> List[Song]:
+    """
+    Parse the numbered "Song Title: / Artist Name: / ..." format line by line
+
+    A numbered line starts a new song; the rest of that line may already be the
+    title or a labelled field. Unlabelled lines after a description continue it.
+    Songs without both a title and an artist are dropped.
+    """
+    songs = []
+    current = None
+    in_description = False
+    for line in text.replace('*', '').splitlines():
+        line = line.strip()
+        item = _ITEM_START.match(line)
+        if item:
+            if current is not None:
+                songs.append(current)
+            current = Song()
+            in_description = False
+            line = item.group(2)
+            if not line.strip():
+                continue
+            if not _FIELD.match(line):
+                current.title = line.strip()
+                continue
+        if current is None:
+            continue
+
+        field = _FIELD.match(line)
+        if field:
+            _set_field(current, field.group(1), field.group(2))
+            in_description = _FIELD_NAMES[field.group(1).lower()] == 'description'
+            continue
+        emoji_description = _DESCRIPTION_EMOJI.match(line)
+        if emoji_description:
+            current.description = emoji_description.group(1).strip()
+            in_description = True
+        elif in_description and line.strip():
+            current.description += ' ' + line.strip()
+        elif not line.strip():
+            in_description = False
+
+    if current is not None:
+        songs.append(current)
+    return [song for song in songs if song.complete]
+
+
+def parse_songs_json(text: str) -> Optional[List[Song]]:
+    """
+    Parse a JSON response ({"songs": [...]} or a bare list)
+
+    Returns:
+        The songs, or None if the text isn't JSON in a recognised shape
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = data.get('songs', data.get('recommendations'))
+    if not isinstance(data, list):
+        return None
+
+    songs = []
+    for entry in data:
+        if not isinstance(entry, dict):
+            continue
+        song = Song(
+            title=str(entry.get('title') or entry.get('song') or '').strip(),
+            artist=str(entry.get('artist') or '').strip(),
+            year=str(entry.get('year') or '').strip(),
+            link=_clean_link(str(entry.get('youtube_link') or entry.get('link') or '')),
+            description=str(entry.get('description') or '').strip()
+        )
+        if song.complete:
+            songs.append(song)
+    return songs
+
+
+def format_songs(songs: List[Song]) -> str:
+    formatted_output = ""
+    for i, song in enumerate(songs, 1):
+        year = f" ({song.year})" if song.year else ""
+        formatted_output += f"**{i}. {song.title}** by {song.artist}{year}\n"
+        if song.link:
+            formatted_output += f"🎬 [Watch on YouTube]({song.link})\n"
+        if song.description:
+            formatted_output += f"💬 {song.description}\n"
+        formatted_output += "\n"
+    return formatted_output
+
+
+def format_song_recommendations(ai_response: str) -> str:
+    """
+    Format an LLM song recommendation response for Discord
+
+    JSON output is parsed directly; otherwise the numbered text format is parsed.
+    The original response is returned if no song could be recognised.
+    """
+    songs = parse_songs_json(ai_response) if ai_response.lstrip().startswith(('{', '[')) else None
+    if not songs:
+        songs = parse_songs(ai_response)
+    if not songs:
+        logger.warning("Could not recognise any songs in the recommendation response, sending it as is")
+        return ai_response
+    return format_songs(songs)
@@ -0,0 +1,62 @@
+import sys
+import time
+import importlib
+import contextlib
+from loguru import logger
+
+_STARTED = time.perf_counter()
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase takes, from process start to ready
+
+    Phases are grouped by kind ('import', 'init', ...) so time-to-ready can be
+    tracked and budgeted per subsystem. Heavy subsystems load lazily, so their
+    cost shows up as a 'lazy' phase at first use instead of at startup.
+    """
+
+    def __init__(self, started: float = _STARTED):
+        self.started = started
+        self.phases = []
+        self.ready_seconds = None
+
+    @contextlib.contextmanager
+    def phase(self, kind: str, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((kind, name, time.perf_counter() - start))
+
+    def lazy_import(self, module_name: str):
+        """Import a heavy module on first use, recording the time of the first import as a 'lazy' phase"""
+        module = sys.modules.get(module_name)
+        if module is not None:
+            return module
+        with self.phase('lazy', module_name):
+            return importlib.import_module(module_name)
+
+    def mark_ready(self):
+        """Record time-to-ready (only the first call counts) and log the breakdown"""
+        if self.ready_seconds is not None:
+            return
+        self.ready_seconds = time.perf_counter() - self.started
+        logger.info(self.format_report())
+
+    def report(self) -> dict:
+        return {
+            "ready_seconds": self.ready_seconds,
+            "phases": [{"kind": kind, "name": name, "seconds": round(seconds, 4)}
+                       for kind, name, seconds in self.phases],
+        }
+
+    def format_report(self) -> str:
+        lines = [f"Startup report: ready after {self.ready_seconds:.2f}s"]
+        for kind, name, seconds in self.phases:
+            lines.append(f"  {kind:<7} {name:<32} {seconds * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+# Shared by the entry point and lazily loaded subsystems
+startup_timer = StartupTimer()
@@ -0,0 +1,134 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+from pathlib import Path
+from typing import List
+from loguru import logger
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+
+# Only image files are managed - the directory may also hold e.g. a SQLite job queue
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
+_managers = weakref.WeakSet()
+
+
+def _observe_usage(options: CallbackOptions):
+    for manager in list(_managers):
+        yield Observation(manager.usage_bytes, {"directory": str(manager.directory)})
+
+
+meter = metrics.get_meter(__name__)
+meter.create_observable_gauge(
+    "polybot_photos_bytes",
+    callbacks=[_observe_usage],
+    unit="By",
+    description="Bytes of images kept in the photos directory"
+)
+
+
+class StorageManager:
+    """
+    Keeps an image directory within a byte and age budget
+
+    Files older than max_age are deleted, then the oldest remaining ones until
+    the directory fits in max_bytes. Age is the modification time: every image
+    is written once per command and never read again afterwards, so this is
+    first-in first-out rather than LRU. Files younger than grace seconds are
+    never evicted, so images of commands still in progress stay put. Cleanup
+    runs in the background every interval seconds, and early when record()
+    notices the budget was exceeded.
+    """
+
+    def __init__(self, directory, max_bytes: int = None, max_age: float = None, interval: float = None,
+                 grace: float = 120):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get('PHOTOS_MAX_BYTES', 1024 ** 3))
+        self.max_age = max_age if max_age is not None else float(os.environ.get('PHOTOS_MAX_AGE', 3 * 24 * 3600))
+        self.interval = interval if interval is not None else float(os.environ.get('PHOTOS_CLEANUP_INTERVAL', 300))
+        self.grace = grace
+        self.usage_bytes = 0
+        self._lock = threading.Lock()
+        self._over_budget = asyncio.Event()
+        _managers.add(self)
+
+    def _images(self) -> list:
+        """(modification time, size, path) of every image in the directory"""
+        images = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return images
+        for entry in entries:
+            if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.is_file():
+                images.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+        return images
+
+    def record(self, path):
+        """Account for a newly written file, requesting an early cleanup if it pushed usage over budget"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self.usage_bytes += size
+            over_budget = self.usage_bytes > self.max_bytes
+        if over_budget:
+            self._over_budget.set()
+
+    def cleanup(self) -> List[Path]:
+        """
+        Delete expired files, then the oldest ones until within max_bytes
+
+        Returns:
+            Paths of the deleted files
+        """
+        now = time.time()
+        images = sorted(self._images())
+        total = sum(size for _, size, _ in images)
+        removed = []
+        for modified, size, path in images:
+            age = now - modified
+            if age < self.grace:
+                break
+            if age <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete {path}: {e}")
+                continue
+            total -= size
+            removed.append(path)
+
+        with self._lock:
+            self.usage_bytes = total
+        if removed:
+            logger.info(f"Storage cleanup removed {len(removed)} file(s) from {self.directory}, "
+                        f"{total / 1024 ** 2:.1f} MiB in use")
+        if total > self.max_bytes:
+            logger.warning(f"{self.directory} uses {total} bytes, over its {self.max_bytes} byte budget, "
+                           f"but the remaining files are still in use")
+        return removed
+
+    async def run(self):
+        """Clean up periodically, or sooner when a write pushes usage over budget"""
+        while True:
+            await asyncio.to_thread(self.cleanup)
+            self._over_budget.clear()
+            try:
+                await asyncio.wait_for(self._over_budget.wait(), self.interval)
+                # Let a burst of writes land before scanning again
+                await asyncio.sleep(1)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+from unittest import mock
+import requests
+from polybot.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from polybot.health import HealthProber
+from polybot.ollama_client import OllamaClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise requests.ConnectionError("connection refused")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30, clock=self.clock)
+
+    def call(self, func):
+        with self.breaker:
+            return func()
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            self.assertRaises(requests.ConnectionError, self.call, fail)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertRaises(requests.ConnectionError, self.call, fail)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        backend = mock.Mock()
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.call(backend)
+        backend.assert_not_called()
+        self.assertEqual(raised.exception.retry_after, 30)
+
+    def test_success_resets_failure_count(self):
+        self.assertRaises(requests.ConnectionError, self.call, fail)
+        self.assertRaises(requests.ConnectionError, self.call, fail)
+        self.call(lambda: None)
+        self.assertRaises(requests.ConnectionError, self.call, fail)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_client_errors_do_not_count(self):
+        response = mock.Mock(status_code=400)
+
+        def bad_request():
+            raise requests.HTTPError("bad request", response=response)
+
+        for _ in range(5):
+            self.assertRaises(requests.HTTPError, self.call, bad_request)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_allows_one_trial(self):
+        for _ in range(3):
+            self.assertRaises(requests.ConnectionError, self.call, fail)
+        self.clock.now = 31
+
+        self.breaker.check()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # Only the trial call goes through while it runs
+        self.assertRaises(CircuitOpenError, self.breaker.check)
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_trial_reopens(self):
+        for _ in range(3):
+            self.assertRaises(requests.ConnectionError, self.call, fail)
+        self.clock.now = 31
+        self.assertRaises(requests.ConnectionError, self.call, fail)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.retry_after, 30)
+
+
+class TestOllamaFailsFast(unittest.TestCase):
+
+    def test_open_circuit_skips_the_queue_and_the_backend(self):
+        client = OllamaClient('http://ollama.test', 'test-model', timeout=1)
+        client.breaker = CircuitBreaker('ollama', failure_threshold=1, reset_timeout=60)
+        with mock.patch('polybot.ollama_client.requests.post', side_effect=requests.ConnectTimeout("timed out")) as post:
+            self.assertRaises(requests.ConnectTimeout, client.chat, [{"role": "user", "content": "hi"}])
+            self.assertRaises(CircuitOpenError, asyncio.run, client.generate([{"role": "user", "content": "hi"}]))
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args.kwargs['timeout'], (client.connect_timeout, 1))
+
+
+class TestHealthProber(unittest.TestCase):
+
+    def test_status_is_cached_between_probes(self):
+        check = mock.Mock(side_effect=[None, requests.ConnectionError("refused")])
+        breaker = CircuitBreaker('yolo')
+        prober = HealthProber(interval=60)
+        prober.register('yolo', check, breaker)
+        self.assertEqual(prober.status(), {'yolo': {'status': 'unknown', 'circuit': 'closed'}})
+
+        asyncio.run(prober.probe_all())
+        for _ in range(3):
+            status = prober.status()
+        self.assertEqual(check.call_count, 1)
+        self.assertEqual(status['yolo']['status'], 'up')
+
+        asyncio.run(prober.probe_all())
+        self.assertEqual(prober.status()['yolo']['status'], 'down')
+        self.assertIn('refused', prober.status()['yolo']['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+from matplotlib.image import imread, imsave
+from polybot.img_proc import Img
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+
+class TestColorMode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.img = Img(img_path, color=True)
+        self.height, self.width = self.img.get_dimensions()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_planar_uint8_storage(self):
+        self.assertEqual(self.img.planes.dtype, np.uint8)
+        self.assertEqual(self.img.planes.shape, (3, self.height, self.width))
+        # Luminance view matches the grayscale loader
+        np.testing.assert_allclose(self.img.pixels, Img(img_path).pixels, atol=1e-6)
+
+    def test_filters_keep_channels(self):
+        for operation, kwargs in [('blur', {'blur_level': 3}), ('contour', {}), ('rotate', {}),
+                                  ('salt_n_pepper', {}), ('sharpen', {}), ('segment', {'mode': 'otsu'})]:
+            img = Img(img_path, color=True)
+            img.apply_multiple_filters([(operation, kwargs)])
+            self.assertEqual(img.planes.dtype, np.uint8)
+            self.assertEqual(img.planes.shape[0], 3)
+
+    def test_channels_filtered_independently(self):
+        red_only = np.zeros((3, 20, 30), dtype=np.uint8)
+        red_only[0] = 200
+        self.img.planes = red_only
+        self.img.blur(blur_level=3)
+
+        self.assertTrue(np.all(self.img.planes[0] == 200))
+        self.assertTrue(np.all(self.img.planes[1:] == 0))
+
+    def test_save_keeps_color(self):
+        self.img.path = self.img.path.__class__(self.tmp_dir.name) / 'beatles.png'
+        saved = imread(self.img.save_img(auto_upload_s3=False))
+        self.assertEqual(saved.shape[:2], (self.height, self.width))
+        self.assertGreater(np.abs(saved[:, :, 0] - saved[:, :, 2]).max(), 0)
+
+    def test_alpha_preserved(self):
+        path = os.path.join(self.tmp_dir.name, 'alpha.png')
+        rgba = np.zeros((10, 12, 4))
+        rgba[:, :, 1] = 1.0
+        rgba[:, :, 3] = 0.5
+        imsave(path, rgba)
+
+        img = Img(path, color=True)
+        alpha = img.planes[3].copy()
+        img.contour()
+        self.assertEqual(img.planes.shape, (4, 10, 11))
+        np.testing.assert_array_equal(img.planes[3], alpha[:, 1:])
+        self.assertTrue(np.all(img.planes[3] > 0))
+
+    def test_concat_gray_into_color(self):
+        self.img.concat(Img(img_path), resize_to_fit=True)
+        self.assertEqual(self.img.planes.shape, (3, self.height, 2 * self.width))
+
+
+if __name__ == '__main__':
+    unittest.main()
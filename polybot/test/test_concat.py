@@ -37,5 +37,34 @@ class TestImgConcat(unittest.TestCase):
         self.assertEqual(left_half, right_half)
 
 
+class TestImgConcatResize(unittest.TestCase):
+
+    def setUp(self):
+        self.img = Img(img_path)
+        self.small_img = Img(img_path)
+        self.small_img.data = [row[::2] for row in self.small_img.data[::2]]
+
+    def test_horizontal_resize_matches_height(self):
+        height, width = len(self.img.data), len(self.img.data[0])
+        self.img.concat(self.small_img, resize_to_fit=True)
+
+        self.assertEqual(len(self.img.data), height)
+        self.assertAlmostEqual(len(self.img.data[0]), 2 * width, delta=2)
+
+    def test_vertical_resize_matches_width(self):
+        height, width = len(self.img.data), len(self.img.data[0])
+        self.img.concat(self.small_img, direction='vertical', resize_to_fit=True)
+
+        self.assertEqual(len(self.img.data[0]), width)
+        self.assertAlmostEqual(len(self.img.data), 2 * height, delta=2)
+
+    def test_vertical_without_resize_pads_to_width(self):
+        width = len(self.img.data[0])
+        self.img.concat(self.small_img, direction='vertical')
+
+        self.assertEqual(len(self.img.data[0]), width)
+        self.assertEqual(self.img.data[-1][-1], 0.0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from polybot.conversations import ConversationManager, Step
+
+
+def make_message(user_id, channel_id, content):
+    return SimpleNamespace(author=SimpleNamespace(id=user_id), channel=SimpleNamespace(id=channel_id), content=content)
+
+
+class TestConversationManager(unittest.TestCase):
+
+    def test_messages_routed_by_user_and_channel(self):
+        async def scenario():
+            manager = ConversationManager(ttl=60)
+            sent = []
+
+            async def send(text):
+                sent.append(text)
+
+            steps = [Step('genre', 'Genre?'),
+                     Step('count', 'How many?', parse=int, retry_prompt='Please send a number')]
+            with manager.open(1, 10) as conversation:
+                flow = asyncio.ensure_future(conversation.collect(send, steps, timeout=1))
+                await asyncio.sleep(0)
+                self.assertFalse(manager.dispatch(make_message(1, 11, 'other channel')))
+                self.assertFalse(manager.dispatch(make_message(2, 10, 'other user')))
+                for content in ['Jazz', 'five', '5']:
+                    self.assertTrue(manager.dispatch(make_message(1, 10, content)))
+                    await asyncio.sleep(0)
+                answers = await flow
+            return answers, sent, manager.is_active(1, 10)
+
+        answers, sent, active = asyncio.run(scenario())
+        self.assertEqual(answers, {'genre': 'Jazz', 'count': 5})
+        self.assertEqual(sent, ['Genre?', 'How many?', 'Please send a number'])
+        self.assertFalse(active)
+
+    def test_idle_conversation_expires(self):
+        async def scenario():
+            manager = ConversationManager(ttl=0)
+            conversation = manager.start(1, 10)
+            waiting = asyncio.ensure_future(conversation.next_message())
+            await asyncio.sleep(0)
+            self.assertEqual(len(manager.expire()), 1)
+            with self.assertRaises(asyncio.TimeoutError):
+                await waiting
+            return len(manager)
+
+        self.assertEqual(asyncio.run(scenario()), 0)
+
+    def test_answer_timeout(self):
+        async def scenario():
+            with ConversationManager(ttl=60).open(1, 10) as conversation:
+                await conversation.next_message(timeout=0.01)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
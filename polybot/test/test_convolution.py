@@ -0,0 +1,107 @@
+import unittest
+import numpy as np
+from polybot import img_proc
+from polybot.img_proc import Img, convolve, separate_kernel, gaussian_kernel, KERNEL_FILTERS, MAX_GAUSSIAN_SIGMA
+import os
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+
+def reference_correlate(pixels, kernel):
+    """Naive correlation over the valid region"""
+    kh, kw = kernel.shape
+    out = np.zeros((pixels.shape[0] - kh + 1, pixels.shape[1] - kw + 1))
+    for i in range(out.shape[0]):
+        for j in range(out.shape[1]):
+            out[i, j] = (pixels[i:i + kh, j:j + kw] * kernel).sum()
+    return out
+
+
+class TestConvolution(unittest.TestCase):
+
+    def setUp(self):
+        self.pixels = np.random.default_rng(0).uniform(0, 255, (40, 50))
+
+    def test_separable_detection(self):
+        self.assertIsNotNone(separate_kernel(gaussian_kernel(1.5)))
+        self.assertIsNotNone(separate_kernel(KERNEL_FILTERS['sobel'].make_kernels()[0]))
+        self.assertIsNone(separate_kernel(KERNEL_FILTERS['emboss'].make_kernels()[0]))
+
+    def test_all_paths_match_reference(self):
+        separable = gaussian_kernel(1.0)
+        small = np.array([[-2, -1, 0], [-1, 1, 1], [0, 1, 2]], dtype=float)
+        large = np.random.default_rng(1).normal(size=(15, 15))
+        box = np.ones((4, 4)) / 16
+
+        for kernel in (separable, small, large, box):
+            expected = reference_correlate(self.pixels, kernel)
+            np.testing.assert_allclose(convolve(self.pixels, kernel, border=None), expected, atol=1e-6)
+
+    def test_one_tap_passes_are_exact(self):
+        np.testing.assert_array_equal(convolve(self.pixels, [[1, -1]], border=None),
+                                      self.pixels[:, :-1] - self.pixels[:, 1:])
+        np.testing.assert_array_equal(convolve(self.pixels, [[1], [-1]], border=None),
+                                      self.pixels[:-1] - self.pixels[1:])
+        np.testing.assert_array_equal(convolve(self.pixels, [[3.0]], border=None), self.pixels * 3.0)
+        identity = convolve(self.pixels, [[1.0]], border=None)
+        np.testing.assert_array_equal(identity, self.pixels)
+        self.assertIsNot(identity, self.pixels)
+
+    def test_contour_is_exact_difference(self):
+        img = Img(img_path)
+        expected = np.abs(img.pixels[:, :-1] - img.pixels[:, 1:])
+        img.contour()
+        np.testing.assert_array_equal(img.pixels, expected)
+
+    def test_border_keeps_size(self):
+        for border in ('reflect', 'edge', 'constant'):
+            for kernel in (gaussian_kernel(2.0), np.ones((4, 4)) / 16, np.random.default_rng(2).normal(size=(17, 17))):
+                self.assertEqual(convolve(self.pixels, kernel, border=border).shape, self.pixels.shape)
+
+    def test_fft_and_direct_agree_with_borders(self):
+        kernel = np.random.default_rng(3).normal(size=(5, 5))
+        direct = convolve(self.pixels, kernel, border='edge')
+        original = img_proc.FFT_MIN_KERNEL_TAPS
+        img_proc.FFT_MIN_KERNEL_TAPS = 1
+        try:
+            fft = convolve(self.pixels, kernel, border='edge')
+        finally:
+            img_proc.FFT_MIN_KERNEL_TAPS = original
+        np.testing.assert_allclose(fft, direct, atol=1e-6)
+
+
+class TestImgFilter(unittest.TestCase):
+
+    def test_registered_filters(self):
+        for name in KERNEL_FILTERS:
+            img = Img(img_path)
+            dimension = img.get_dimensions()
+            img.filter(name)
+            self.assertEqual(img.get_dimensions(), dimension)
+            self.assertGreaterEqual(img.get_stats()["min"], 0)
+            self.assertLessEqual(img.get_stats()["max"], 255)
+
+    def test_filter_through_apply_multiple_filters(self):
+        img = Img(img_path)
+        img.apply_multiple_filters([('gaussian', {'sigma': 1.0}), ('rotate', {})])
+        height, width = Img(img_path).get_dimensions()
+        self.assertEqual(img.get_dimensions(), (width, height))
+
+    def test_gaussian_sigma_validated(self):
+        for sigma in (0, -1.0, float('nan')):
+            img = Img(img_path)
+            before = img.pixels.copy()
+            with self.assertRaises(ValueError):
+                img.filter('gaussian', sigma=sigma)
+            np.testing.assert_array_equal(img.pixels, before)
+
+    def test_gaussian_sigma_clamped(self):
+        self.assertEqual(gaussian_kernel(10_000).shape, gaussian_kernel(MAX_GAUSSIAN_SIGMA).shape)
+
+    def test_unknown_filter(self):
+        with self.assertRaises(ValueError):
+            Img(img_path).filter('cartoon')
+
+
+if __name__ == '__main__':
+    unittest.main()
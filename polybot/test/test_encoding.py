@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from polybot.encoding import encode_to_budget, _encode
+from polybot.img_proc import Img
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+
+class TestEncodeToBudget(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.noise = rng.integers(0, 256, size=(400, 500, 3), dtype=np.uint8)
+
+    def test_png_kept_when_it_fits(self):
+        flat = np.full((100, 100), 128, dtype=np.uint8)
+        encoded = encode_to_budget(flat, 10_000)
+        self.assertEqual(encoded.format, 'PNG')
+        self.assertEqual(Image.open(encoded.buffer).size, (100, 100))
+
+    def test_highest_quality_under_budget(self):
+        budget = 120_000
+        encoded = encode_to_budget(self.noise, budget, formats=('JPEG',))
+        self.assertEqual(encoded.format, 'JPEG')
+        self.assertLessEqual(len(encoded), budget)
+        # One step up in quality would no longer fit
+        next_step = _encode(Image.fromarray(self.noise), 'JPEG', encoded.quality + 1)
+        self.assertGreater(len(next_step), budget)
+
+    def test_downscales_when_quality_alone_is_not_enough(self):
+        budget = 20_000
+        encoded = encode_to_budget(self.noise, budget)
+        self.assertLessEqual(len(encoded), budget)
+        self.assertLess(encoded.size[0], 500)
+        self.assertEqual(Image.open(BytesIO(encoded.data)).size, encoded.size)
+
+    def test_impossible_budget(self):
+        with self.assertRaises(ValueError):
+            encode_to_budget(self.noise, 10, min_scale=0.5)
+
+    def test_img_encode(self):
+        img = Img(img_path, color=True)
+        encoded = img.encode(max_bytes=30_000)
+        self.assertLessEqual(len(encoded), 30_000)
+        self.assertEqual(Image.open(encoded.buffer).mode, 'RGB')
+
+
+class TestImgEncodeMatchesSavedFile(unittest.TestCase):
+
+    def test_grayscale_contrast_matches_saved_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            img = Img(img_path)
+            img.path = Path(tmp_dir) / 'beatles.png'
+            img.contour()
+            saved = np.asarray(Image.open(img.save_img(auto_upload_s3=False)).convert('L'))
+            sent = np.asarray(Image.open(img.encode(formats=('PNG',)).buffer))
+        self.assertEqual(sent.max(), 255)
+        np.testing.assert_array_equal(sent, saved)
+
+    def test_color_matches_saved_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            img = Img(img_path, color=True)
+            img.path = Path(tmp_dir) / 'beatles.png'
+            saved = np.asarray(Image.open(img.save_img(auto_upload_s3=False)).convert('RGB'))
+            sent = np.asarray(Image.open(img.encode(formats=('PNG',)).buffer).convert('RGB'))
+        np.testing.assert_array_equal(sent, saved)
+
+
+if __name__ == '__main__':
+    unittest.main()
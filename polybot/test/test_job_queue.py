@@ -0,0 +1,102 @@
+import os
+import unittest
+import tempfile
+import threading
+from unittest import mock
+from polybot.job_queue import ImageJob, JobQueue, InProcessJobQueue, SQLiteJobQueue, create_job_queue
+from polybot.worker import ImageWorker
+
+
+def make_job(operation='blur'):
+    return ImageJob(operation, {'blur_level': 4}, 'https://cdn.test/a.jpeg', 'a.jpeg', channel_id=1, message_id=2)
+
+
+class TestSQLiteJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'jobs.db')
+        self.queue = SQLiteJobQueue(self.path, poll_interval=0.01)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_jobs_claimed_in_order_once(self):
+        first, second = make_job('blur'), make_job('rotate')
+        self.queue.put(first)
+        self.queue.put(second)
+
+        # A second handle on the same file sees the same jobs, like another worker process
+        other_worker = SQLiteJobQueue(self.path, poll_interval=0.01)
+        claimed_a = self.queue.get(timeout=0)
+        claimed_b = other_worker.get(timeout=0)
+
+        self.assertEqual(claimed_a.job_id, first.job_id)
+        self.assertEqual(claimed_b.job_id, second.job_id)
+        self.assertEqual(claimed_b.params, {'blur_level': 4})
+        self.assertIsNone(self.queue.get(timeout=0.05))
+
+    def test_unacked_job_is_reclaimed_after_visibility_timeout(self):
+        self.queue.visibility_timeout = 0
+        job = make_job()
+        self.queue.put(job)
+        self.assertEqual(self.queue.get(timeout=0).job_id, job.job_id)
+        self.assertEqual(self.queue.get(timeout=0).job_id, job.job_id)
+
+        self.queue.ack(job)
+        self.assertIsNone(self.queue.get(timeout=0))
+
+    def test_extended_claim_is_not_reclaimed(self):
+        self.queue.visibility_timeout = 0.2
+        job = make_job()
+        self.queue.put(job)
+        self.queue.get(timeout=0)
+        with mock.patch('polybot.job_queue.time.time', return_value=10 ** 10):
+            self.queue.extend(job)
+        self.assertIsNone(self.queue.get(timeout=0.3))
+
+
+class TestJobQueueInterface(unittest.TestCase):
+
+    def test_incomplete_backend_fails_at_construction(self):
+        class PutOnlyQueue(JobQueue):
+            def put(self, job):
+                pass
+
+        with self.assertRaises(TypeError):
+            PutOnlyQueue()
+
+
+class TestWorkerLease(unittest.TestCase):
+
+    def test_claim_extended_while_job_runs(self):
+        job_queue = mock.Mock()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            worker = ImageWorker(job_queue, 'test-token', photos_dir=tmp_dir)
+        worker.lease_interval = 0.01
+        extended = threading.Event()
+        job_queue.extend.side_effect = lambda job: extended.set()
+
+        with worker.keep_claimed(make_job()):
+            self.assertTrue(extended.wait(1))
+        calls = job_queue.extend.call_count
+        threading.Event().wait(0.05)
+        self.assertEqual(job_queue.extend.call_count, calls)
+
+
+class TestCreateJobQueue(unittest.TestCase):
+
+    def test_memory_backend(self):
+        job_queue = create_job_queue('memory://')
+        self.assertIsInstance(job_queue, InProcessJobQueue)
+        job = make_job()
+        job_queue.put(job)
+        self.assertIs(job_queue.get(timeout=0), job)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_job_queue('redis://localhost')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from polybot.llm_scheduler import LLMScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+
+class TestLLMScheduler(unittest.TestCase):
+
+    def test_priority_then_fair_rounds(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrent=1, promote_after=60)
+            order = []
+
+            async def request(name, user_id, priority):
+                async with scheduler.slot(user_id, priority):
+                    order.append(name)
+                    await asyncio.sleep(0)
+
+            await scheduler.acquire('holder')
+            tasks = [asyncio.ensure_future(request('a1', 'a', PRIORITY_BATCH)),
+                     asyncio.ensure_future(request('a2', 'a', PRIORITY_BATCH)),
+                     asyncio.ensure_future(request('c1', 'c', PRIORITY_BATCH)),
+                     asyncio.ensure_future(request('b1', 'b', PRIORITY_INTERACTIVE))]
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.queued, 4)
+            scheduler.release()
+            await asyncio.gather(*tasks)
+            return order
+
+        self.assertEqual(asyncio.run(scenario()), ['b1', 'a1', 'c1', 'a2'])
+
+    def test_concurrency_cap(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrent=2)
+            running, peak = 0, 0
+
+            async def request(user_id):
+                nonlocal running, peak
+                async with scheduler.slot(user_id):
+                    running += 1
+                    peak = max(peak, running)
+                    await asyncio.sleep(0.01)
+                    running -= 1
+
+            await asyncio.gather(*(request(i) for i in range(6)))
+            return peak, scheduler.active
+
+        self.assertEqual(asyncio.run(scenario()), (2, 0))
+
+    def test_positions_reported_and_cancelled_waiter_removed(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrent=1, position_interval=0)
+            positions = []
+
+            async def report(position):
+                positions.append(position)
+
+            await scheduler.acquire('holder')
+            cancelled = asyncio.ensure_future(scheduler.acquire('a'))
+            waiting = asyncio.ensure_future(scheduler.acquire('b', on_position=report))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.queued, 1)
+            # Let the new position go out before it is superseded
+            await asyncio.sleep(0)
+
+            scheduler.release()
+            await waiting
+            await asyncio.sleep(0)
+            return positions, scheduler.active
+
+        self.assertEqual(asyncio.run(scenario()), ([2, 1, 0], 1))
+
+    def test_position_updates_throttled_to_latest(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrent=1, position_interval=0.2)
+            positions = []
+
+            async def report(position):
+                positions.append(position)
+
+            await scheduler.acquire('holder')
+            ahead = [asyncio.ensure_future(scheduler.acquire(f'user{i}')) for i in range(3)]
+            await asyncio.sleep(0)
+            waiting = asyncio.ensure_future(scheduler.acquire('last', on_position=report))
+            await asyncio.sleep(0.01)
+            # Three moves within the interval collapse into one update
+            for task in ahead:
+                task.cancel()
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.3)
+            self.assertEqual(positions, [4, 1])
+
+            scheduler.release()
+            await waiting
+            await asyncio.sleep(0)
+            return positions
+
+        self.assertEqual(asyncio.run(scenario()), [4, 1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import time
+import asyncio
+import tempfile
+import unittest
+from polybot.profiling import SlowCommandProfiler
+from polybot.loop_watchdog import LoopLagWatchdog
+
+
+def blocking_filter(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestLoopLagWatchdog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.profiler = SlowCommandProfiler(profiles_dir=self.tmp_dir.name)
+        self.watchdog = LoopLagWatchdog(interval=0.01, threshold=0.1, profiler=self.profiler, sample_interval=0.005)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_with_watchdog(self, scenario):
+        async def main():
+            task = asyncio.create_task(self.watchdog.run())
+            await asyncio.sleep(0.05)
+            await scenario()
+            # Let the watchdog notice the loop recovered and save the profile
+            for _ in range(20):
+                await asyncio.sleep(0.02)
+                if self.profiler.list_profiles():
+                    break
+            task.cancel()
+
+        asyncio.run(main())
+
+    def test_non_blocking_code_not_flagged(self):
+        async def scenario():
+            await asyncio.sleep(0.2)
+
+        self.run_with_watchdog(scenario)
+        self.assertEqual(self.watchdog.stalls, 0)
+        self.assertEqual(self.profiler.list_profiles(), [])
+
+    def test_blocking_coroutine_captured(self):
+        async def handle_command():
+            blocking_filter(0.4)
+
+        self.run_with_watchdog(handle_command)
+        self.assertEqual(self.watchdog.stalls, 1)
+        profiles = self.profiler.list_profiles()
+        self.assertEqual(profiles[0]['command'], 'event_loop_stall')
+        self.assertGreaterEqual(profiles[0]['elapsed_seconds'], 0.2)
+        stacks = self.profiler.read_profile(profiles[0]['id'])
+        self.assertIn('handle_command', stacks)
+        self.assertIn('blocking_filter', stacks)
+
+
+if __name__ == '__main__':
+    unittest.main()
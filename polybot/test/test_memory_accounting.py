@@ -0,0 +1,57 @@
+import unittest
+import tracemalloc
+import numpy as np
+from unittest import mock
+from polybot.memory_accounting import MemoryAccountant, megapixels_label, current_rss
+
+
+class TestMemoryAccountant(unittest.TestCase):
+
+    def tearDown(self):
+        # Tracing slows down every later allocation
+        tracemalloc.stop()
+
+    def test_disabled_by_default(self):
+        accountant = MemoryAccountant()
+        with accountant.measure('blur') as memory:
+            memory.megapixels = 1.0
+        self.assertFalse(accountant.enabled)
+        self.assertIsNone(memory.peak_bytes)
+
+    def test_tracemalloc_peak_includes_freed_arrays(self):
+        accountant = MemoryAccountant(mode='tracemalloc')
+        with accountant.measure('blur') as memory:
+            memory.megapixels = 2.0
+            scratch = np.ones(4 * 1024 * 1024, dtype=np.uint8)
+            del scratch
+        self.assertGreaterEqual(memory.peak_bytes, 4 * 1024 * 1024)
+        self.assertAlmostEqual(accountant.cost_per_megapixel('blur'), memory.peak_bytes / 2.0)
+
+    @unittest.skipIf(current_rss() is None, "/proc is not available")
+    def test_rss_peak(self):
+        accountant = MemoryAccountant(mode='rss', sample_interval=0.001)
+        with accountant.measure('concat') as memory:
+            scratch = np.ones(64 * 1024 * 1024, dtype=np.uint8)
+            del scratch
+        self.assertGreaterEqual(memory.peak_bytes, 32 * 1024 * 1024)
+
+    def test_outlier_logged(self):
+        accountant = MemoryAccountant(mode='tracemalloc', min_samples=2)
+        with mock.patch('polybot.memory_accounting.logger') as logger:
+            for size in (1, 1, 16):
+                with accountant.measure('blur') as memory:
+                    memory.megapixels = 1.0
+                    scratch = np.ones(size * 1024 * 1024, dtype=np.uint8)
+                    del scratch
+        logger.warning.assert_called_once()
+        self.assertIn('Memory outlier: blur', logger.warning.call_args.args[0])
+
+    def test_megapixels_label(self):
+        self.assertEqual(megapixels_label(None), 'unknown')
+        self.assertEqual(megapixels_label(0.4), '<=1')
+        self.assertEqual(megapixels_label(20), '<=32')
+        self.assertEqual(megapixels_label(100), '>64')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from datetime import datetime
+from unittest import mock
+import requests
+from polybot.ollama_client import OllamaClient
+from polybot.model_warmer import ModelWarmer, parse_busy_hours
+
+
+class TestModelWarmer(unittest.TestCase):
+
+    def setUp(self):
+        self.client = OllamaClient('http://ollama.test:11434/api/chat', 'gemma3:1b', keep_alive='1h')
+
+    def test_parse_busy_hours(self):
+        self.assertEqual(parse_busy_hours('8-12, 22-2,15'), [(8, 12), (22, 2), (15, 15)])
+        with self.assertRaises(ValueError):
+            parse_busy_hours('20-25')
+
+    def test_busy_hours_wrap_midnight(self):
+        warmer = ModelWarmer(self.client, busy_hours='22-2', ping_interval=60)
+        self.assertTrue(warmer.is_busy(23))
+        self.assertTrue(warmer.is_busy(1))
+        self.assertFalse(warmer.is_busy(12))
+        warmer.clock = lambda: datetime(2024, 1, 1, 0, 30)
+        self.assertTrue(warmer.is_busy())
+
+    def test_warm_loads_model_with_keep_alive(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"done": True, "load_duration": 2_500_000_000}
+        warmer = ModelWarmer(self.client, busy_hours='', ping_interval=60)
+        with mock.patch('polybot.ollama_client.requests.post', return_value=response) as post:
+            self.assertAlmostEqual(asyncio.run(warmer.warm()), 2.5)
+
+        sent = post.call_args.kwargs['json']
+        self.assertEqual(sent['messages'], [])
+        self.assertEqual(sent['keep_alive'], '1h')
+
+    def test_unreachable_backend_does_not_raise(self):
+        warmer = ModelWarmer(self.client, busy_hours='', ping_interval=60)
+        with mock.patch('polybot.ollama_client.requests.post', side_effect=requests.ConnectionError('down')):
+            self.assertIsNone(asyncio.run(warmer.warm()))
+
+    def test_unexpected_error_does_not_stop_keep_alive_loop(self):
+        warmer = ModelWarmer(self.client, busy_hours='0-23', ping_interval=0)
+        errors = [ValueError('bad reply'), KeyError('load_duration')]
+
+        def load():
+            if errors:
+                raise errors.pop(0)
+            return 1.0
+
+        self.client.load = mock.Mock(side_effect=load)
+
+        async def scenario():
+            task = asyncio.ensure_future(warmer.run())
+            while self.client.load.call_count < 4:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            return task.done() and not task.cancelled()
+
+        self.assertFalse(asyncio.run(asyncio.wait_for(scenario(), 5)))
+        self.assertGreaterEqual(self.client.load.call_count, 4)
+
+    def test_load_holds_a_scheduler_slot(self):
+        warmer = ModelWarmer(self.client, busy_hours='', ping_interval=60)
+        active_during_load = []
+        self.client.load = mock.Mock(side_effect=lambda: active_during_load.append(self.client.scheduler.active) or 1.0)
+
+        asyncio.run(warmer.warm())
+
+        self.assertEqual(active_during_load, [1])
+        self.assertEqual(self.client.scheduler.active, 0)
+
+    def test_ping_skipped_while_generation_runs(self):
+        warmer = ModelWarmer(self.client, busy_hours='0-23', ping_interval=60)
+        self.client.load = mock.Mock(return_value=1.0)
+
+        async def scenario():
+            async with self.client.scheduler.slot('user'):
+                await warmer._ping()
+            await warmer._ping()
+
+        asyncio.run(scenario())
+        self.client.load.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
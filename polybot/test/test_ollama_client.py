@@ -0,0 +1,74 @@
+import time
+import asyncio
+import unittest
+from unittest import mock
+import requests
+from polybot.ollama_client import OllamaClient
+
+
+def make_response(content='Paris', status_code=200):
+    response = mock.Mock(status_code=status_code, text='')
+    response.json.return_value = {"message": {"content": content}}
+    return response
+
+
+class TestOllamaClient(unittest.TestCase):
+
+    def setUp(self):
+        self.client = OllamaClient('http://ollama.test:11434', 'gemma3:1b', cache_ttl=60, cache_size=8)
+
+    def test_endpoint(self):
+        self.assertEqual(self.client.endpoint, 'http://ollama.test:11434/api/chat')
+
+    def test_concurrent_identical_questions_share_one_call(self):
+        def slow_post(*args, **kwargs):
+            time.sleep(0.05)
+            return make_response()
+
+        async def ask_all():
+            return await asyncio.gather(
+                self.client.ask('What is the capital of France?'),
+                self.client.ask('what is the capital  of france'),
+                self.client.ask('What is the capital of Spain?'))
+
+        with mock.patch('polybot.ollama_client.requests.post', side_effect=slow_post) as post:
+            answers = asyncio.run(ask_all())
+
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(answers, ['Paris', 'Paris', 'Paris'])
+        self.assertEqual(self.client._in_flight, {})
+
+    def test_answer_served_from_cache(self):
+        with mock.patch('polybot.ollama_client.requests.post', return_value=make_response()) as post:
+            asyncio.run(self.client.ask('What is the capital of France?'))
+            self.assertEqual(asyncio.run(self.client.ask('WHAT is the capital of France')), 'Paris')
+        self.assertEqual(post.call_count, 1)
+
+    def test_error_not_cached(self):
+        with mock.patch('polybot.ollama_client.requests.post', return_value=make_response(status_code=500)):
+            with self.assertRaises(requests.HTTPError):
+                asyncio.run(self.client.ask('Hello?'))
+        self.assertEqual(len(self.client.cache), 0)
+        self.assertEqual(self.client._in_flight, {})
+
+    def test_slot_held_until_abandoned_generation_finishes(self):
+        def slow_post(*args, **kwargs):
+            time.sleep(0.2)
+            return make_response()
+
+        async def scenario():
+            caller = asyncio.ensure_future(self.client.generate([{"role": "user", "content": "hi"}]))
+            await asyncio.sleep(0.05)
+            caller.cancel()
+            await asyncio.sleep(0.05)
+            # The request thread is still running, so the slot must still be taken
+            held = self.client.scheduler.active
+            await asyncio.sleep(0.25)
+            return held, self.client.scheduler.active
+
+        with mock.patch('polybot.ollama_client.requests.post', side_effect=slow_post):
+            self.assertEqual(asyncio.run(scenario()), (1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from unittest import mock
+import numpy as np
+from polybot import img_proc
+from polybot.img_proc import Img, configure_filter_pool, run_filter
+import os
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+OPERATIONS = [
+    ('blur', {'blur_level': 7}),
+    ('contour', {}),
+    ('sharpen', {}),
+    ('gaussian', {'sigma': 3.0}),
+    ('sobel', {}),
+    ('segment', {'mode': 'adaptive', 'window': 25}),
+    ('segment', {'mode': 'otsu'}),
+]
+
+
+class TestBandedFilters(unittest.TestCase):
+
+    def setUp(self):
+        self.min_pixels = img_proc.PARALLEL_MIN_PIXELS
+
+    def tearDown(self):
+        img_proc.PARALLEL_MIN_PIXELS = self.min_pixels
+        configure_filter_pool(os.cpu_count() or 1)
+
+    def run_operation(self, operation, kwargs, color=False):
+        img = Img(img_path, color=color)
+        img.apply_multiple_filters([(operation, kwargs)])
+        return img.planes if color else img.pixels
+
+    def test_banded_matches_single_pass(self):
+        for color in (False, True):
+            configure_filter_pool(1)
+            expected = [self.run_operation(op, kwargs, color) for op, kwargs in OPERATIONS]
+
+            configure_filter_pool(4)
+            img_proc.PARALLEL_MIN_PIXELS = 0
+            for (operation, kwargs), single in zip(OPERATIONS, expected):
+                banded = self.run_operation(operation, kwargs, color)
+                self.assertEqual(banded.shape, single.shape, operation)
+                if operation in ('contour', 'segment'):
+                    # Exact arithmetic: banding must not change a single pixel
+                    np.testing.assert_array_equal(banded, single, err_msg=operation)
+                else:
+                    np.testing.assert_allclose(banded, single, atol=1e-6, err_msg=operation)
+
+    def test_small_planes_skip_split(self):
+        configure_filter_pool(4)
+        calls = []
+        run_filter([np.zeros((10, 10))], [lambda band: calls.append(band.shape) or band], halo=(1, 1))
+        self.assertEqual(calls, [(10, 10)])
+
+    def test_settings_read_on_first_use(self):
+        # Environment set after import (e.g. by load_dotenv) still applies
+        configure_filter_pool(1)
+        img_proc._filter_workers = None
+        img_proc.PARALLEL_MIN_PIXELS = None
+        with mock.patch.dict(os.environ, {'IMG_FILTER_WORKERS': '3', 'IMG_PARALLEL_MIN_PIXELS': '100'}):
+            self.assertEqual(len(img_proc._row_bands(600, 600 * 100)), 3)
+            self.assertEqual(img_proc._row_bands(5, 50), [(0, 5)])
+        self.assertEqual(img_proc._filter_workers, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
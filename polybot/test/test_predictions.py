@@ -0,0 +1,42 @@
+import unittest
+import asyncio
+from polybot.predictions import PredictionRegistry
+
+
+class TestPredictionRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.delivered = []
+        self.expired = []
+
+        async def on_result(pending, data):
+            self.delivered.append((pending.message, data))
+
+        async def on_expired(pending):
+            self.expired.append(pending.message)
+
+        self.registry = PredictionRegistry(on_result, on_expired, timeout=60)
+
+    def test_resolve_routes_to_registered_message(self):
+        first = self.registry.register('message-1')
+        second = self.registry.register('message-2')
+        self.assertTrue(asyncio.run(self.registry.resolve(second, {"detection_count": 0})))
+
+        self.assertEqual(self.delivered, [('message-2', {"detection_count": 0})])
+        self.assertEqual(len(self.registry), 1)
+        self.assertIsNotNone(self.registry.discard(first))
+
+    def test_unknown_prediction(self):
+        self.assertFalse(asyncio.run(self.registry.resolve('missing', {})))
+
+    def test_expired_prediction_cannot_resolve(self):
+        self.registry.timeout = 0
+        prediction_id = self.registry.register('message')
+        expired = self.registry.expire()
+
+        self.assertEqual([p.message for p in expired], ['message'])
+        self.assertFalse(asyncio.run(self.registry.resolve(prediction_id, {})))
+
+
+if __name__ == '__main__':
+    unittest.main()
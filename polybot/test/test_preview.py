@@ -0,0 +1,98 @@
+import os
+import asyncio
+import unittest
+from unittest import mock
+import numpy as np
+from polybot.img_proc import Img
+from polybot.bot import ImageProcessingBot
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+
+class TestProxy(unittest.TestCase):
+
+    def test_proxy_is_downscaled_copy(self):
+        img = Img(img_path)
+        preview, scale = img.proxy(165)
+        self.assertEqual(preview.get_dimensions(), (165, 165))
+        self.assertAlmostEqual(scale, 0.25)
+        self.assertEqual(img.get_dimensions(), (660, 660))
+        self.assertAlmostEqual(preview.get_stats()['mean'], img.get_stats()['mean'], delta=1.0)
+
+    def test_blurred_proxy_resembles_full_result(self):
+        full = Img(img_path)
+        preview, scale = full.proxy(165)
+        params = ImageProcessingBot.scale_params('blur', {'blur_level': 16}, scale)
+        self.assertEqual(params, {'blur_level': 4})
+
+        ImageProcessingBot.apply_operation(full, 'blur', {'blur_level': 16})
+        ImageProcessingBot.apply_operation(preview, 'blur', params)
+        reference, _ = full.proxy(max(preview.get_dimensions()))
+        height = min(preview.get_dimensions()[0], reference.get_dimensions()[0])
+        difference = np.abs(preview.pixels[:height, :height] - reference.pixels[:height, :height])
+        self.assertLess(difference.mean(), 10)
+
+    def test_default_gaussian_proxy_resembles_full_result(self):
+        full = Img(img_path)
+        preview, scale = full.proxy(165)
+        params = ImageProcessingBot.scale_params('gaussian', {}, scale)
+        self.assertAlmostEqual(params['sigma'], 0.5)
+
+        ImageProcessingBot.apply_operation(full, 'gaussian', {})
+        ImageProcessingBot.apply_operation(preview, 'gaussian', params)
+        reference, _ = full.proxy(max(preview.get_dimensions()))
+        difference = np.abs(preview.pixels - reference.pixels)
+        self.assertLess(difference.mean(), 5)
+
+    def test_adaptive_segment_window_scaled(self):
+        self.assertEqual(ImageProcessingBot.scale_params('segment', {'mode': 'adaptive'}, 0.25),
+                         {'mode': 'adaptive', 'window': 8})
+        self.assertEqual(ImageProcessingBot.scale_params('segment', {'mode': 'otsu'}, 0.25), {'mode': 'otsu'})
+
+
+class TestSendPreview(unittest.TestCase):
+
+    def setUp(self):
+        self.bot = ImageProcessingBot('test-token', 'http://yolo.test/predict', 'http://ollama.test')
+        self.ctx = mock.Mock()
+        self.ctx.send = mock.AsyncMock(return_value='preview-message')
+
+    def test_preview_sent_within_budget(self):
+        async def scenario():
+            full_task = asyncio.ensure_future(asyncio.sleep(5))
+            preview, scale = Img(img_path).proxy(165)
+            message = await self.bot.send_preview(self.ctx, preview, scale, 'contour', {}, full_task)
+            full_task.cancel()
+            return message
+
+        self.assertEqual(asyncio.run(scenario()), 'preview-message')
+        self.assertIn('file', self.ctx.send.call_args.kwargs)
+
+    def test_no_preview_once_full_result_is_ready(self):
+        async def scenario():
+            full_task = asyncio.ensure_future(asyncio.sleep(0))
+            await full_task
+            preview, scale = Img(img_path).proxy(165)
+            return await self.bot.send_preview(self.ctx, preview, scale, 'contour', {}, full_task)
+
+        self.assertIsNone(asyncio.run(scenario()))
+        self.ctx.send.assert_not_called()
+
+    def test_preview_deleted_when_full_filter_fails(self):
+        preview_message = mock.Mock(delete=mock.AsyncMock())
+        self.ctx.send = mock.AsyncMock(side_effect=[preview_message, 'error-message'])
+        self.ctx.message.attachments = [mock.Mock(content_type='image/jpeg')]
+        self.bot.split_mode = False
+        self.bot.preview_min_pixels = 0
+        self.bot.download_user_photo = mock.AsyncMock(return_value=img_path)
+        self.bot.send_preview = mock.AsyncMock(return_value=preview_message)
+
+        with mock.patch.object(ImageProcessingBot, 'apply_operation', side_effect=ValueError('boom')):
+            asyncio.run(self.bot.process_image(self.ctx, 'contour'))
+
+        preview_message.delete.assert_awaited_once()
+        self.assertIn('boom', self.ctx.send.call_args.args[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
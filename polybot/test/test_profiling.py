@@ -0,0 +1,109 @@
+import unittest
+import time
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from polybot.profiling import SlowCommandProfiler, profiled_to_thread, sampled
+
+
+class TestSlowCommandProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.profiler = SlowCommandProfiler(threshold=0.05, interval=0.005, profiles_dir=self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_fast_command_not_profiled(self):
+        with self.profiler.capture('fast'):
+            pass
+        self.assertEqual(self.profiler.list_profiles(), [])
+
+    def test_slow_command_profiled(self):
+        with self.profiler.capture('slow'):
+            end = time.perf_counter() + 0.2
+            while time.perf_counter() < end:
+                pass
+
+        profiles = self.profiler.list_profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]['command'], 'slow')
+        self.assertGreater(profiles[0]['samples'], 0)
+
+        stacks = self.profiler.read_profile(profiles[0]['id'])
+        self.assertIn('test_slow_command_profiled', stacks)
+
+    @staticmethod
+    def busy(seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    def test_one_sampler_thread_for_all_commands(self):
+        for _ in range(3):
+            with self.profiler.capture('slow'):
+                self.busy(0.1)
+        sampler = self.profiler._sampler
+        with self.profiler.capture('slow'):
+            self.busy(0.1)
+
+        self.assertIs(self.profiler._sampler, sampler)
+        self.assertTrue(sampler.is_alive())
+        self.assertEqual(len(self.profiler.list_profiles()), 4)
+
+    def test_idle_event_loop_not_recorded(self):
+        async def command():
+            self.busy(0.1)
+            await asyncio.sleep(0.2)
+
+        with self.profiler.capture('mostly_idle'):
+            asyncio.run(command())
+
+        profile, = self.profiler.list_profiles()
+        self.assertGreater(profile['idle_samples'], 0)
+        self.assertNotIn('selectors.py', self.profiler.read_profile(profile['id']))
+
+    def test_overlapping_commands_marked(self):
+        with self.profiler.capture('outer'):
+            with self.profiler.capture('inner'):
+                self.busy(0.1)
+        with self.profiler.capture('alone'):
+            self.busy(0.1)
+
+        overlapped = {profile['command']: profile['overlapped'] for profile in self.profiler.list_profiles()}
+        self.assertEqual(overlapped, {'outer': True, 'inner': True, 'alone': False})
+
+    def test_worker_thread_of_command_sampled(self):
+        async def command():
+            with self.profiler.capture('blur'):
+                await profiled_to_thread(self.busy, 0.3)
+
+        asyncio.run(command())
+
+        profile, = self.profiler.list_profiles()
+        stacks = self.profiler.read_profile(profile['id'])
+        self.assertIn('busy (test_profiling.py', stacks)
+        self.assertIn('asyncio_', stacks)  # worker stacks are rooted at the thread name
+
+    def test_pool_threads_sampled_through_wrapped_function(self):
+        with ThreadPoolExecutor(2, thread_name_prefix='band') as pool, self.profiler.capture('bands'):
+            list(pool.map(sampled(self.busy), [0.2, 0.2]))
+
+        profile, = self.profiler.list_profiles()
+        self.assertIn('band_', self.profiler.read_profile(profile['id']))
+
+    def test_idle_only_command_still_saved(self):
+        with self.profiler.capture('waiting'):
+            asyncio.run(asyncio.sleep(0.2))
+
+        profile, = self.profiler.list_profiles()
+        self.assertEqual(profile['command'], 'waiting')
+        self.assertGreater(profile['idle_samples'], 0)
+
+    def test_missing_profile(self):
+        self.assertIsNone(self.profiler.read_profile('does_not_exist'))
+
+
+if __name__ == '__main__':
+    unittest.main()
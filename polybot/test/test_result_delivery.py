@@ -0,0 +1,57 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from polybot.img_proc import Img
+from polybot.bot import ImageProcessingBot
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+
+class TestDeliverResult(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.bot = ImageProcessingBot('test-token', 'http://yolo.test/predict', 'http://ollama.test')
+        self.ctx = mock.Mock()
+        self.ctx.send = mock.AsyncMock()
+        self.img = Img(img_path)
+        self.img.path = Path(self.tmp_dir.name) / 'beatles.jpeg'
+        self.img.s3_manager = mock.Mock(bucket_name='test-bucket', presign_expiry=3600)
+        self.img.s3_manager.share_file.return_value = 'https://test-bucket.s3.amazonaws.com/processed_images/x?X-Amz-Signature=abc'
+        self.img.contour()
+        self.new_path = self.img.save_img(auto_upload_s3=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_large_result_sent_as_link_and_thumbnail(self):
+        self.bot.link_threshold = 1
+        asyncio.run(self.bot.deliver_result(self.ctx, self.img, 'contour', self.new_path))
+
+        content = self.ctx.send.call_args.args[0]
+        self.assertIn('X-Amz-Signature=abc', content)
+        self.assertIn('expires in 60 min', content)
+        self.assertTrue(self.ctx.send.call_args.kwargs['file'].filename.startswith('beatles_filtered_thumb'))
+        self.img.s3_manager.upload_file.assert_not_called()
+
+    def test_small_result_attached(self):
+        self.bot.link_threshold = self.new_path.stat().st_size
+        asyncio.run(self.bot.deliver_result(self.ctx, self.img, 'contour', self.new_path))
+
+        self.assertEqual(self.ctx.send.call_args.args[0], 'Processed image with contour:')
+        self.img.s3_manager.upload_file.assert_called_once_with(self.new_path)
+        self.img.s3_manager.share_file.assert_not_called()
+
+    def test_falls_back_to_attachment_when_link_fails(self):
+        self.bot.link_threshold = 1
+        self.img.s3_manager.share_file.return_value = None
+        asyncio.run(self.bot.deliver_result(self.ctx, self.img, 'contour', self.new_path))
+
+        self.assertEqual(self.ctx.send.call_args.args[0], 'Processed image with contour:')
+
+
+if __name__ == '__main__':
+    unittest.main()
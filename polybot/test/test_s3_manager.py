@@ -0,0 +1,115 @@
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import Future
+from botocore.exceptions import ClientError
+from polybot.img_proc import Img, S3Manager
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+try:
+    import moto
+except ImportError:
+    moto = None
+
+
+class FakeS3Client:
+    """Just enough of the S3 client for S3Manager, storing objects in a dict"""
+
+    def __init__(self):
+        self.objects = {}
+        self.configs = []
+        self.lock = threading.Lock()
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        return {'ContentLength': len(self.objects[Key])}
+
+    def upload_file(self, filename, bucket, key, Config=None):
+        self.configs.append(Config)
+        with self.lock:
+            self.objects[key] = Path(filename).read_bytes()
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None):
+        self.configs.append(Config)
+        with self.lock:
+            self.objects[key] = fileobj.read()
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3.test/{Params['Key']}?Expires={ExpiresIn}"
+
+
+class TestS3Manager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        with mock.patch.dict(os.environ, {'AWS_DEV_S3_BUCKET': 'test-bucket', 'S3_MULTIPART_CHUNKSIZE': '5242880'}):
+            self.manager = S3Manager()
+        self.client = FakeS3Client()
+        self.manager.s3_client = self.client
+        self.manager.transfer_config = 'transfer-config'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_transfer_settings_from_environment(self):
+        self.assertEqual(self.manager.multipart_chunksize, 5 * 1024 * 1024)
+
+    def test_upload_fileobj_from_memory(self):
+        self.assertTrue(self.manager.upload_fileobj(b'encoded image', 'out.webp', s3_key='processed_images/out.webp'))
+        self.assertEqual(self.client.objects, {'processed_images/out.webp': b'encoded image'})
+        self.assertEqual(self.client.configs, ['transfer-config'])
+
+    def test_upload_many(self):
+        paths = []
+        for i in range(5):
+            path = Path(self.tmp_dir.name) / f'step_{i}.png'
+            path.write_bytes(bytes([i]) * 10)
+            paths.append(path)
+
+        self.assertEqual(self.manager.upload_many(paths), [True] * 5)
+        self.assertEqual(sorted(self.client.objects.values()), [bytes([i]) * 10 for i in range(5)])
+
+    def test_share_file_returns_presigned_link(self):
+        path = Path(self.tmp_dir.name) / 'big.png'
+        path.write_bytes(b'x' * 100)
+        url = self.manager.share_file(path, expires_in=600)
+        key, = self.client.objects
+        self.assertEqual(url, f"https://test-bucket.s3.test/{key}?Expires=600")
+
+    def test_step_outputs_uploaded_in_background(self):
+        img = Img(img_path)
+        img.path = Path(self.tmp_dir.name) / 'beatles.jpeg'
+        img.s3_manager = mock.Mock()
+        done = Future()
+        done.set_result(True)
+        img.s3_manager.upload_async.return_value = done
+
+        img.apply_multiple_filters([('rotate', {}), ('contour', {})], auto_upload_each=True)
+
+        uploaded = [call.args[0].name for call in img.s3_manager.upload_async.call_args_list]
+        self.assertEqual(uploaded, ['beatles_step_1_rotate.jpeg', 'beatles_step_2_contour.jpeg'])
+        img.s3_manager.upload_file.assert_not_called()
+
+
+@unittest.skipIf(moto is None, "moto is not installed")
+class TestS3ManagerWithLocalStandIn(unittest.TestCase):
+
+    def test_round_trip(self):
+        env = {'AWS_DEV_S3_BUCKET': 'test-bucket', 'AWS_REGION': 'us-east-1',
+               'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing'}
+        with mock.patch.dict(os.environ, env), moto.mock_aws():
+            import boto3
+            boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='test-bucket')
+            manager = S3Manager()
+            self.assertTrue(manager.upload_fileobj(b'x' * 1024, 'a.png', s3_key='processed_images/a.png'))
+            body = manager.s3_client.get_object(Bucket='test-bucket', Key='processed_images/a.png')['Body'].read()
+        self.assertEqual(body, b'x' * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import random
-from polybot.img_proc import Img
+import numpy as np
+from polybot.img_proc import Img, rgb2gray
 import os
 
 img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
@@ -35,5 +36,57 @@ class TestImgConcat(unittest.TestCase):
             self.assertEqual(self.img.data[y][x], 0 if self.img.data[y][x] < 100 else 255)
 
 
+class TestSegmentModes(unittest.TestCase):
+
+    def setUp(self):
+        self.img = Img(img_path)
+
+    def test_otsu_separates_bimodal_image(self):
+        # Two flat regions at 40 and 200 with a little noise
+        rows = [[40.0 + (j % 5) for j in range(40)] + [200.0 - (j % 5) for j in range(40)] for _ in range(30)]
+        self.img.data = rows
+        self.img.segment(mode='otsu')
+
+        self.assertTrue(all(pixel == 0.0 for row in self.img.data for pixel in row[:40]))
+        self.assertTrue(all(pixel == 255.0 for row in self.img.data for pixel in row[40:]))
+
+    def test_adaptive_keeps_dimensions_and_is_binary(self):
+        dimension = (len(self.img.data), len(self.img.data[0]))
+        self.img.segment(mode='adaptive', window=15)
+
+        self.assertEqual((len(self.img.data), len(self.img.data[0])), dimension)
+        self.assertTrue(all(pixel in [0, 255] for row in self.img.data for pixel in row))
+
+    def test_adaptive_handles_uneven_lighting(self):
+        # A bright stripe on a dark-to-light gradient: a global threshold loses part of it
+        rows = [[j * 2.0 + (60.0 if 20 <= i < 25 else 0.0) for j in range(100)] for i in range(45)]
+        self.img.data = rows
+        self.img.segment(mode='adaptive', window=21, offset=-5)
+
+        self.assertTrue(all(pixel == 255.0 for pixel in self.img.data[22][10:90]))
+        self.assertTrue(all(pixel == 0.0 for pixel in self.img.data[5][10:90]))
+
+    def test_adaptive_flat_non_integer_image_is_uniform(self):
+        self.img.data = [[100.3] * 200 for _ in range(150)]
+        self.img.segment(mode='adaptive')
+        self.assertTrue(all(pixel == 0.0 for row in self.img.data for pixel in row))
+
+    def test_adaptive_flat_color_blocks_are_uniform(self):
+        rgb = np.zeros((120, 160, 3))
+        rgb[:, :80] = (201.0, 37.0, 90.0)
+        rgb[:, 80:] = (12.0, 180.0, 77.0)
+        self.img.pixels = rgb2gray(rgb)
+        self.img.segment(mode='adaptive')
+
+        pixels = self.img.pixels
+        # Only the pixels near the edge between the blocks may differ from their block
+        self.assertTrue((pixels[:, :60] == 0).all())
+        self.assertTrue((pixels[:, 100:] == 0).all())
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self.img.segment(mode='median')
+
+
 if __name__ == '__main__':
     unittest.main()
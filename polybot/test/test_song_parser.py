@@ -0,0 +1,69 @@
+import time
+import json
+import unittest
+from polybot.song_parser import Song, parse_songs, parse_songs_json, format_song_recommendations
+
+TEXT_RESPONSE = """Here are some songs you might enjoy:
+
+1. **Song Title:** Dancing Queen
+**Artist Name:** ABBA
+**Year of Release:** 1976
+**YouTube Link:** [Dancing Queen](https://www.youtube.com/watch?v=xFrGuyw1V8s)
+**Description:** A joyful disco classic
+that never fails to lift the mood.
+
+2. Song Title: Mr. Blue Sky
+👤 Artist: Electric Light Orchestra
+📅 Year: 1977
+🎵 Link: https://www.youtube.com/watch?v=aQUlA8Hcv4s.
+💬 Bright and uplifting.
+"""
+
+
+class TestSongParser(unittest.TestCase):
+
+    def test_numbered_text_format(self):
+        songs = parse_songs(TEXT_RESPONSE)
+        self.assertEqual(songs, [
+            Song('Dancing Queen', 'ABBA', '1976', 'https://www.youtube.com/watch?v=xFrGuyw1V8s',
+                 'A joyful disco classic that never fails to lift the mood.'),
+            Song('Mr. Blue Sky', 'Electric Light Orchestra', '1977', 'https://www.youtube.com/watch?v=aQUlA8Hcv4s',
+                 'Bright and uplifting.'),
+        ])
+
+    def test_json_format(self):
+        payload = json.dumps({"songs": [
+            {"title": "Dancing Queen", "artist": "ABBA", "year": 1976,
+             "youtube_link": "https://www.youtube.com/watch?v=xFrGuyw1V8s", "description": "Disco."},
+            {"title": "", "artist": "Nobody"}
+        ]})
+        self.assertEqual(parse_songs_json(payload),
+                         [Song('Dancing Queen', 'ABBA', '1976', 'https://www.youtube.com/watch?v=xFrGuyw1V8s', 'Disco.')])
+        self.assertIn('**1. Dancing Queen** by ABBA (1976)', format_song_recommendations(payload))
+        self.assertIsNone(parse_songs_json('{"songs": '))
+
+    def test_unrecognised_response_returned_as_is(self):
+        self.assertEqual(format_song_recommendations('Sorry, I cannot help.'), 'Sorry, I cannot help.')
+
+    def test_malformed_input_parses_in_linear_time(self):
+        # Lots of partial fields and no line breaks - the old lazy DOTALL patterns backtracked on this
+        malformed = '1. Song Title: x Artist Name: y Year of Release: ' * 20000
+        start = time.perf_counter()
+        parse_songs(malformed + '\n' + malformed)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_whitespace_heavy_lines_parse_in_linear_time(self):
+        lines = [
+            ' ' * 10000,
+            '1.' + ' ' * 10000 + 'x',
+            '- ' + ' ' * 10000 + 'Artist' + ' ' * 10000 + 'x',
+            '💬' + ' \t' * 5000,
+            'Link: ' + '[' * 10000 + '](' * 5000,
+        ]
+        start = time.perf_counter()
+        format_song_recommendations('\n'.join(lines))
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
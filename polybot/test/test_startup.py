@@ -0,0 +1,39 @@
+import os
+import sys
+import subprocess
+import unittest
+from polybot.startup import StartupTimer
+
+
+class TestStartupTimer(unittest.TestCase):
+
+    def test_phases_and_ready_report(self):
+        timer = StartupTimer()
+        with timer.phase('init', 'bot'):
+            pass
+        timer.mark_ready()
+        ready = timer.ready_seconds
+        timer.mark_ready()
+
+        report = timer.report()
+        self.assertEqual(report['ready_seconds'], ready)
+        self.assertEqual([(p['kind'], p['name']) for p in report['phases']], [('init', 'bot')])
+
+    def test_lazy_import_recorded_once(self):
+        sys.modules.pop('colorsys', None)
+        timer = StartupTimer()
+        module = timer.lazy_import('colorsys')
+        self.assertIs(timer.lazy_import('colorsys'), module)
+        self.assertEqual([(kind, name) for kind, name, _ in timer.phases], [('lazy', 'colorsys')])
+
+    def test_img_proc_does_not_import_codec_or_s3_eagerly(self):
+        code = ("import sys, polybot.img_proc; "
+                "print(any(m in sys.modules for m in ('matplotlib', 'boto3')))")
+        repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.run([sys.executable, '-c', code], cwd=repo_root,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
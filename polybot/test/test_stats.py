@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from polybot.img_proc import Img
+import os
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+
+class TestImgStats(unittest.TestCase):
+
+    def setUp(self):
+        self.img = Img(img_path)
+
+    def test_stats_match_numpy(self):
+        stats = self.img.get_stats()
+        pixels = np.array(self.img.data)
+
+        self.assertAlmostEqual(stats["min"], pixels.min())
+        self.assertAlmostEqual(stats["max"], pixels.max())
+        self.assertAlmostEqual(stats["mean"], pixels.mean())
+        self.assertAlmostEqual(stats["std"], pixels.std(), places=6)
+        self.assertEqual(stats["pixels"], pixels.size)
+        self.assertEqual(self.img.get_histogram().sum(), pixels.size)
+
+    def test_stats_cached_until_pixels_change(self):
+        first = self.img.get_stats()
+        self.assertIs(self.img._compute_stats(), self.img._compute_stats())
+
+        self.img.data = [[0.0, 255.0], [255.0, 255.0]]
+        second = self.img.get_stats()
+
+        self.assertNotEqual(first["pixels"], second["pixels"])
+        self.assertEqual(second["mean"], 191.25)
+        self.assertEqual(self.img.get_histogram()[255], 3)
+
+    def test_data_writes_through_and_resets_stats(self):
+        self.img.data = [[0.0, 0.0], [0.0, 0.0]]
+        self.assertEqual(self.img.get_stats()["max"], 0)
+
+        self.img.data[1][0] = 255.0
+        self.assertEqual(self.img.pixels[1, 0], 255.0)
+        self.assertEqual(self.img.data[1], [255.0, 0.0])
+        self.assertEqual(self.img.get_stats()["max"], 255.0)
+
+    def test_row_assignment_writes_through(self):
+        self.img.data = [[0.0, 0.0], [0.0, 0.0], [0.0, 0.0]]
+        self.img.data[0] = [10.0, 20.0]
+        self.img.data[1:] = [[30.0, 40.0], [50.0, 60.0]]
+
+        np.testing.assert_array_equal(self.img.pixels, [[10.0, 20.0], [30.0, 40.0], [50.0, 60.0]])
+        self.assertEqual(self.img.get_stats()["max"], 60.0)
+
+    def test_row_assignment_in_color_mode(self):
+        img = Img(img_path, color=True)
+        img.data[0] = [255.0] * img.get_dimensions()[1]
+        self.assertTrue((img.planes[:, 0] == 255).all())
+
+    def test_pixels_are_read_only(self):
+        with self.assertRaises(ValueError):
+            self.img.pixels[0, 0] = 1.0
+
+
+class TestBlurMatchesIntegerAverage(unittest.TestCase):
+
+    def test_blur_floors_exact_window_averages(self):
+        # The list-based blur floored sum(window) // level**2; float error must not shift it by one
+        rng = np.random.default_rng(3)
+        pixels = rng.integers(0, 256, size=(40, 50)).astype(float)
+        for level in (1, 2, 3, 5):
+            img = Img(img_path)
+            img.pixels = pixels
+            img.blur(level)
+            windows = np.lib.stride_tricks.sliding_window_view(pixels, (level, level)).sum(axis=(2, 3))
+            np.testing.assert_array_equal(img.pixels, windows // level ** 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import time
+import tempfile
+import unittest
+from pathlib import Path
+from polybot.storage import StorageManager
+
+
+class TestStorageManager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, size, age):
+        path = self.directory / name
+        path.write_bytes(b'x' * size)
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def test_expired_files_removed(self):
+        old = self.write('old.jpg', 10, age=7200)
+        recent = self.write('recent.jpg', 10, age=600)
+        storage = StorageManager(self.directory, max_bytes=1000, max_age=3600, interval=60, grace=0)
+
+        self.assertEqual(storage.cleanup(), [old])
+        self.assertTrue(recent.exists())
+        self.assertEqual(storage.usage_bytes, 10)
+
+    def test_oldest_evicted_to_fit_budget(self):
+        first = self.write('a.png', 100, age=700)
+        second = self.write('b.png', 100, age=900)
+        third = self.write('c.png', 100, age=800)
+        storage = StorageManager(self.directory, max_bytes=150, max_age=3600, interval=60, grace=0)
+
+        self.assertEqual(storage.cleanup(), [second, third])
+        self.assertTrue(first.exists())
+
+    def test_recent_and_non_image_files_kept(self):
+        self.write('jobs.db', 500, age=7200)
+        in_progress = self.write('new.jpg', 500, age=1)
+        storage = StorageManager(self.directory, max_bytes=100, max_age=3600, interval=60, grace=120)
+
+        self.assertEqual(storage.cleanup(), [])
+        self.assertTrue(in_progress.exists())
+        self.assertTrue((self.directory / 'jobs.db').exists())
+
+    def test_record_flags_budget_overrun(self):
+        storage = StorageManager(self.directory, max_bytes=100, max_age=3600, interval=60)
+        storage.record(self.write('big.jpg', 200, age=0))
+        self.assertEqual(storage.usage_bytes, 200)
+        self.assertTrue(storage._over_budget.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
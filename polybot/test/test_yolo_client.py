@@ -0,0 +1,61 @@
+import unittest
+from io import BytesIO
+from unittest import mock
+from PIL import Image
+from polybot.yolo_client import YoloClient
+import os
+
+img_path = 'polybot/test/beatles.jpeg' if '/polybot/test' not in os.getcwd() else 'beatles.jpeg'
+
+
+class TestYoloClient(unittest.TestCase):
+
+    def setUp(self):
+        with open(img_path, 'rb') as f:
+            self.image_bytes = f.read()
+        self.client = YoloClient('http://yolo.test/predict', input_size=128, cache_ttl=60, cache_size=4)
+
+    def _response(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"labels": ["person", "person"], "detection_count": 2}
+        return response
+
+    def test_resize_to_input_size(self):
+        payload, name = self.client.prepare_image(self.image_bytes, 'beatles.jpeg')
+        with Image.open(BytesIO(payload)) as image:
+            self.assertEqual(max(image.size), 128)
+        self.assertLess(len(payload), len(self.image_bytes))
+        self.assertEqual(name, 'beatles.jpg')
+
+    def test_repeat_detection_served_from_cache(self):
+        with mock.patch('polybot.yolo_client.requests.post', return_value=self._response()) as post:
+            first = self.client.detect(self.image_bytes, 'beatles.jpeg')
+            second = self.client.detect(self.image_bytes, 'beatles.jpeg')
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_detection_has_read_timeout(self):
+        with mock.patch('polybot.yolo_client.requests.post', return_value=self._response()) as post:
+            self.client.detect(self.image_bytes, 'beatles.jpeg')
+        self.assertEqual(post.call_args.kwargs['timeout'], (self.client.connect_timeout, self.client.timeout))
+        self.assertIsNotNone(self.client.timeout)
+
+    def test_error_not_cached(self):
+        with mock.patch('polybot.yolo_client.requests.post', return_value=mock.Mock(status_code=500)):
+            with self.assertRaises(Exception):
+                self.client.detect(self.image_bytes, 'beatles.jpeg')
+        self.assertEqual(len(self.client.cache), 0)
+
+    def test_accepted_submission_returns_nothing(self):
+        with mock.patch('polybot.yolo_client.requests.post', return_value=mock.Mock(status_code=202)):
+            self.assertIsNone(self.client.submit(self.image_bytes, 'beatles.jpeg', 'abc', 'http://bot.test/predictions/abc'))
+
+    def test_synchronous_submission_returns_prediction(self):
+        with mock.patch('polybot.yolo_client.requests.post', return_value=self._response()):
+            result = self.client.submit(self.image_bytes, 'beatles.jpeg', 'abc', 'http://bot.test/predictions/abc')
+        self.assertEqual(result, {"labels": ["person", "person"], "detection_count": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+import multiprocessing
+from pathlib import Path
+from typing import Optional
+import requests
+from dotenv import load_dotenv
+from loguru import logger
+from polybot.img_proc import Img
+from polybot.encoding import EncodedImage
+from polybot.job_queue import JobQueue, ImageJob, create_job_queue
+
+DISCORD_API_URL = 'https://discord.com/api/v10'
+
+
+class ImageWorker:
+    """Pulls image jobs from a queue, runs the Img filter and posts the result to Discord"""
+
+    def __init__(self, job_queue: JobQueue, token: str, photos_dir: Optional[str] = None):
+        self.job_queue = job_queue
+        self.token = token
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.photos_dir = Path(photos_dir or os.path.join(project_root, 'photos'))
+        self.photos_dir.mkdir(parents=True, exist_ok=True)
+        # How often a running job's claim is renewed; must stay well under the queue's visibility timeout
+        self.lease_interval = float(os.environ.get('JOB_LEASE_INTERVAL', 60))
+
+    def run(self, stop_event: Optional[threading.Event] = None):
+        """Process jobs until stop_event is set"""
+        logger.info(f"Image worker started (pid {os.getpid()})")
+        while stop_event is None or not stop_event.is_set():
+            job = self.job_queue.get(timeout=1.0)
+            if job is not None:
+                self.handle(job)
+        logger.info(f"Image worker stopped (pid {os.getpid()})")
+
+    @contextmanager
+    def keep_claimed(self, job: ImageJob):
+        """Extend the job's claim every lease_interval seconds while the block runs"""
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lease_interval):
+                try:
+                    self.job_queue.extend(job)
+                except Exception as e:
+                    logger.warning(f"Could not extend the claim on job {job.job_id}: {e}")
+
+        renewer = threading.Thread(target=renew, name=f"lease-{job.job_id[:8]}", daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            done.set()
+            renewer.join()
+
+    def handle(self, job: ImageJob):
+        """Run a single job, acking it on success and reporting errors to the user"""
+        logger.info(f"Worker processing job {job.job_id}: {job.operation} {job.params}")
+        with self.keep_claimed(job):
+            self._run(job)
+
+    def _run(self, job: ImageJob):
+        try:
+            file_path = self.download(job)
+            img = Img(file_path)
+            img.apply_multiple_filters([(job.operation, job.params)])
+            new_path = img.save_img()
+            self.post_message(job, f"Processed image with {job.operation}:", img.encode(), new_path.stem)
+            self.job_queue.ack(job)
+            logger.info(f"Job {job.job_id} done")
+        except Exception as e:
+            logger.error(f"Error processing job {job.job_id}: {e}")
+            self.job_queue.fail(job, str(e))
+            try:
+                self.post_message(job, f"Error processing image: {e}")
+            except requests.RequestException as post_error:
+                logger.error(f"Could not report failure of job {job.job_id}: {post_error}")
+
+    def download(self, job: ImageJob) -> Path:
+        response = requests.get(job.attachment_url, timeout=60)
+        response.raise_for_status()
+        file_path = self.photos_dir / f"{job.job_id}_{Path(job.filename).name}"
+        file_path.write_bytes(response.content)
+        return file_path
+
+    def post_message(self, job: ImageJob, content: str, image: Optional[EncodedImage] = None, name: str = 'image'):
+        """Reply to the job's message through the Discord REST API (workers hold no gateway connection)"""
+        payload = {
+            "content": content,
+            "message_reference": {"message_id": str(job.message_id), "fail_if_not_exists": False}
+        }
+        url = f"{DISCORD_API_URL}/channels/{job.channel_id}/messages"
+        headers = {"Authorization": f"Bot {self.token}"}
+        if image is None:
+            response = requests.post(url, headers=headers, json=payload, timeout=30)
+        else:
+            response = requests.post(
+                url,
+                headers=headers,
+                data={"payload_json": json.dumps(payload)},
+                files={"files[0]": (name + image.extension, image.buffer)},
+                timeout=120
+            )
+        response.raise_for_status()
+
+
+def run_worker(token: str, queue_url: Optional[str] = None):
+    """Entry point of one worker process"""
+    ImageWorker(create_job_queue(queue_url), token).run()
+
+
+def main():
+    load_dotenv('.env')
+    if os.environ.get('ENVIRONMENT') == 'development':
+        token = os.environ.get('DISCORD_DEV_BOT_TOKEN')
+    else:
+        token = os.environ.get('DISCORD_BOT_TOKEN')
+    if not token:
+        logger.error("DISCORD_BOT_TOKEN environment variable not set")
+        return
+
+    queue_url = os.environ.get('JOB_QUEUE_URL', 'memory://')
+    if queue_url.startswith('memory://'):
+        logger.error("Standalone workers need a shared queue - set JOB_QUEUE_URL (e.g. sqlite:///photos/jobs.db)")
+        return
+
+    worker_count = int(os.environ.get('WORKER_PROCESSES', 1))
+    logger.info(f"Starting {worker_count} image worker process(es) on {queue_url}")
+    processes = [multiprocessing.Process(target=run_worker, args=(token, queue_url), daemon=True)
+                 for _ in range(worker_count)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping image workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import hashlib
+from io import BytesIO
+import requests
+from urllib.parse import urljoin
+from loguru import logger
+from typing import Optional
+from polybot.cache import TTLCache
+from polybot.startup import startup_timer
+from polybot.circuit_breaker import CircuitBreaker
+
+
+class YoloClient:
+    """Sends in-memory images to the YOLO service and caches results by content hash"""
+
+    def __init__(self, url: str, input_size: int = None, cache_ttl: float = None, cache_size: int = None):
+        self.url = url
+        # Longest side sent to YOLO; the model letterboxes to this size anyway (0 disables resizing)
+        self.input_size = input_size if input_size is not None else int(os.environ.get('YOLO_INPUT_SIZE', 640))
+        self.cache = TTLCache(
+            ttl=cache_ttl if cache_ttl is not None else float(os.environ.get('YOLO_CACHE_TTL', 3600)),
+            max_size=cache_size if cache_size is not None else int(os.environ.get('YOLO_CACHE_SIZE', 256))
+        )
+        # Longest a synchronous detection may take before it is abandoned
+        self.timeout = float(os.environ.get('YOLO_TIMEOUT', 60))
+        # Async submissions only wait for YOLO to accept the job, not for the prediction
+        self.submit_timeout = float(os.environ.get('YOLO_SUBMIT_TIMEOUT', 10))
+        # An unreachable host fails after connect_timeout instead of the OS TCP timeout
+        self.connect_timeout = float(os.environ.get('BACKEND_CONNECT_TIMEOUT', 5))
+        self.health_url = os.environ.get('YOLO_HEALTH_URL') or urljoin(url, '/')
+        self.breaker = CircuitBreaker('yolo')
+
+    @staticmethod
+    def content_hash(image_bytes: bytes) -> str:
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def cached(self, image_bytes: bytes) -> Optional[dict]:
+        """Return a previous result for the same image content, if still cached"""
+        return self.cache.get(self.content_hash(image_bytes))
+
+    def prepare_image(self, image_bytes: bytes, filename: str):
+        """
+        Downscale the image to the model input size if it is larger
+
+        Returns:
+            Tuple of (bytes, filename) to upload
+        """
+        if not self.input_size:
+            return image_bytes, filename
+        try:
+            Image = startup_timer.lazy_import('PIL.Image')
+            with Image.open(BytesIO(image_bytes)) as image:
+                if max(image.size) <= self.input_size:
+                    return image_bytes, filename
+                original_size = image.size
+                image = image.convert('RGB')
+                image.thumbnail((self.input_size, self.input_size))
+                buffer = BytesIO()
+                image.save(buffer, format='JPEG', quality=90)
+        except Exception as e:
+            logger.warning(f"Could not resize image for YOLO, sending original: {e}")
+            return image_bytes, filename
+
+        resized = buffer.getvalue()
+        logger.info(f"Resized {filename} from {original_size} to {image.size} for YOLO ({len(image_bytes)} -> {len(resized)} bytes)")
+        return resized, os.path.splitext(filename)[0] + '.jpg'
+
+    def detect(self, image_bytes: bytes, filename: str) -> dict:
+        """
+        Run object detection, serving repeated images from the cache (blocking)
+
+        Raises:
+            requests.HTTPError: YOLO answered with a non-200 status
+            requests.RequestException: YOLO could not be reached
+        """
+        key = self.content_hash(image_bytes)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"YOLO cache hit for {filename} ({key[:12]})")
+            return cached
+
+        payload, upload_name = self.prepare_image(image_bytes, filename)
+        logger.info(f"Sending {upload_name} ({len(payload)} bytes) to YOLO: {self.url}")
+        with self.breaker:
+            response = requests.post(self.url, files={"file": (upload_name, payload)},
+                                     timeout=(self.connect_timeout, self.timeout))
+            if response.status_code != 200:
+                raise requests.HTTPError(f"YOLO service returned status code {response.status_code}", response=response)
+            result = response.json()
+        self.cache.set(key, result)
+        return result
+
+    def submit(self, image_bytes: bytes, filename: str, prediction_id: str, callback_url: str) -> Optional[dict]:
+        """
+        Queue an asynchronous prediction; YOLO posts the result to callback_url
+
+        Returns:
+            None if YOLO accepted the job (202), or the prediction itself if YOLO
+            answered synchronously (200) and will not call back
+
+        Raises:
+            requests.HTTPError: YOLO did not accept the job
+            requests.RequestException: YOLO could not be reached
+        """
+        payload, upload_name = self.prepare_image(image_bytes, filename)
+        logger.info(f"Submitting prediction {prediction_id} ({len(payload)} bytes) to YOLO with callback {callback_url}")
+        with self.breaker:
+            response = requests.post(
+                self.url,
+                files={"file": (upload_name, payload)},
+                data={"prediction_id": prediction_id, "callback_url": callback_url},
+                timeout=(self.connect_timeout, self.submit_timeout)
+            )
+            if response.status_code not in (200, 202):
+                raise requests.HTTPError(f"YOLO service returned status code {response.status_code}", response=response)
+            if response.status_code == 202:
+                return None
+            return response.json()
+
+    def health_check(self, timeout: float = 5):
+        """
+        Check that the YOLO service answers HTTP requests (blocking)
+
+        Raises:
+            requests.RequestException: YOLO is unreachable or answered with a 5xx status
+        """
+        response = requests.get(self.health_url, timeout=timeout)
+        if response.status_code >= 500:
+            raise requests.HTTPError(f"YOLO service returned status code {response.status_code}", response=response)